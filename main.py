@@ -4,10 +4,24 @@ import os
 import pandas as pd
 from src.salesforce_client import SalesforceClient
 from src.data_processor import process_dataframes
-from src.user_creator import create_salesforce_users
+from src.user_creator import create_salesforce_users, query_queue_ids, CREATION_MODES, MAX_COLLECTION_SIZE, UPSERT_MODES, DEFAULT_UPSERT_FIELD
 from src.reporter import validate_created_users
 from src.preflight import run_duplicate_check
 from src.mapper import load_mapping
+from src.journal import CreationJournal
+from src.user_index import UserIndex
+from src.fuzzy_match import DEFAULT_FUZZY_THRESHOLD
+from src.workbook_cache import WorkbookCache, DEFAULT_CACHE_DIR, DEFAULT_MAX_CACHE_MB
+from src.workbook_loader import load_workbook, workbook_columns
+from src.streaming import stream_create_users, iter_csv_chunks, DEFAULT_CHUNK_SIZE
+from src.sharding import create_users_in_shards
+from src.scheduler import schedule_create_users, format_group_report
+from src.reference_validator import ReferenceValidator, format_missing_references
+
+DEFAULT_USER_INDEX = 'org_users.sqlite'
+
+# Clients connected during this command, so its API usage can be reported at the end
+CONNECTED_CLIENTS = []
 
 def handle_preflight(args, config):
     """Runs the pre-flight duplicate check and saves the report."""
@@ -20,12 +34,17 @@ def handle_preflight(args, config):
     if not sf_connection: return
 
     try:
-        user_df = pd.read_excel(args.input, sheet_name='Training Template')
+        user_df = load_workbook_sheets(args.input, ['Training Template'], config)['Training Template']
     except Exception as e:
         print(f"Error reading 'Training Template' sheet from {args.input}: {e}")
         return
 
-    preflight_report = run_duplicate_check(sf_connection, user_df)
+    user_index = UserIndex(resolve_user_index_path(args, config)) if args.use_index else None
+    try:
+        fuzzy_threshold = args.fuzzy_threshold if args.fuzzy else None
+        preflight_report = run_duplicate_check(sf_connection, user_df, user_index, fuzzy_threshold)
+    finally:
+        if user_index: user_index.close()
 
     try:
         preflight_report.to_csv(args.output, index=False)
@@ -33,6 +52,55 @@ def handle_preflight(args, config):
     except Exception as e:
         print(f"Error saving pre-flight report to {args.output}: {e}")
 
+def handle_sync_users(args, config):
+    """Builds or refreshes the local index of org users."""
+    print("--- Syncing Org User Index ---")
+    sf_connection = connect_to_salesforce(config)
+    if not sf_connection: return
+
+    user_index = UserIndex(resolve_user_index_path(args, config))
+    try:
+        user_index.sync(sf_connection, full=args.full)
+    except Exception as e:
+        print(f"Error syncing users into {user_index.path}: {e}")
+    finally:
+        user_index.close()
+
+def resolve_user_index_path(args, config):
+    """Returns the user index path from the command line, config.ini, or the default."""
+    if args.index:
+        return args.index
+    if config.has_section('settings'):
+        return config['settings'].get('user_index', DEFAULT_USER_INDEX)
+    return DEFAULT_USER_INDEX
+
+def load_workbook_sheets(path, sheet_names, config):
+    """
+    Reads sheets from the source workbook, keeping only the columns the tool uses,
+    through the parsed-sheet cache.
+    The cache lives in the 'workbook_cache' directory from config.ini (default .workbook_cache);
+    setting it to an empty value turns caching off. 'workbook_engine' picks the Excel reader.
+    :return: A dict of sheet name -> DataFrame.
+    """
+    settings = config['settings'] if config.has_section('settings') else {}
+    environment = settings.get('environment', 'Training')
+    mapping_file = settings.get('mapping_file')
+    mapping = load_mapping(mapping_file) if mapping_file and os.path.isfile(mapping_file) else None
+    columns = workbook_columns(mapping, environment)
+    engine = settings.get('workbook_engine', 'auto')
+
+    def reader(workbook, names):
+        return load_workbook(workbook, names, columns, engine)
+
+    cache_dir = settings.get('workbook_cache', DEFAULT_CACHE_DIR)
+    if not cache_dir:
+        return reader(path, sheet_names)
+
+    max_mb = float(settings.get('workbook_cache_max_mb', DEFAULT_MAX_CACHE_MB))
+    cache = WorkbookCache(cache_dir, int(max_mb * 1024 * 1024))
+    variant = repr((environment, [columns.get(name) for name in sheet_names]))
+    return cache.read_sheets(path, sheet_names, reader, variant)
+
 def handle_create_users(args, config):
     """Creates users based on a pre-flight report."""
     print("--- Running User Creation ---")
@@ -44,27 +112,90 @@ def handle_create_users(args, config):
 
     mapping = load_mapping(mapping_file)
     if not mapping: return
+    if sum([args.stream, args.shards > 1, args.schedule]) > 1:
+        print("Error: Only one of --stream, --shards and --schedule can be used at a time.")
+        return
 
     try:
-        preflight_df = pd.read_csv(args.input)
-        excel_file = pd.ExcelFile(args.excel_source)
-        persona_df = excel_file.parse('Persona Mapping')
-        sso_df = excel_file.parse('TSSO_TrainTheTrainer')
+        # In streaming mode the pre-flight report is read chunk by chunk later on
+        preflight_df = None if args.stream else pd.read_csv(args.input)
+        sheets = load_workbook_sheets(args.excel_source, ['Persona Mapping', 'TSSO_TrainTheTrainer'], config)
+        persona_df = sheets['Persona Mapping']
+        sso_df = sheets['TSSO_TrainTheTrainer']
         environment = settings.get('environment', 'Training')
     except Exception as e:
         print(f"Error loading required data: {e}")
         return
 
-    sf_connection = connect_to_salesforce(config)
+    sf_connection = connect_to_salesforce(config, workers=args.concurrency)
     if not sf_connection: return
 
-    users_to_create_df = preflight_df[preflight_df['Action'] == 'Create New User'].copy()
-    if users_to_create_df.empty:
-        print("No new users to create based on the pre-flight report.")
+    if not args.stream:
+        users_to_create_df = preflight_df[preflight_df['Action'] == 'Create New User'].copy()
+        if users_to_create_df.empty:
+            print("No new users to create based on the pre-flight report.")
+            return
+
+    journal = None
+    if not args.dry_run:
+        journal = open_creation_journal(args.journal or f"{args.output}.journal.sqlite", args.resume)
+        if not journal: return
+
+    creation_options = dict(
+        mode=args.mode, batch_size=args.batch_size, concurrency=args.concurrency, graph_size=args.graph_size,
+        resume=args.resume
+    )
+    if args.stream:
+        reference_validator = None if args.skip_reference_check else ReferenceValidator(sf_connection)
+        try:
+            statuses = stream_create_users(
+                sf_connection, iter_csv_chunks(args.input, args.chunk_size), persona_df, sso_df, mapping, args.output,
+                environment, args.dry_run, args.requests_per_second, reference_validator, journal=journal, **creation_options
+            )
+        except ValueError as e:
+            print(f"Error: {e}")
+            return
+        finally:
+            if journal: journal.close()
+        report = format_missing_references(reference_validator.missing) if reference_validator else ''
+        if report:
+            print(f"Missing references:\n{report}")
+        if not statuses:
+            print("No new users to create based on the pre-flight report.")
+            return
+        print(f"Creation results saved to: {args.output} ({', '.join(f'{status}: {count}' for status, count in statuses.items())})")
         return
 
     processed_data = process_dataframes(users_to_create_df, persona_df, sso_df, environment)
-    creation_results_df = create_salesforce_users(sf_connection, processed_data, mapping, args.dry_run)
+    queue_ids = None
+    if not args.skip_reference_check:
+        creation_options['missing_references'], queue_ids = check_references(sf_connection, processed_data)
+    if queue_ids is None:
+        # Looked up once here rather than by every shard worker or scheduled batch
+        queue_ids = {} if args.dry_run else query_queue_ids(sf_connection, processed_data)
+    try:
+        if args.shards > 1:
+            creation_results_df = create_users_in_shards(
+                sf_connection, config, processed_data, mapping, args.shards, args.output, args.dry_run, queue_ids,
+                args.requests_per_second, journal.path if journal else None, **creation_options
+            )
+        elif args.schedule:
+            creation_results_df, group_report_df = schedule_create_users(
+                sf_connection, processed_data, mapping, args.dry_run, max_batches_per_parent=args.max_batches_per_parent,
+                requests_per_second=args.requests_per_second, journal=journal, queue_ids=queue_ids, **creation_options
+            )
+            print(f"\n--- Throughput and lock errors by role and queues ---\n{format_group_report(group_report_df)}")
+            save_artifact(group_report_df, f"{args.output}.groups.csv", "Group report")
+        else:
+            creation_results_df = create_salesforce_users(
+                sf_connection, processed_data, mapping, args.dry_run, requests_per_second=args.requests_per_second,
+                journal=journal, queue_ids=queue_ids, **creation_options
+            )
+    except ValueError as e:
+        print(f"Error: {e}")
+        return
+    finally:
+        if journal: journal.close()
 
     try:
         creation_results_df.to_csv(args.output, index=False)
@@ -72,33 +203,46 @@ def handle_create_users(args, config):
     except Exception as e:
         print(f"Error saving creation results to {args.output}: {e}")
 
+def open_creation_journal(journal_path, resume):
+    """Opens the journal of a live creation run, guarding against accidental re-runs."""
+    journal_exists = os.path.isfile(journal_path)
+    if resume and not journal_exists:
+        print(f"Error: Cannot resume, journal '{journal_path}' not found.")
+        return None
+
+    journal = CreationJournal(journal_path)
+    if not resume and not journal.is_empty():
+        journal.close()
+        print(f"Error: Journal '{journal_path}' already records a previous run. "
+              "Pass --resume to continue it, or delete the journal to start over.")
+        return None
+
+    print(f"Recording progress in journal: {journal_path}")
+    return journal
+
+def check_references(sf_connection, processed_data):
+    """
+    Looks up every Profile, Role, Permission Set Group and Queue that processed_data refers to, in a
+    few batched queries, and reports the ones the org doesn't have before any user is sent.
+    :return: A tuple (missing references, for create_salesforce_users' missing_references; queue
+             name -> Id, or None if the queues could not be looked up).
+    """
+    print("Checking Profile, Role, Permission Set Group and Queue references...")
+    validator = ReferenceValidator(sf_connection)
+    missing = validator.check(processed_data)
+    report = format_missing_references(missing, processed_data)
+    print(f"Missing references:\n{report}" if report else "All references found.")
+    return missing, None if 'Queues' in validator.unchecked else validator.queue_ids
+
 def handle_validate(args, config):
     """Validates created users."""
     print("--- Running Validation ---")
     try:
         results_df = pd.read_csv(args.input)
-        source_df = pd.read_excel(args.excel_source, sheet_name='Training Template')
-
-        # We need a common key to merge on, 'Username' is a good candidate if it's in both files.
-        # Let's assume the results_df from user_creator contains the original username.
-        validation_data = pd.merge(results_df, source_df, on='Username', how='left')
-
-        successful_users = validation_data[validation_data['Status'] == 'Success']
-
-        # Check if the 'added by' column exists before filtering
-        if 'added by' in successful_users.columns:
-            users_to_validate = successful_users[successful_users['added by'] == 'Josh']
-        else:
-            print("Warning: 'added by' column not found in 'Training Template' sheet. Validating all successful users.")
-            users_to_validate = successful_users
+        source_df = load_workbook_sheets(args.excel_source, ['Training Template'], config)['Training Template']
 
-        if users_to_validate.empty:
-            print("No users to validate based on the criteria.")
-            return
-
-        ids_to_validate = list(users_to_validate['SalesforceId'].dropna())
+        ids_to_validate = select_ids_to_validate(results_df, source_df)
         if not ids_to_validate:
-            print("No valid Salesforce IDs to query for validation.")
             return
 
     except Exception as e:
@@ -110,15 +254,200 @@ def handle_validate(args, config):
 
     validate_created_users(sf_connection, ids_to_validate)
 
-def connect_to_salesforce(config):
-    """Connects to Salesforce and returns the connection object."""
+def handle_provision(args, config):
+    """Runs preflight, creation and validation in one pass, reading the workbook once."""
+    print("--- Running Provisioning ---")
+    if not (os.path.isfile(args.input) and args.input.endswith('.xlsx')):
+        print(f"Error: Input '{args.input}' must be an Excel (.xlsx) file.")
+        return
+
+    settings = config['settings']
+    mapping_file = settings.get('mapping_file')
+    if not mapping_file or not os.path.isfile(mapping_file):
+        print(f"Error: Mapping file '{mapping_file}' not found or not specified in config.ini.")
+        return
+
+    mapping = load_mapping(mapping_file)
+    if not mapping: return
+
     try:
-        sf_client = SalesforceClient(config)
+        sheets = load_workbook_sheets(args.input, ['Training Template', 'Persona Mapping', 'TSSO_TrainTheTrainer'], config)
+        environment = settings.get('environment', 'Training')
+    except Exception as e:
+        print(f"Error loading required data: {e}")
+        return
+    user_df = sheets['Training Template']
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    preflight_path = os.path.join(args.output_dir, 'preflight_report.csv')
+    results_path = os.path.join(args.output_dir, 'creation_results.csv')
+    validation_path = os.path.join(args.output_dir, 'validation_results.csv')
+
+    sf_connection = connect_to_salesforce(config, workers=args.concurrency)
+    if not sf_connection: return
+
+    # Step 1: preflight
+    user_index = UserIndex(resolve_user_index_path(args, config)) if args.use_index else None
+    try:
+        fuzzy_threshold = args.fuzzy_threshold if args.fuzzy else None
+        preflight_report = run_duplicate_check(sf_connection, user_df, user_index, fuzzy_threshold)
+    finally:
+        if user_index: user_index.close()
+    save_artifact(preflight_report, preflight_path, "Pre-flight report")
+
+    users_to_create_df = preflight_report[preflight_report['Action'] == 'Create New User'].copy()
+    if users_to_create_df.empty:
+        print("No new users to create based on the pre-flight check.")
+        return
+
+    # Step 2: create-users
+    journal = None
+    if not args.dry_run:
+        journal = open_creation_journal(args.journal or f"{results_path}.journal.sqlite", args.resume)
+        if not journal: return
+
+    processed_data = process_dataframes(users_to_create_df, sheets['Persona Mapping'], sheets['TSSO_TrainTheTrainer'], environment)
+    missing_references, queue_ids = (None, None) if args.skip_reference_check else check_references(sf_connection, processed_data)
+    try:
+        creation_results_df = create_salesforce_users(
+            sf_connection, processed_data, mapping, args.dry_run, mode=args.mode, batch_size=args.batch_size,
+            concurrency=args.concurrency, requests_per_second=args.requests_per_second, graph_size=args.graph_size,
+            journal=journal, resume=args.resume, queue_ids=queue_ids, missing_references=missing_references
+        )
+    except ValueError as e:
+        print(f"Error: {e}")
+        return
+    finally:
+        if journal: journal.close()
+    save_artifact(creation_results_df, results_path, "Creation results")
+
+    # Step 3: validate
+    if args.dry_run:
+        print("Dry run: skipping validation.")
+        return
+    ids_to_validate = select_ids_to_validate(creation_results_df, user_df)
+    if not ids_to_validate:
+        return
+    validation_df = validate_created_users(sf_connection, ids_to_validate)
+    if validation_df is not None:
+        save_artifact(validation_df, validation_path, "Validation results")
+
+def handle_upsert_users(args, config):
+    """Creates new users and updates existing ones by an external ID in one pass, without a pre-flight check."""
+    print("--- Running User Upsert ---")
+    if not (os.path.isfile(args.input) and args.input.endswith('.xlsx')):
+        print(f"Error: Input '{args.input}' must be an Excel (.xlsx) file.")
+        return
+
+    settings = config['settings']
+    mapping_file = settings.get('mapping_file')
+    if not mapping_file or not os.path.isfile(mapping_file):
+        print(f"Error: Mapping file '{mapping_file}' not found or not specified in config.ini.")
+        return
+
+    mapping = load_mapping(mapping_file)
+    if not mapping: return
+    external_id_field = args.external_id_field or settings.get('external_id_field', DEFAULT_UPSERT_FIELD)
+
+    try:
+        sheets = load_workbook_sheets(args.input, ['Training Template', 'Persona Mapping', 'TSSO_TrainTheTrainer'], config)
+        environment = settings.get('environment', 'Training')
+    except Exception as e:
+        print(f"Error loading required data: {e}")
+        return
+
+    sf_connection = connect_to_salesforce(config)
+    if not sf_connection: return
+
+    processed_data = process_dataframes(sheets['Training Template'], sheets['Persona Mapping'], sheets['TSSO_TrainTheTrainer'], environment)
+    missing_references, queue_ids = (None, None) if args.skip_reference_check else check_references(sf_connection, processed_data)
+    try:
+        upsert_results_df = create_salesforce_users(
+            sf_connection, processed_data, mapping, args.dry_run, mode=args.mode, batch_size=args.batch_size,
+            requests_per_second=args.requests_per_second, upsert_field=external_id_field, queue_ids=queue_ids,
+            missing_references=missing_references
+        )
+    except ValueError as e:
+        print(f"Error: {e}")
+        return
+    save_artifact(upsert_results_df, args.output, "Upsert results")
+    if 'Operation' in upsert_results_df.columns:
+        counts = upsert_results_df['Operation'].value_counts()
+        print(f"Upserted by {external_id_field}: " + ', '.join(f"{count} {operation.lower()}" for operation, count in counts.items() if operation))
+
+def save_artifact(df, path, description):
+    """Writes one stage's DataFrame to CSV."""
+    try:
+        df.to_csv(path, index=False)
+        print(f"{description} saved to: {path}")
+    except Exception as e:
+        print(f"Error saving {description.lower()} to {path}: {e}")
+
+def select_ids_to_validate(results_df, source_df):
+    """Returns the Salesforce IDs of successfully created users that were added by Josh."""
+    # We need a common key to merge on, 'Username' is a good candidate if it's in both files.
+    # Let's assume the results_df from user_creator contains the original username.
+    validation_data = pd.merge(results_df, source_df, on='Username', how='left')
+
+    successful_users = validation_data[validation_data['Status'] == 'Success']
+
+    # Check if the 'added by' column exists before filtering
+    if 'added by' in successful_users.columns:
+        users_to_validate = successful_users[successful_users['added by'] == 'Josh']
+    else:
+        print("Warning: 'added by' column not found in 'Training Template' sheet. Validating all successful users.")
+        users_to_validate = successful_users
+
+    if users_to_validate.empty:
+        print("No users to validate based on the criteria.")
+        return []
+
+    ids_to_validate = list(users_to_validate['SalesforceId'].dropna())
+    if not ids_to_validate:
+        print("No valid Salesforce IDs to query for validation.")
+    return ids_to_validate
+
+def connect_to_salesforce(config, workers=None):
+    """
+    Connects to Salesforce and returns the connection object.
+    :param workers: How many threads will make calls at once, so the connection pool can be sized to match.
+    """
+    try:
+        sf_client = SalesforceClient(config, min_pool_size=workers)
+        CONNECTED_CLIENTS.append(sf_client)
         return sf_client.connect()
     except (ValueError, configparser.NoSectionError, FileNotFoundError) as e:
         print(f"Configuration or Connection Error: {e}")
         return None
 
+def print_api_usage_summary():
+    """Reports the API calls made by the clients this command connected."""
+    for sf_client in CONNECTED_CLIENTS:
+        print(f"\n--- API Usage ---\n{sf_client.api_usage.summary()}")
+
+def add_duplicate_check_arguments(parser):
+    """Adds the options shared by the preflight and provision commands."""
+    parser.add_argument('--use-index', action='store_true', help="Check duplicates against the local user index (see 'sync-users'), refreshing it with a delta query first.")
+    parser.add_argument('--index', type=str, default=None, help="Path to the local user index (default: 'user_index' in config.ini, or org_users.sqlite).")
+    parser.add_argument('--fuzzy', action='store_true', help="Also flag users who closely resemble an existing user (e.g. an email typo) as 'Review - Possible Duplicate'.")
+    parser.add_argument('--fuzzy-threshold', type=float, default=DEFAULT_FUZZY_THRESHOLD, help=f"Minimum similarity score (0-1) for --fuzzy matches (default: {DEFAULT_FUZZY_THRESHOLD}).")
+
+def add_creation_arguments(parser):
+    """Adds the options shared by the create-users and provision commands."""
+    parser.add_argument('--no-dry-run', action='store_false', dest='dry_run', help="Disable dry-run mode to make live changes.")
+    parser.add_argument('--mode', choices=CREATION_MODES, default='rest', help="How users are inserted: one REST call per user ('rest'), batched sObject Collections requests ('collections'), a Bulk API 2.0 ingest job ('bulk') or all-or-nothing Composite Graphs of users and their assignments ('graph').")
+    parser.add_argument('--batch-size', type=int, default=MAX_COLLECTION_SIZE, help=f"Users per sObject Collections request in 'collections' mode (max {MAX_COLLECTION_SIZE}).")
+    parser.add_argument('--concurrency', type=int, default=1, help="Number of users provisioned in parallel in 'rest' mode, or of batches run in parallel with --schedule.")
+    parser.add_argument('--requests-per-second', type=float, default=None, help="Maximum number of Salesforce API calls per second across all workers.")
+    parser.add_argument('--graph-size', type=int, default=1, help="Users per all-or-nothing Composite Graph in 'graph' mode.")
+    parser.add_argument('--journal', type=str, default=None, help="Path to the run journal (default: <creation results CSV>.journal.sqlite).")
+    parser.add_argument('--resume', action='store_true', help="Resume an interrupted run from its journal, skipping users that were already created.")
+    add_reference_check_argument(parser)
+
+def add_reference_check_argument(parser):
+    """Adds the option shared by the commands that send users to Salesforce."""
+    parser.add_argument('--skip-reference-check', action='store_true', help="Don't look up the Profiles, Roles, Permission Set Groups and Queues of the users before sending them.")
+
 def main():
     """Main function to parse arguments and dispatch commands."""
     parser = argparse.ArgumentParser(description="A modular Salesforce admin tool.")
@@ -128,16 +457,48 @@ def main():
     parser_preflight = subparsers.add_parser('preflight', help='Run a pre-flight duplicate check.')
     parser_preflight.add_argument('--input', type=str, required=True, help="Path to the source Excel (.xlsx) file.")
     parser_preflight.add_argument('--output', type=str, default='preflight_report.csv', help="Path to save the pre-flight CSV report.")
+    add_duplicate_check_arguments(parser_preflight)
     parser_preflight.set_defaults(func=handle_preflight)
 
+    # --- Sync-Users Command ---
+    parser_sync = subparsers.add_parser('sync-users', help='Build or refresh the local index of org users.')
+    parser_sync.add_argument('--index', type=str, default=None, help="Path to the local user index (default: 'user_index' in config.ini, or org_users.sqlite).")
+    parser_sync.add_argument('--full', action='store_true', help="Re-download every user instead of only those changed since the last sync.")
+    parser_sync.set_defaults(func=handle_sync_users)
+
     # --- Create-Users Command ---
     parser_create = subparsers.add_parser('create-users', help='Create users from a pre-flight report.')
     parser_create.add_argument('--input', type=str, required=True, help="Path to the pre-flight CSV report.")
     parser_create.add_argument('--excel-source', type=str, required=True, help="Path to the original Excel file for persona mapping.")
     parser_create.add_argument('--output', type=str, default='creation_results.csv', help="Path to save the creation results CSV.")
-    parser_create.add_argument('--no-dry-run', action='store_false', dest='dry_run', help="Disable dry-run mode to make live changes.")
+    parser_create.add_argument('--stream', action='store_true', help="Read the pre-flight report in chunks and append each chunk's results to the output as it finishes, keeping memory use flat for very large inputs.")
+    parser_create.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help=f"Pre-flight rows per chunk with --stream (default: {DEFAULT_CHUNK_SIZE}). In 'bulk' mode each chunk is its own ingest job.")
+    parser_create.add_argument('--shards', type=int, default=1, help="Split the users across this many worker processes, each with its own Salesforce session. Users with the same role stay in one shard, so workers don't contend for the same role locks.")
+    parser_create.add_argument('--schedule', action='store_true', help="Group users by role and queues and run --concurrency batches at a time, never more than --max-batches-per-parent of them under the same role or queue. Reports throughput and lock errors per group.")
+    parser_create.add_argument('--max-batches-per-parent', type=int, default=1, help="With --schedule, how many batches may insert under the same role or into the same queue at once (default: 1).")
+    add_creation_arguments(parser_create)
     parser_create.set_defaults(dry_run=True, func=handle_create_users)
 
+    # --- Provision Command ---
+    parser_provision = subparsers.add_parser('provision', help='Run preflight, create-users and validate in one pass.')
+    parser_provision.add_argument('--input', type=str, required=True, help="Path to the source Excel (.xlsx) file.")
+    parser_provision.add_argument('--output-dir', type=str, default='.', help="Directory for the preflight, creation and validation CSV reports.")
+    add_duplicate_check_arguments(parser_provision)
+    add_creation_arguments(parser_provision)
+    parser_provision.set_defaults(dry_run=True, func=handle_provision)
+
+    # --- Upsert-Users Command ---
+    parser_upsert = subparsers.add_parser('upsert-users', help='Create new users and update existing ones by an external ID, without a pre-flight check.')
+    parser_upsert.add_argument('--input', type=str, required=True, help="Path to the source Excel (.xlsx) file.")
+    parser_upsert.add_argument('--output', type=str, default='upsert_results.csv', help="Path to save the upsert results CSV.")
+    parser_upsert.add_argument('--external-id-field', type=str, default=None, help=f"User field that identifies existing users (default: 'external_id_field' in config.ini, or {DEFAULT_UPSERT_FIELD}).")
+    parser_upsert.add_argument('--no-dry-run', action='store_false', dest='dry_run', help="Disable dry-run mode to make live changes.")
+    parser_upsert.add_argument('--mode', choices=UPSERT_MODES, default='collections', help="Upsert through sObject Collections requests ('collections') or a Bulk API 2.0 ingest job ('bulk').")
+    parser_upsert.add_argument('--batch-size', type=int, default=MAX_COLLECTION_SIZE, help=f"Users per sObject Collections request in 'collections' mode (max {MAX_COLLECTION_SIZE}).")
+    parser_upsert.add_argument('--requests-per-second', type=float, default=None, help="Maximum number of Salesforce API calls per second.")
+    add_reference_check_argument(parser_upsert)
+    parser_upsert.set_defaults(dry_run=True, func=handle_upsert_users)
+
     # --- Validate Command ---
     parser_validate = subparsers.add_parser('validate', help='Validate created users in Salesforce.')
     parser_validate.add_argument('--input', type=str, required=True, help="Path to the creation results CSV.")
@@ -152,7 +513,10 @@ def main():
         return
     config.read('config.ini')
 
-    args.func(args, config)
+    try:
+        args.func(args, config)
+    finally:
+        print_api_usage_summary()
 
 if __name__ == '__main__':
     main()
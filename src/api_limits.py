@@ -0,0 +1,122 @@
+import re
+import threading
+import time
+
+DEFAULT_SLOW_AT = 0.80
+DEFAULT_PAUSE_AT = 0.95
+DEFAULT_SLOW_DELAY = 0.5
+DEFAULT_PAUSE_SECONDS = 60
+
+_API_USAGE = re.compile(r'api-usage=(\d+)/(\d+)')
+
+def parse_limit_info(header):
+    """
+    Parses a Sforce-Limit-Info header such as 'api-usage=25/15000'.
+    :return: (used, limit), or None if the header has no api-usage entry.
+    """
+    match = _API_USAGE.search(header or '')
+    if not match:
+        return None
+    return int(match.group(1)), int(match.group(2))
+
+class ApiUsage:
+    """
+    Tracks the org's daily API usage as reported on each response, and the calls this process made.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls_made = 0
+        self.worker_calls = 0
+        self.first_used = None
+        self.used = None
+        self.limit = None
+
+    def record_response(self, response):
+        """Counts one call and updates the usage from the response's Sforce-Limit-Info header."""
+        usage = parse_limit_info(response.headers.get('Sforce-Limit-Info'))
+        with self._lock:
+            self.calls_made += 1
+            if usage:
+                self.used, self.limit = usage
+                if self.first_used is None:
+                    # The first response already includes its own call
+                    self.first_used = self.used - 1
+
+    def add_worker_usage(self, calls_made, used=None, limit=None):
+        """
+        Counts calls a worker process made on this command's behalf, and takes its last reported
+        org usage when that is more recent (higher) than ours.
+        """
+        with self._lock:
+            self.calls_made += calls_made
+            self.worker_calls += calls_made
+            if used is not None and (self.used is None or used > self.used):
+                if self.first_used is None:
+                    self.first_used = used - calls_made
+                self.used, self.limit = used, limit
+
+    @property
+    def fraction_used(self):
+        """The share of the daily allocation used (0-1), or None before any usage was reported."""
+        if not self.limit:
+            return None
+        return self.used / self.limit
+
+    def summary(self):
+        """A one-line description of the calls made and the org's remaining allocation."""
+        text = f"API calls made by this command: {self.calls_made}"
+        text += f" ({self.worker_calls} of them by worker processes)." if self.worker_calls else "."
+        if self.limit:
+            text += (f" Org daily API usage: {self.used}/{self.limit} ({self.fraction_used:.1%}),"
+                     f" up {self.used - self.first_used} during this command (including other integrations).")
+        return text
+
+class UsageThrottle:
+    """
+    Slows requests down as the org approaches its daily API allocation.
+
+    Any object with a before_request(usage) method can be used as a throttle instead.
+    """
+    def __init__(self, slow_at=DEFAULT_SLOW_AT, pause_at=DEFAULT_PAUSE_AT, slow_delay=DEFAULT_SLOW_DELAY,
+                 pause_seconds=DEFAULT_PAUSE_SECONDS, sleep=time.sleep):
+        """
+        :param slow_at: Usage share (0-1) from which each request waits slow_delay seconds.
+        :param pause_at: Usage share (0-1) from which each request waits pause_seconds seconds,
+                         leaving headroom for other integrations while the rolling 24-hour window frees up.
+        """
+        if not 0 < slow_at <= pause_at:
+            raise ValueError("Throttle thresholds must satisfy 0 < slow_at <= pause_at.")
+        self.slow_at = slow_at
+        self.pause_at = pause_at
+        self.slow_delay = slow_delay
+        self.pause_seconds = pause_seconds
+        self._sleep = sleep
+        self._warned = set()
+
+    def before_request(self, usage):
+        fraction = usage.fraction_used
+        if fraction is None or fraction < self.slow_at:
+            return
+        if fraction >= self.pause_at:
+            self._warn_once('pause', f"Warning: Org API usage is at {fraction:.1%}; pausing {self.pause_seconds}s before each request.")
+            self._sleep(self.pause_seconds)
+        else:
+            self._warn_once('slow', f"Warning: Org API usage is at {fraction:.1%}; slowing requests down.")
+            self._sleep(self.slow_delay)
+
+    def _warn_once(self, level, message):
+        if level not in self._warned:
+            self._warned.add(level)
+            print(message)
+
+def throttle_from_config(config):
+    """Builds a UsageThrottle from the optional [api_limits] section of config.ini, or None if it is disabled."""
+    limits = config['api_limits'] if config.has_section('api_limits') else {}
+    if str(limits.get('throttle', 'true')).strip().lower() in ('0', 'false', 'no', 'off'):
+        return None
+    return UsageThrottle(
+        slow_at=float(limits.get('slow_at', DEFAULT_SLOW_AT)),
+        pause_at=float(limits.get('pause_at', DEFAULT_PAUSE_AT)),
+        slow_delay=float(limits.get('slow_delay', DEFAULT_SLOW_DELAY)),
+        pause_seconds=float(limits.get('pause_seconds', DEFAULT_PAUSE_SECONDS))
+    )
@@ -0,0 +1,209 @@
+import argparse
+import configparser
+import contextlib
+import json
+import os
+import platform
+import re
+import secrets
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import namedtuple
+from src.data_processor import process_dataframes
+from src.mapper import load_mapping
+from src.preflight import run_duplicate_check
+from src.salesforce_client import SalesforceClient
+from src.synthetic_data import generate_workbook_frames, write_workbook_frames, read_workbook_frames, queue_names, FORMATS
+from src.user_creator import create_salesforce_users, build_user_payloads, CREATION_MODES
+from src.workbook_loader import load_workbook, workbook_columns, TEMPLATE_SHEET, PERSONA_SHEET, SSO_SHEET
+
+STAGES = ('load', 'process_dataframes', 'duplicate_check', 'build_payloads', 'create_users')
+# Stages that call the fake org, which runs in its own process so its work is not measured
+SERVER_STAGES = ('duplicate_check', 'create_users')
+
+DEFAULT_THRESHOLD = 0.25
+# Differences below these are noise, whatever the ratio
+MIN_SECONDS_DELTA = 0.05
+MIN_MB_DELTA = 1.0
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_MAPPING = os.path.join(REPO_ROOT, 'mapping.properties')
+
+StageResult = namedtuple('StageResult', ['seconds', 'peak_mb'])
+
+def measure(func, *args, **kwargs):
+    """
+    Runs func, recording its wall time and the peak memory it allocated (through tracemalloc).
+    :return: A tuple (func's result, StageResult).
+    """
+    tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        result = func(*args, **kwargs)
+    finally:
+        seconds = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return result, StageResult(seconds, peak / (1024 * 1024))
+
+def run_benchmarks(rows, seed=0, fmt='csv', stages=STAGES, mode='collections', org_users=None, latency=0.0,
+                   mapping=None, environment='Training', verbose=False):
+    """
+    Generates `rows` synthetic users and times each stage of a provisioning run on them.
+
+    The duplicate check and user creation run against a local fake org (see fake_salesforce)
+    seeded with `org_users` users (default: as many as `rows`).
+
+    :param stages: The stages to measure. Stages that later stages depend on still run, unmeasured.
+    :param mapping: The field mapping, by default the repository's mapping.properties.
+    :return: A dict of stage name -> StageResult, in STAGES order.
+    """
+    unknown = set(stages) - set(STAGES)
+    if unknown:
+        raise ValueError(f"Unknown stages: {', '.join(sorted(unknown))}. Choose from: {', '.join(STAGES)}.")
+    mapping = mapping or load_mapping(DEFAULT_MAPPING)
+    results = {}
+    output = None if verbose else open(os.devnull, 'w')
+
+    with tempfile.TemporaryDirectory(prefix='benchmark_') as workdir, (contextlib.redirect_stdout(output) if output else contextlib.nullcontext()):
+        frames = generate_workbook_frames(rows, seed)
+        data_path = os.path.join(workdir, 'synthetic.xlsx' if fmt == 'xlsx' else 'synthetic')
+        write_workbook_frames(frames, data_path, fmt)
+        del frames
+
+        sheets, results['load'] = measure(_load, data_path, fmt, mapping, environment)
+        processed_data, results['process_dataframes'] = measure(
+            process_dataframes, sheets[TEMPLATE_SHEET], sheets[PERSONA_SHEET], sheets[SSO_SHEET], environment)
+
+        if 'build_payloads' in stages:
+            _, results['build_payloads'] = measure(build_user_payloads, processed_data, mapping)
+
+        if any(stage in stages for stage in SERVER_STAGES):
+            with fake_org_server(workdir, rows if org_users is None else org_users, seed, latency) as config:
+                sf = SalesforceClient(config).connect()
+                if 'duplicate_check' in stages:
+                    _, results['duplicate_check'] = measure(run_duplicate_check, sf, sheets[TEMPLATE_SHEET])
+                if 'create_users' in stages:
+                    created, results['create_users'] = measure(
+                        create_salesforce_users, sf, processed_data, mapping, dry_run=False, mode=mode)
+                    failed = (created['Status'] != 'Success').sum()
+                    if failed:
+                        print(f"Warning: {failed} of {len(created)} users failed in the create_users stage.", file=sys.stderr)
+
+    if output:
+        output.close()
+    return {stage: results[stage] for stage in STAGES if stage in stages}
+
+def _load(data_path, fmt, mapping, environment):
+    if fmt == 'xlsx':
+        # The same reader the commands use, keeping only the columns they need
+        return load_workbook(data_path, [TEMPLATE_SHEET, PERSONA_SHEET, SSO_SHEET], workbook_columns(mapping, environment))
+    return read_workbook_frames(data_path, fmt)
+
+@contextlib.contextmanager
+def fake_org_server(workdir, users=0, seed=0, latency=0.0):
+    """
+    Runs the fake Salesforce server in a separate process for the duration of the block.
+    :return: A config.ini-style ConfigParser that connects SalesforceClient to it.
+    """
+    session_id = secrets.token_hex(16)
+    command = [sys.executable, '-u', '-m', 'src.fake_salesforce', '--port', '0', '--users', str(users), '--seed', str(seed),
+               '--latency', str(latency), '--api-limit', str(10 ** 9), '--cert-dir', workdir, '--session-id', session_id,
+               '--queues', *queue_names()]
+    process = subprocess.Popen(command, cwd=REPO_ROOT, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    try:
+        match = re.search(r'listening on (https://\S+)', process.stdout.readline())
+        if not match:
+            raise RuntimeError("The fake Salesforce server did not start; run 'python -m src.fake_salesforce' to see why.")
+        config = configparser.ConfigParser()
+        config.read_dict({
+            'salesforce_creds': {'instance_url': match.group(1), 'session_id': session_id},
+            'http': {'ca_bundle': os.path.join(workdir, 'fake_salesforce_cert.pem')},
+            'api_limits': {'throttle': 'false'}
+        })
+        yield config
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+def compare_to_baseline(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """
+    Compares stage results with a saved baseline.
+    :param results: A dict of stage name -> StageResult.
+    :param baseline: A results document as written by results_document (only its tracked stages are compared).
+    :return: A list of messages, one per stage that got slower or bigger by more than `threshold` (a share, e.g. 0.25).
+    """
+    regressions = []
+    for stage, base in baseline['stages'].items():
+        current = results.get(stage)
+        if current is None:
+            continue
+        if current.seconds > base['seconds'] * (1 + threshold) and current.seconds - base['seconds'] > MIN_SECONDS_DELTA:
+            regressions.append(f"{stage}: {current.seconds:.2f}s vs {base['seconds']:.2f}s in the baseline")
+        if current.peak_mb > base['peak_mb'] * (1 + threshold) and current.peak_mb - base['peak_mb'] > MIN_MB_DELTA:
+            regressions.append(f"{stage}: peak {current.peak_mb:.1f} MB vs {base['peak_mb']:.1f} MB in the baseline")
+    return regressions
+
+def results_document(results, rows, seed, fmt, mode):
+    """The JSON-serializable form of a benchmark run, as saved with --output and --save-baseline."""
+    return {
+        'rows': rows, 'seed': seed, 'format': fmt, 'mode': mode, 'python': platform.python_version(),
+        'stages': {stage: {'seconds': round(r.seconds, 4), 'peak_mb': round(r.peak_mb, 2)} for stage, r in results.items()}
+    }
+
+def format_results(results):
+    lines = [f"{'Stage':<20} {'Seconds':>10} {'Peak MB':>10}"]
+    lines += [f"{stage:<20} {r.seconds:>10.2f} {r.peak_mb:>10.1f}" for stage, r in results.items()]
+    return '\n'.join(lines)
+
+def main():
+    """Runs the benchmarks and checks them against a baseline."""
+    parser = argparse.ArgumentParser(description="Time and measure the memory of each provisioning stage on synthetic data.")
+    parser.add_argument('--rows', type=int, default=10000, help="Number of synthetic users (default: 10000).")
+    parser.add_argument('--seed', type=int, default=0, help="Seed of the synthetic data.")
+    parser.add_argument('--format', choices=FORMATS, default='csv', help="Format the data is loaded from (default: csv).")
+    parser.add_argument('--stages', nargs='+', choices=STAGES, default=list(STAGES), help="Stages to measure (default: all).")
+    parser.add_argument('--mode', choices=CREATION_MODES, default='collections', help="Creation mode of the create_users stage.")
+    parser.add_argument('--org-users', type=int, default=None, help="Existing users in the fake org (default: --rows).")
+    parser.add_argument('--latency', type=float, default=0.0, help="Seconds the fake org adds to every API call.")
+    parser.add_argument('--mapping', type=str, default=DEFAULT_MAPPING, help="Field mapping file (default: mapping.properties).")
+    parser.add_argument('--output', type=str, default=None, help="Save the results to this JSON file.")
+    parser.add_argument('--baseline', type=str, default=None, help="Fail if a stage regressed against this results file.")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD, help=f"Allowed slowdown or memory growth against the baseline (default: {DEFAULT_THRESHOLD}).")
+    parser.add_argument('--save-baseline', type=str, default=None, help="Save the results as a new baseline file.")
+    parser.add_argument('--verbose', action='store_true', help="Show the output of the stages.")
+    args = parser.parse_args()
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if (baseline['rows'], baseline['format'], baseline['mode']) != (args.rows, args.format, args.mode):
+            print(f"Error: The baseline was recorded with {baseline['rows']} rows, format {baseline['format']} and mode {baseline['mode']}; "
+                  f"run with the same settings to compare.")
+            sys.exit(2)
+
+    mapping = load_mapping(args.mapping)
+    print(f"Benchmarking {args.rows} synthetic users ({args.format}, seed {args.seed})...")
+    results = run_benchmarks(args.rows, args.seed, args.format, args.stages, args.mode, args.org_users, args.latency,
+                             mapping, verbose=args.verbose)
+    print(format_results(results))
+
+    document = results_document(results, args.rows, args.seed, args.format, args.mode)
+    for path in filter(None, (args.output, args.save_baseline)):
+        with open(path, 'w') as f:
+            json.dump(document, f, indent=2)
+        print(f"Results saved to: {path}")
+
+    if baseline:
+        regressions = compare_to_baseline(results, baseline, args.threshold)
+        if regressions:
+            print(f"\nRegressions past {args.threshold:.0%}:\n" + '\n'.join(f"  {message}" for message in regressions))
+            sys.exit(1)
+        print(f"\nNo stage regressed past {args.threshold:.0%} of the baseline.")
+
+if __name__ == '__main__':
+    main()
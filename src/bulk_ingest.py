@@ -0,0 +1,153 @@
+import csv
+import io
+import time
+import numpy as np
+import pandas as pd
+
+# Bulk API 2.0 accepts up to 150 MB of base64-encoded CSV per job; staying at
+# 100 MB of raw CSV leaves room for the encoding overhead.
+MAX_JOB_BYTES = 100 * 1024 * 1024
+
+FINISHED_STATES = ('JobComplete', 'Failed', 'Aborted')
+
+class BulkIngestError(Exception):
+    """Raised when a Bulk API 2.0 ingest job cannot be created, uploaded or completed."""
+
+class BulkIngestClient:
+    """
+    A minimal Bulk API 2.0 ingest client.
+
+    All HTTP traffic goes through `session.request`, so the client can be pointed at a
+    real org (via `from_salesforce`) or at a local fake of the job endpoints.
+    """
+    def __init__(self, session, jobs_url, session_id, poll_interval=5, timeout=3600):
+        """
+        :param session: A requests.Session (or compatible object with a `request` method).
+        :param jobs_url: Base URL of the jobs resource, e.g. https://host/services/data/v59.0/jobs/
+        :param session_id: The Salesforce session id used as the bearer token.
+        :param poll_interval: Seconds to wait between job status checks.
+        :param timeout: Seconds to wait for a job to finish before giving up.
+        """
+        self.session = session
+        self.ingest_url = jobs_url.rstrip('/') + '/ingest'
+        self.session_id = session_id
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+
+    @classmethod
+    def from_salesforce(cls, sf, **kwargs):
+        """Builds a client that reuses the session of a simple-salesforce connection."""
+        return cls(sf.session, sf.bulk2_url, sf.session_id, **kwargs)
+
+    def ingest(self, sobject, records, operation='insert', external_id_field=None, max_job_bytes=MAX_JOB_BYTES):
+        """
+        Loads records into Salesforce, splitting them across as many jobs as needed.
+
+        :param sobject: The sObject API name, e.g. 'User'.
+        :param records: An iterable of payload dictionaries.
+        :param operation: 'insert', 'update' or 'upsert'.
+        :param external_id_field: The external ID field, required for 'upsert'.
+        :return: A tuple (successful, failed) of lists of result rows. Each row is a dict of
+                 the submitted fields plus the `sf__Id`/`sf__Created` or `sf__Error` columns.
+        """
+        if operation == 'upsert' and not external_id_field:
+            raise ValueError("An external ID field is required for a Bulk API upsert.")
+
+        successful, failed = [], []
+        for csv_data in _csv_chunks(records, max_job_bytes):
+            job_successful, job_failed = self._run_job(sobject, csv_data, operation, external_id_field)
+            successful.extend(job_successful)
+            failed.extend(job_failed)
+        return successful, failed
+
+    def _run_job(self, sobject, csv_data, operation, external_id_field):
+        job_spec = {'object': sobject, 'operation': operation, 'contentType': 'CSV', 'lineEnding': 'LF'}
+        if external_id_field:
+            job_spec['externalIdFieldName'] = external_id_field
+
+        job = self._request('POST', self.ingest_url, json=job_spec).json()
+        job_url = f"{self.ingest_url}/{job['id']}"
+        print(f"Created Bulk API 2.0 {operation} job {job['id']} for {sobject}.")
+
+        self._request('PUT', f"{job_url}/batches", data=csv_data.encode('utf-8'), content_type='text/csv')
+        self._request('PATCH', job_url, json={'state': 'UploadComplete'})
+
+        job_info = self._wait_for_job(job_url)
+        print(f"Bulk job {job['id']} finished with state {job_info['state']}: "
+              f"{job_info.get('numberRecordsProcessed', 0)} processed, {job_info.get('numberRecordsFailed', 0)} failed.")
+
+        successful = self._get_results(f"{job_url}/successfulResults/")
+        failed = self._get_results(f"{job_url}/failedResults/")
+        unprocessed = self._get_results(f"{job_url}/unprocessedrecords/")
+        job_error = job_info.get('errorMessage') or f"Record was not processed (job state: {job_info['state']})."
+        for row in unprocessed:
+            row['sf__Error'] = job_error
+        return successful, failed + unprocessed
+
+    def _wait_for_job(self, job_url):
+        deadline = time.monotonic() + self.timeout
+        while True:
+            job_info = self._request('GET', job_url).json()
+            if job_info['state'] in FINISHED_STATES:
+                return job_info
+            if time.monotonic() >= deadline:
+                raise BulkIngestError(f"Timed out waiting for bulk job {job_info.get('id')} (last state: {job_info['state']}).")
+            time.sleep(self.poll_interval)
+
+    def _get_results(self, url):
+        text = self._request('GET', url, accept='text/csv').text
+        if not text.strip():
+            return []
+        return list(csv.DictReader(io.StringIO(text)))
+
+    def _request(self, method, url, content_type='application/json', accept='application/json', **kwargs):
+        headers = {
+            'Authorization': f"Bearer {self.session_id}",
+            'Content-Type': content_type,
+            'Accept': accept
+        }
+        response = self.session.request(method, url, headers=headers, **kwargs)
+        if response.status_code >= 300:
+            raise BulkIngestError(f"Bulk API request {method} {url} failed with status {response.status_code}: {response.text}")
+        return response
+
+def _csv_chunks(records, max_bytes):
+    """
+    Serializes payload dictionaries to CSV, yielding one document per job.
+    Each document carries its own header, built from the fields present in that chunk.
+    """
+    chunk, chunk_bytes = [], 0
+    for record in records:
+        record = {field: _csv_value(value) for field, value in record.items()}
+        record_bytes = sum(len(v) + 1 for v in record.values())
+        if chunk and chunk_bytes + record_bytes > max_bytes:
+            yield _to_csv(chunk)
+            chunk, chunk_bytes = [], 0
+        chunk.append(record)
+        chunk_bytes += record_bytes
+    if chunk:
+        yield _to_csv(chunk)
+
+def _to_csv(rows):
+    fieldnames = list(dict.fromkeys(field for row in rows for field in row))
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fieldnames, lineterminator='\n')
+    writer.writeheader()
+    writer.writerows(rows)
+    return buffer.getvalue()
+
+def _csv_value(value):
+    if value is None or (not isinstance(value, (list, dict)) and pd.isna(value)):
+        return ''
+    if isinstance(value, (bool, np.bool_)):
+        return 'true' if value else 'false'
+    return str(value)
+
+def parse_bulk_error(sf_error):
+    """Turns a Bulk API `sf__Error` value ('CODE:message:fields --') into 'CODE: message'."""
+    code, _, rest = (sf_error or '').partition(':')
+    if not rest:
+        return sf_error or 'Unknown error'
+    if rest.endswith('--'):
+        rest = rest[:-2].rstrip().rpartition(':')[0] or rest
+    return f"{code}: {rest}"
@@ -0,0 +1,449 @@
+import random
+import re
+import threading
+from datetime import datetime, timezone
+
+# Key prefixes of the record Ids the fake org hands out, as in a real org.
+KEY_PREFIXES = {
+    'User': '005', 'Profile': '00e', 'UserRole': '00E', 'Group': '00G', 'GroupMember': '011',
+    'PermissionSet': '0PS', 'PermissionSetGroup': '0PG', 'PermissionSetAssignment': '0Pa'
+}
+DEFAULT_KEY_PREFIX = 'a00'
+
+REQUIRED_FIELDS = {'User': ('Username', 'LastName', 'Email')}
+
+# Junction records that Salesforce keeps unique per pair of fields
+UNIQUE_FIELD_PAIRS = {'PermissionSetAssignment': ('AssigneeId', 'PermissionSetGroupId'), 'GroupMember': ('GroupId', 'UserOrGroupId')}
+
+_FIRST_NAMES = ('Ana', 'Ben', 'Chen', 'Dana', 'Eli', 'Fatima', 'Gus', 'Hana', 'Ivan', 'Jo', 'Kim', 'Luis', 'Mia', 'Noor')
+_LAST_NAMES = ('Adams', 'Brunt', 'Cooper', 'Diaz', 'Evans', 'Gaines', 'Huang', 'Ito', 'Khan', 'Lopez', 'Novak', 'Okafor')
+
+class SalesforceRecordError(Exception):
+    """A record-level failure, reported the way Salesforce reports it (an errorCode, a message and fields)."""
+    def __init__(self, error_code, message, fields=()):
+        super().__init__(f"{error_code}: {message}")
+        self.error_code = error_code
+        self.message = message
+        self.fields = list(fields)
+
+class SoqlError(Exception):
+    """Raised for SOQL the fake org cannot parse (reported as MALFORMED_QUERY)."""
+
+class FakeOrg:
+    """
+    The in-memory records behind the fake Salesforce server.
+
+    Records are plain dicts keyed by their sObject type and Id. Queries support the SOQL
+    this tool sends: field lists with parent relationships (e.g. Profile.Name), WHERE with
+    AND/OR/NOT, comparisons, IN and LIKE, ORDER BY and LIMIT. Equality and IN filters on a
+    plain field are answered from a per-field index, so large orgs stay fast to query.
+
+    Every method is thread-safe; hold `lock` to make several calls one atomic change.
+    """
+    def __init__(self):
+        self.lock = threading.RLock()
+        self._records = {}
+        self._by_id = {}
+        self._field_names = {}
+        self._indexes = {}
+        self._next_id = 1
+
+    def insert(self, sobject, fields):
+        """
+        Creates a record and returns its Id.
+        :raises SalesforceRecordError: If a required field is missing, the Username is taken or a
+                                       junction record (see UNIQUE_FIELD_PAIRS) already exists.
+        """
+        fields = {name: value for name, value in fields.items() if name != 'attributes' and value is not None}
+        with self.lock:
+            self._validate(sobject, fields)
+            record_id = self._new_id(sobject)
+            now = _now()
+            record = {'Id': record_id, 'CreatedDate': now, 'LastModifiedDate': now, 'SystemModstamp': now, **fields}
+            if sobject == 'User':
+                record.setdefault('IsActive', True)
+                record['Name'] = ' '.join(str(record[f]) for f in ('FirstName', 'LastName') if record.get(f))
+            self._records.setdefault(sobject, {})[record_id] = record
+            self._by_id[record_id] = (sobject, record)
+            for name in record:
+                self._field_names.setdefault(sobject, {})[name.lower()] = name
+            self._index_record(sobject, record)
+            return record_id
+
+    def update(self, sobject, record_id, fields):
+        """Updates the given fields of an existing record."""
+        fields = {name: value for name, value in fields.items() if name not in ('attributes', 'Id')}
+        with self.lock:
+            entry = self._by_id.get(record_id)
+            if entry is None or entry[0] != sobject:
+                raise SalesforceRecordError('ENTITY_IS_DELETED' if entry is None else 'INVALID_ID_FIELD',
+                                            f"No {sobject} record with Id {record_id}.", ['Id'])
+            record = entry[1]
+            if sobject == 'User' and fields.get('Username') and self.find(sobject, 'Username', fields['Username']) not in (None, record_id):
+                raise SalesforceRecordError('DUPLICATE_USERNAME', 'Duplicate Username. The username already exists.', ['Username'])
+            self._unindex_record(sobject, record)
+            record.update(fields)
+            record['LastModifiedDate'] = record['SystemModstamp'] = _now()
+            for name in record:
+                self._field_names.setdefault(sobject, {})[name.lower()] = name
+            self._index_record(sobject, record)
+
+    def delete(self, record_id):
+        with self.lock:
+            sobject, record = self._by_id.pop(record_id)
+            self._unindex_record(sobject, record)
+            del self._records[sobject][record_id]
+
+    def get(self, record_id):
+        """Returns (sObject type, record) for an Id, or None."""
+        with self.lock:
+            return self._by_id.get(record_id)
+
+    def find(self, sobject, field, value):
+        """Returns the Id of a record whose field equals value (case-insensitively), or None."""
+        with self.lock:
+            ids = self._index(sobject, field).get(_index_key(value), ())
+            return next(iter(ids), None)
+
+    def count(self, sobject):
+        with self.lock:
+            return len(self._records.get(sobject, {}))
+
+    def query(self, soql):
+        """
+        Runs a SOQL query.
+        :return: A list of result records in Salesforce's JSON shape (without the 'attributes' urls).
+        :raises SoqlError: If the query uses SOQL the fake org does not support.
+        """
+        parsed = _parse_soql(soql)
+        sobject = parsed['from']
+        with self.lock:
+            records = self._candidates(sobject, parsed['where'])
+            if parsed['where'] is not None:
+                records = [r for r in records if self._matches(r, parsed['where'])]
+            for field, descending in reversed(parsed['order_by']):
+                records.sort(key=lambda r: _sort_key(self._value(sobject, r, field)), reverse=descending)
+            if parsed['limit'] is not None:
+                records = records[:parsed['limit']]
+            return [self._project(sobject, r, parsed['fields']) for r in records]
+
+    def add_users(self, count, seed=0, domain='example.com'):
+        """Seeds the org with `count` active Users with deterministic names and emails."""
+        rng = random.Random(seed)
+        profile_id = self.find('Profile', 'Name', 'Standard User') or self.insert('Profile', {'Name': 'Standard User'})
+        start = self.count('User')
+        for n in range(start, start + count):
+            first, last = rng.choice(_FIRST_NAMES), rng.choice(_LAST_NAMES)
+            email = f"{first}.{last}{n}@{domain}".lower()
+            self.insert('User', {'FirstName': first, 'LastName': last, 'Email': email, 'Username': f"{email}.org",
+                                 'Alias': f"{first[:1]}{last[:4]}{n}"[:8].lower(), 'ProfileId': profile_id})
+
+    def add_queues(self, names):
+        """Creates a Queue (a Group of Type 'Queue') for every name that does not exist yet."""
+        for name in names:
+            if not any(r.get('Type') == 'Queue' for r in self.query(f"SELECT Type FROM Group WHERE Name = '{_escape(name)}'")):
+                self.insert('Group', {'Name': name, 'Type': 'Queue'})
+
+    def _validate(self, sobject, fields):
+        missing = [f for f in REQUIRED_FIELDS.get(sobject, ()) if fields.get(f) in (None, '')]
+        if missing:
+            raise SalesforceRecordError('REQUIRED_FIELD_MISSING', f"Required fields are missing: [{', '.join(missing)}]", missing)
+        if sobject == 'User' and self.find('User', 'Username', fields['Username']):
+            raise SalesforceRecordError('DUPLICATE_USERNAME', 'Duplicate Username. The username already exists.', ['Username'])
+        if sobject in UNIQUE_FIELD_PAIRS:
+            first, second = UNIQUE_FIELD_PAIRS[sobject]
+            for record_id in self._index(sobject, first).get(_index_key(fields.get(first)), ()):
+                if _index_key(self._records[sobject][record_id].get(second)) == _index_key(fields.get(second)):
+                    raise SalesforceRecordError('DUPLICATE_VALUE', f"duplicate value found: {first}, {second} duplicates value on record with id: {record_id}", [])
+
+    def _new_id(self, sobject):
+        prefix = KEY_PREFIXES.get(sobject, DEFAULT_KEY_PREFIX)
+        record_id = f"{prefix}FAKE{self._next_id:08d}AAA"
+        self._next_id += 1
+        return record_id
+
+    def _canonical(self, sobject, field):
+        """Resolves a field name case-insensitively, as SOQL does."""
+        return self._field_names.get(sobject, {}).get(field.lower(), field)
+
+    def _index(self, sobject, field):
+        """Returns the {lowercased value: set of Ids} index of a field, building it on first use."""
+        field = self._canonical(sobject, field)
+        key = (sobject, field)
+        if key not in self._indexes:
+            index = {}
+            for record in self._records.get(sobject, {}).values():
+                if record.get(field) is not None:
+                    index.setdefault(_index_key(record[field]), set()).add(record['Id'])
+            self._indexes[key] = index
+        return self._indexes[key]
+
+    def _index_record(self, sobject, record):
+        for (indexed_sobject, field), index in self._indexes.items():
+            if indexed_sobject == sobject and record.get(field) is not None:
+                index.setdefault(_index_key(record[field]), set()).add(record['Id'])
+
+    def _unindex_record(self, sobject, record):
+        for (indexed_sobject, field), index in self._indexes.items():
+            if indexed_sobject == sobject and record.get(field) is not None:
+                index.get(_index_key(record[field]), set()).discard(record['Id'])
+
+    def _candidates(self, sobject, where):
+        """Narrows the records to scan to those matching the most selective equality or IN filter the WHERE clause requires."""
+        records = self._records.get(sobject, {})
+        best = None
+        for op, field, value in _required_conditions(where):
+            if '.' in field or op not in ('=', 'IN'):
+                continue
+            ids = set()
+            index = self._index(sobject, field)
+            for v in (value if op == 'IN' else [value]):
+                ids.update(index.get(_index_key(v), ()))
+            if best is None or len(ids) < len(best):
+                best = ids
+        if best is None:
+            return list(records.values())
+        return [records[i] for i in sorted(best)]
+
+    def _value(self, sobject, record, field):
+        """Reads a field, following parent relationships such as Profile.Name through their Id field."""
+        *relationships, name = field.split('.')
+        for relationship in relationships:
+            parent = self._by_id.get(record.get(self._canonical(sobject, relationship + 'Id')))
+            if parent is None:
+                return None
+            sobject, record = parent
+        return record.get(self._canonical(sobject, name))
+
+    def _matches(self, record, condition):
+        op = condition[0]
+        if op == 'AND':
+            return self._matches(record, condition[1]) and self._matches(record, condition[2])
+        if op == 'OR':
+            return self._matches(record, condition[1]) or self._matches(record, condition[2])
+        if op == 'NOT':
+            return not self._matches(record, condition[1])
+        sobject = self._by_id[record['Id']][0]
+        return _compare(op, self._value(sobject, record, condition[1]), condition[2])
+
+    def _project(self, sobject, record, fields):
+        result = {'attributes': {'type': sobject}}
+        for field in fields:
+            *relationships, name = field.split('.')
+            target, target_sobject, source = result, sobject, record
+            for relationship in relationships:
+                parent = self._by_id.get(source.get(self._canonical(target_sobject, relationship + 'Id')))
+                if parent is None:
+                    target[relationship] = None
+                    break
+                target_sobject, source = parent
+                nested = target.get(relationship) or {'attributes': {'type': target_sobject}}
+                target[relationship] = nested
+                target = nested
+            else:
+                target[name] = source.get(self._canonical(target_sobject, name))
+        return result
+
+_TOKEN = re.compile(r"""\s*(?:
+    (?P<string>'(?:[^'\\]|\\.)*')
+   |(?P<op><=|>=|!=|<>|=|<|>)
+   |(?P<punct>[(),])
+   |(?P<word>[A-Za-z_][\w.]*)
+   |(?P<literal>[-+]?[\w:.+-]+)
+)""", re.VERBOSE)
+
+_UNESCAPE = re.compile(r"\\(.)")
+_UNESCAPED_CHARS = {'n': '\n', 'r': '\r', 't': '\t', 'b': '\b', 'f': '\f'}
+_DATETIME = re.compile(r'^\d{4}-\d{2}-\d{2}(T\d{2}:\d{2}:\d{2}(\.\d+)?(Z|[+-]\d{2}:?\d{2}))?$')
+
+def _tokenize(soql):
+    tokens, position = [], 0
+    soql = soql.strip()
+    while position < len(soql):
+        match = _TOKEN.match(soql, position)
+        if not match or match.end() == position:
+            raise SoqlError(f"Unexpected character at position {position}: {soql[position:position + 20]!r}")
+        kind = match.lastgroup
+        text = match.group(kind)
+        if kind == 'string':
+            tokens.append(('value', _UNESCAPE.sub(lambda m: _UNESCAPED_CHARS.get(m.group(1), m.group(1)), text[1:-1])))
+        elif kind == 'literal' or (kind == 'word' and text.lower() in ('true', 'false', 'null')):
+            tokens.append(('value', _literal(text)))
+        else:
+            tokens.append((kind, text))
+        position = match.end()
+    return tokens
+
+def _literal(text):
+    lowered = text.lower()
+    if lowered in ('true', 'false'):
+        return lowered == 'true'
+    if lowered == 'null':
+        return None
+    try:
+        return int(text)
+    except ValueError:
+        pass
+    try:
+        return float(text)
+    except ValueError:
+        return text
+
+class _Parser:
+    def __init__(self, soql):
+        self.tokens = _tokenize(soql)
+        self.position = 0
+
+    def peek_keyword(self, *keywords):
+        if self.position < len(self.tokens):
+            kind, text = self.tokens[self.position]
+            return kind == 'word' and text.upper() in keywords
+        return False
+
+    def take(self, kind=None, keyword=None):
+        if self.position >= len(self.tokens):
+            raise SoqlError(f"Unexpected end of query, expected {keyword or kind}.")
+        token = self.tokens[self.position]
+        if (kind and token[0] != kind) or (keyword and (token[0] != 'word' or token[1].upper() != keyword)):
+            raise SoqlError(f"Unexpected token {token[1]!r}, expected {keyword or kind}.")
+        self.position += 1
+        return token[1]
+
+    def parse(self):
+        self.take(keyword='SELECT')
+        fields = [self.take('word')]
+        while self.tokens[self.position] == ('punct', ','):
+            self.position += 1
+            fields.append(self.take('word'))
+        self.take(keyword='FROM')
+        parsed = {'fields': fields, 'from': self.take('word'), 'where': None, 'order_by': [], 'limit': None}
+        if self.peek_keyword('WHERE'):
+            self.position += 1
+            parsed['where'] = self.parse_or()
+        if self.peek_keyword('ORDER'):
+            self.position += 1
+            self.take(keyword='BY')
+            while True:
+                field = self.take('word')
+                descending = False
+                if self.peek_keyword('ASC', 'DESC'):
+                    descending = self.take('word').upper() == 'DESC'
+                parsed['order_by'].append((field, descending))
+                if self.position < len(self.tokens) and self.tokens[self.position] == ('punct', ','):
+                    self.position += 1
+                    continue
+                break
+        if self.peek_keyword('LIMIT'):
+            self.position += 1
+            parsed['limit'] = int(self.take('value'))
+        if self.position != len(self.tokens):
+            raise SoqlError(f"Unexpected token {self.tokens[self.position][1]!r}.")
+        return parsed
+
+    def parse_or(self):
+        condition = self.parse_and()
+        while self.peek_keyword('OR'):
+            self.position += 1
+            condition = ('OR', condition, self.parse_and())
+        return condition
+
+    def parse_and(self):
+        condition = self.parse_condition()
+        while self.peek_keyword('AND'):
+            self.position += 1
+            condition = ('AND', condition, self.parse_condition())
+        return condition
+
+    def parse_condition(self):
+        if self.peek_keyword('NOT'):
+            self.position += 1
+            return ('NOT', self.parse_condition())
+        if self.tokens[self.position] == ('punct', '('):
+            self.position += 1
+            condition = self.parse_or()
+            self.take('punct')
+            return condition
+        field = self.take('word')
+        if self.peek_keyword('NOT'):
+            self.position += 1
+            self.take(keyword='IN')
+            return ('NOT', ('IN', field, self.parse_values()))
+        if self.peek_keyword('IN'):
+            self.position += 1
+            return ('IN', field, self.parse_values())
+        if self.peek_keyword('LIKE'):
+            self.position += 1
+            return ('LIKE', field, self.take('value'))
+        op = self.take('op')
+        return ('!=' if op == '<>' else op, field, self.take('value'))
+
+    def parse_values(self):
+        self.take('punct')
+        values = [self.take('value')]
+        while self.tokens[self.position] == ('punct', ','):
+            self.position += 1
+            values.append(self.take('value'))
+        self.take('punct')
+        return values
+
+def _parse_soql(soql):
+    try:
+        return _Parser(soql).parse()
+    except IndexError:
+        raise SoqlError("Unexpected end of query.")
+
+def _required_conditions(where):
+    """Yields the conditions every matching record must satisfy (the operands of top-level ANDs)."""
+    if where is None:
+        return
+    if where[0] == 'AND':
+        yield from _required_conditions(where[1])
+        yield from _required_conditions(where[2])
+    elif where[0] not in ('OR', 'NOT'):
+        yield where
+
+def _compare(op, value, operand):
+    if op == 'IN':
+        return any(_compare('=', value, v) for v in operand)
+    if op == 'LIKE':
+        if value is None:
+            return False
+        pattern = ''.join('.*' if c == '%' else '.' if c == '_' else re.escape(c) for c in operand)
+        return re.fullmatch(pattern, str(value), re.IGNORECASE | re.DOTALL) is not None
+    if value is None or operand is None:
+        return (value is None and operand is None) if op == '=' else (op == '!=' and value is not operand)
+    left, right = _comparable(value), _comparable(operand)
+    if type(left) is not type(right) and not all(isinstance(v, (int, float)) for v in (left, right)):
+        left, right = str(value).lower(), str(operand).lower()
+    try:
+        return {'=': left == right, '!=': left != right, '<': left < right, '<=': left <= right,
+                '>': left > right, '>=': left >= right}[op]
+    except TypeError:
+        return False
+
+def _comparable(value):
+    """Makes datetimes comparable whatever their format, and strings case-insensitive."""
+    if isinstance(value, str):
+        if _DATETIME.match(value):
+            return _parse_datetime(value)
+        return value.lower()
+    return value
+
+def _parse_datetime(value):
+    if 'T' not in value:
+        return datetime.strptime(value, '%Y-%m-%d').replace(tzinfo=timezone.utc)
+    return datetime.fromisoformat(value.replace('Z', '+00:00'))
+
+def _sort_key(value):
+    # Nulls sort first in ascending order, as in SOQL
+    comparable = _comparable(value)
+    return (value is not None, str(type(comparable)), comparable if value is not None else 0)
+
+def _index_key(value):
+    return str(value).lower()
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace("'", "\\'")
+
+def _now():
+    return datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + '+0000'
@@ -0,0 +1,686 @@
+import argparse
+import csv
+import gzip
+import io
+import json
+import os
+import random
+import re
+import secrets
+import ssl
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+from xml.sax.saxutils import escape as xml_escape
+from src.fake_org import FakeOrg, SalesforceRecordError, SoqlError
+
+try:
+    from cryptography import x509
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives.asymmetric import ec
+    from cryptography.x509.oid import NameOID
+    import ipaddress
+    CRYPTOGRAPHY_AVAILABLE = True
+except ImportError:
+    CRYPTOGRAPHY_AVAILABLE = False
+
+DEFAULT_PORT = 8443
+DEFAULT_CERT_DIR = '.fake_salesforce'
+DEFAULT_API_LIMIT = 15000
+API_VERSION = '59.0'
+ORG_ID = '00DFAKE000000001AAA'
+
+# Salesforce limits the fake server enforces, so oversized requests fail here as they would in an org.
+QUERY_BATCH_SIZE = 2000
+MAX_COLLECTION_RECORDS = 200
+MAX_GRAPHS_PER_REQUEST = 75
+MAX_GRAPH_NODES = 500
+
+# Responses at least this large are gzip-compressed when the client accepts it.
+GZIP_MIN_BYTES = 1024
+
+_DATA_PATH = re.compile(r'^/services/data/v(?P<version>[\d.]+)(?P<resource>/.*)?$')
+_REFERENCE = re.compile(r'@\{(\w+)\.(\w+)\}')
+
+class FaultProfile:
+    """
+    How the fake server deviates from an idle, healthy org.
+
+    Latency is added to every API request, plus record_latency for each record a request writes.
+    error_rate answers that share of requests with 503 SERVER_UNAVAILABLE, and lock_error_rate
+    fails that share of record writes with UNABLE_TO_LOCK_ROW. Past api_limit calls every request
+    is refused with REQUEST_LIMIT_EXCEEDED, as it is past max_concurrent requests in flight.
+    """
+    def __init__(self, latency=0.0, latency_jitter=0.0, record_latency=0.0, error_rate=0.0, lock_error_rate=0.0,
+                 api_limit=DEFAULT_API_LIMIT, max_concurrent=None, seed=None):
+        for name, rate in (('error_rate', error_rate), ('lock_error_rate', lock_error_rate)):
+            if not 0 <= rate <= 1:
+                raise ValueError(f"{name} must be between 0 and 1, got {rate}.")
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.record_latency = record_latency
+        self.error_rate = error_rate
+        self.lock_error_rate = lock_error_rate
+        self.api_limit = api_limit
+        self.max_concurrent = max_concurrent
+        self.seed = seed
+
+class FakeSalesforce:
+    """
+    The request handling of the fake Salesforce server, independent of any socket.
+
+    Serves SOAP and OAuth login, the REST resource list, query and queryMore, sObject create
+    and retrieve, sObject Collections inserts, Composite Graph and Bulk API 2.0 ingest jobs
+    on top of a FakeOrg. Every data API call counts against the daily allocation reported in
+    the Sforce-Limit-Info header, and request_counts tallies the calls per endpoint.
+    """
+    def __init__(self, org=None, faults=None, session_id=None):
+        self.org = org or FakeOrg()
+        self.faults = faults or FaultProfile()
+        self.session_id = session_id or secrets.token_hex(24)
+        self.request_counts = Counter()
+        self.api_calls = 0
+        self._session_ids = {self.session_id}
+        self._rng = random.Random(self.faults.seed)
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._cursors = {}
+        self._jobs = {}
+
+    def handle(self, method, target, headers, body, base_url):
+        """
+        Answers one request.
+        :param target: The request path, including any query string.
+        :param headers: A mapping of request headers (case-insensitive lookups are not required).
+        :param body: The raw (already decompressed) request body.
+        :param base_url: The server's own URL, e.g. https://localhost:8443, for login responses.
+        :return: A tuple (status, headers dict, body bytes).
+        """
+        url = urlsplit(target)
+        path = url.path.rstrip('/') or '/'
+        if method == 'POST' and path.startswith('/services/Soap/u/'):
+            return self._soap_login(body, base_url, path)
+        if method == 'POST' and path == '/services/oauth2/token':
+            return self._oauth_token(base_url)
+        if path == '/services/data' and method == 'GET':
+            return _json(200, [{'label': 'Fake', 'url': f"/services/data/v{API_VERSION}", 'version': API_VERSION}])
+
+        match = _DATA_PATH.match(path)
+        if not match:
+            return _error(404, 'NOT_FOUND', 'The requested resource does not exist')
+        if not self._authorized(headers):
+            return _error(401, 'INVALID_SESSION_ID', 'Session expired or invalid')
+
+        with self._lock:
+            self._in_flight += 1
+            self.api_calls += 1
+            calls, in_flight = self.api_calls, self._in_flight
+        try:
+            if self.faults.max_concurrent and in_flight > self.faults.max_concurrent:
+                response = _error(403, 'REQUEST_LIMIT_EXCEEDED', 'ConcurrentPerOrgLongTxn Limit exceeded.')
+            elif calls > self.faults.api_limit:
+                response = _error(403, 'REQUEST_LIMIT_EXCEEDED', 'TotalRequests Limit exceeded.')
+            else:
+                self._sleep(self.faults.latency + self._random() * self.faults.latency_jitter)
+                if self._random() < self.faults.error_rate:
+                    response = _error(503, 'SERVER_UNAVAILABLE', 'Server temporarily unavailable; try again later.')
+                else:
+                    response = self._route(method, match.group('version'), match.group('resource') or '/',
+                                           parse_qs(url.query), body)
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+        status, response_headers, payload = response
+        response_headers['Sforce-Limit-Info'] = f"api-usage={min(calls, self.faults.api_limit)}/{self.faults.api_limit}"
+        return status, response_headers, payload
+
+    def _route(self, method, version, resource, params, body):
+        parts = [p for p in resource.split('/') if p]
+        endpoint = '/'.join(parts[:2]) if parts[:1] in (['composite'], ['jobs']) else (parts[0] if parts else '')
+        self.request_counts[f"{method} {endpoint or '/'}"] += 1
+        try:
+            if not parts and method == 'GET':
+                return _json(200, {name: f"/services/data/v{version}/{name}" for name in ('sobjects', 'query', 'composite', 'jobs')})
+            if parts[0] == 'query' and method == 'GET':
+                return self._query(version, params.get('q', [''])[0]) if len(parts) == 1 else self._query_more(version, parts[1])
+            if parts[0] == 'sobjects' and len(parts) == 2 and method == 'POST':
+                return self._create(parts[1], _json_body(body))
+            if parts[0] == 'sobjects' and len(parts) == 3 and method == 'GET':
+                return self._retrieve(parts[1], parts[2])
+            if parts[:2] == ['composite', 'sobjects'] and method == 'POST':
+                return self._collection_insert(_json_body(body))
+            if parts[:2] == ['composite', 'sobjects'] and len(parts) == 4 and method == 'PATCH':
+                return self._collection_upsert(parts[2], parts[3], _json_body(body))
+            if parts[:2] == ['composite', 'graph'] and method == 'POST':
+                return self._graph(version, _json_body(body))
+            if parts[:2] == ['jobs', 'ingest']:
+                return self._ingest(method, parts[2:], body)
+        except ValueError as e:
+            return _error(400, 'JSON_PARSER_ERROR', str(e))
+        return _error(404, 'NOT_FOUND', 'The requested resource does not exist')
+
+    # --- Authentication ---
+
+    def _soap_login(self, body, base_url, path):
+        username = re.search(rb'<(?:\w+:)?username>(.*?)</(?:\w+:)?username>', body)
+        if not username:
+            return 500, {'Content-Type': 'text/xml'}, _soap_fault('INVALID_LOGIN', 'Invalid username, password, security token; or user locked out.')
+        session_id = self._new_session()
+        version = path.rsplit('/', 1)[-1]
+        xml = (
+            '<?xml version="1.0" encoding="UTF-8"?>'
+            '<soapenv:Envelope xmlns:soapenv="http://schemas.xmlsoap.org/soap/envelope/" xmlns="urn:partner.soap.sforce.com">'
+            '<soapenv:Body><loginResponse><result>'
+            f'<serverUrl>{base_url}/services/Soap/u/{version}/{ORG_ID}</serverUrl>'
+            f'<sessionId>{session_id}</sessionId>'
+            f'<userInfo><organizationId>{ORG_ID}</organizationId><userName>{xml_escape(username.group(1).decode())}</userName></userInfo>'
+            '</result></loginResponse></soapenv:Body></soapenv:Envelope>'
+        )
+        return 200, {'Content-Type': 'text/xml; charset=utf-8'}, xml.encode('utf-8')
+
+    def _oauth_token(self, base_url):
+        return _json(200, {'access_token': self._new_session(), 'instance_url': base_url, 'token_type': 'Bearer',
+                           'id': f"{base_url}/id/{ORG_ID}", 'issued_at': str(int(time.time() * 1000))})
+
+    def _new_session(self):
+        session_id = f"{ORG_ID}!{secrets.token_hex(24)}"
+        with self._lock:
+            self._session_ids.add(session_id)
+        return session_id
+
+    def _authorized(self, headers):
+        token = (headers.get('Authorization') or '').partition(' ')[2] or headers.get('X-SFDC-Session')
+        with self._lock:
+            return token in self._session_ids
+
+    # --- Query ---
+
+    def _query(self, version, soql):
+        try:
+            records = self.org.query(soql)
+        except SoqlError as e:
+            return _error(400, 'MALFORMED_QUERY', str(e))
+        return _json(200, self._query_page(version, records, 0))
+
+    def _query_more(self, version, locator):
+        cursor_id, _, offset = locator.partition('-')
+        with self._lock:
+            records = self._cursors.get(cursor_id)
+        if records is None or not offset.isdigit():
+            return _error(400, 'INVALID_QUERY_LOCATOR', 'invalid query locator')
+        return _json(200, self._query_page(version, records, int(offset), cursor_id))
+
+    def _query_page(self, version, records, offset, cursor_id=None):
+        end = offset + QUERY_BATCH_SIZE
+        page = {'totalSize': len(records), 'done': end >= len(records), 'records': records[offset:end]}
+        if end < len(records):
+            if cursor_id is None:
+                cursor_id = f"01gFAKE{secrets.token_hex(6)}"
+                with self._lock:
+                    self._cursors[cursor_id] = records
+            page['nextRecordsUrl'] = f"/services/data/v{version}/query/{cursor_id}-{end}"
+        elif cursor_id is not None:
+            with self._lock:
+                self._cursors.pop(cursor_id, None)
+        return page
+
+    # --- Records ---
+
+    def _insert(self, sobject, fields):
+        """Inserts one record, failing it with UNABLE_TO_LOCK_ROW at the configured rate."""
+        if self._random() < self.faults.lock_error_rate:
+            raise SalesforceRecordError('UNABLE_TO_LOCK_ROW', 'unable to obtain exclusive access to this record or 1 records')
+        return self.org.insert(sobject, fields)
+
+    def _create(self, sobject, fields):
+        self._sleep(self.faults.record_latency)
+        try:
+            record_id = self._insert(sobject, fields)
+        except SalesforceRecordError as e:
+            return _json(400, [{'message': e.message, 'errorCode': e.error_code, 'fields': e.fields}])
+        return _json(201, {'id': record_id, 'success': True, 'errors': []})
+
+    def _retrieve(self, sobject, record_id):
+        entry = self.org.get(record_id)
+        if entry is None or entry[0] != sobject:
+            return _error(404, 'NOT_FOUND', 'The requested resource does not exist')
+        return _json(200, {'attributes': {'type': sobject}, **entry[1]})
+
+    def _collection_insert(self, request):
+        records = request.get('records') or []
+        if len(records) > MAX_COLLECTION_RECORDS:
+            return _error(400, 'EXCEEDED_ID_LIMIT', f"record limit reached. cannot submit more than {MAX_COLLECTION_RECORDS} records into this call")
+        self._sleep(self.faults.record_latency * len(records))
+
+        results, created = [], []
+        with self.org.lock:
+            for record in records:
+                sobject = (record.get('attributes') or {}).get('type')
+                try:
+                    if not sobject:
+                        raise SalesforceRecordError('INVALID_TYPE', 'Each record needs an attributes.type.')
+                    record_id = self._insert(sobject, record)
+                    created.append(record_id)
+                    results.append({'id': record_id, 'success': True, 'errors': []})
+                except SalesforceRecordError as e:
+                    results.append({'success': False, 'errors': [_record_error(e)]})
+            if request.get('allOrNone') and any(not r['success'] for r in results):
+                for record_id in created:
+                    self.org.delete(record_id)
+                results = [r if not r['success'] else {'success': False, 'errors': [{
+                    'statusCode': 'ALL_OR_NONE_OPERATION_ROLLED_BACK', 'message': 'Record rolled back because not all records were valid and the request was using AllOrNone header', 'fields': []}]}
+                    for r in results]
+        return _json(200, results)
+
+    def _collection_upsert(self, sobject, key_field, request):
+        records = request.get('records') or []
+        if len(records) > MAX_COLLECTION_RECORDS:
+            return _error(400, 'EXCEEDED_ID_LIMIT', f"record limit reached. cannot submit more than {MAX_COLLECTION_RECORDS} records into this call")
+        self._sleep(self.faults.record_latency * len(records))
+
+        results = []
+        with self.org.lock:
+            for record in records:
+                try:
+                    record_id, created = self._upsert(sobject, key_field, {k: v for k, v in record.items() if k != 'attributes'})
+                    results.append({'id': record_id, 'success': True, 'errors': [], 'created': created})
+                except SalesforceRecordError as e:
+                    results.append({'id': None, 'success': False, 'errors': [_record_error(e)], 'created': False})
+        return _json(200, results)
+
+    def _upsert(self, sobject, key_field, fields):
+        """Updates the record whose key_field matches, or inserts one. :return: (record Id, whether it was created)."""
+        if fields.get(key_field) in (None, ''):
+            raise SalesforceRecordError('REQUIRED_FIELD_MISSING', f"Required fields are missing: [{key_field}]", [key_field])
+        record_id = self.org.find(sobject, key_field, fields[key_field])
+        if record_id is None:
+            return self._insert(sobject, fields), True
+        self._update(sobject, record_id, fields)
+        return record_id, False
+
+    def _update(self, sobject, record_id, fields):
+        """Updates one record, failing it with UNABLE_TO_LOCK_ROW at the configured rate."""
+        if self._random() < self.faults.lock_error_rate:
+            raise SalesforceRecordError('UNABLE_TO_LOCK_ROW', 'unable to obtain exclusive access to this record or 1 records')
+        self.org.update(sobject, record_id, fields)
+
+    def _graph(self, version, request):
+        graphs = request.get('graphs') or []
+        if len(graphs) > MAX_GRAPHS_PER_REQUEST or sum(len(g.get('compositeRequest') or []) for g in graphs) > MAX_GRAPH_NODES:
+            return _error(400, 'INVALID_REQUEST', f"A request can hold at most {MAX_GRAPHS_PER_REQUEST} graphs and {MAX_GRAPH_NODES} nodes.")
+        node_count = sum(len(g.get('compositeRequest') or []) for g in graphs)
+        self._sleep(self.faults.record_latency * node_count)
+        return _json(200, {'graphs': [self._run_graph(version, graph) for graph in graphs]})
+
+    def _run_graph(self, version, graph):
+        """Runs a graph's nodes in order and rolls every insert back if any node fails."""
+        nodes = graph.get('compositeRequest') or []
+        responses, created, failed = [], [], False
+        with self.org.lock:
+            for node in nodes:
+                ref = node.get('referenceId')
+                if failed:
+                    responses.append(_halted(ref))
+                    continue
+                try:
+                    sobject = _graph_sobject(node)
+                    body = _resolve_references(node.get('body') or {}, responses)
+                    record_id = self._insert(sobject, body)
+                    created.append(record_id)
+                    responses.append({'body': {'id': record_id, 'success': True, 'errors': []},
+                                      'httpHeaders': {'Location': f"/services/data/v{version}/sobjects/{sobject}/{record_id}"},
+                                      'httpStatusCode': 201, 'referenceId': ref})
+                except SalesforceRecordError as e:
+                    failed = True
+                    responses.append({'body': [{'errorCode': e.error_code, 'message': e.message}],
+                                      'httpHeaders': {}, 'httpStatusCode': 400, 'referenceId': ref})
+            if failed:
+                for record_id in created:
+                    self.org.delete(record_id)
+                responses = [r if r['httpStatusCode'] >= 400 else _halted(r['referenceId']) for r in responses]
+        return {'graphId': graph.get('graphId'), 'isSuccessful': not failed, 'graphResponse': {'compositeResponse': responses}}
+
+    # --- Bulk API 2.0 ---
+
+    def _ingest(self, method, parts, body):
+        if not parts and method == 'POST':
+            return self._create_job(_json_body(body))
+        job = self._jobs.get(parts[0]) if parts else None
+        if job is None:
+            return _error(404, 'NOT_FOUND', 'The requested job does not exist')
+        if len(parts) == 1 and method == 'GET':
+            return _json(200, _job_info(job))
+        if len(parts) == 1 and method == 'PATCH':
+            return self._change_job_state(job, _json_body(body).get('state'))
+        if parts[1:] == ['batches'] and method == 'PUT':
+            if job['state'] != 'Open':
+                return _error(400, 'INVALIDJOBSTATE', f"Job is in state {job['state']}; data can only be uploaded to Open jobs.")
+            job['data'].append(body.decode('utf-8'))
+            return 201, {}, b''
+        if len(parts) == 2 and method == 'GET' and parts[1] in ('successfulResults', 'failedResults', 'unprocessedrecords'):
+            rows = {'successfulResults': job['successful'], 'failedResults': job['failed'], 'unprocessedrecords': []}[parts[1]]
+            return 200, {'Content-Type': 'text/csv'}, _to_csv(rows).encode('utf-8')
+        return _error(404, 'NOT_FOUND', 'The requested resource does not exist')
+
+    def _create_job(self, spec):
+        operation = spec.get('operation')
+        if not spec.get('object') or operation not in ('insert', 'update', 'upsert'):
+            return _error(400, 'INVALIDJOB', 'A job needs an object and an insert, update or upsert operation.')
+        if operation == 'upsert' and not spec.get('externalIdFieldName'):
+            return _error(400, 'INVALIDJOB', 'An upsert job needs an externalIdFieldName.')
+        job_id = f"750FAKE{secrets.token_hex(6)}"
+        now = datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.000+0000')
+        job = {'id': job_id, 'object': spec['object'], 'operation': operation, 'externalIdFieldName': spec.get('externalIdFieldName'),
+               'state': 'Open', 'createdDate': now, 'contentType': 'CSV', 'lineEnding': spec.get('lineEnding', 'LF'),
+               'data': [], 'successful': [], 'failed': []}
+        with self._lock:
+            self._jobs[job_id] = job
+        return _json(200, _job_info(job))
+
+    def _change_job_state(self, job, state):
+        if state == 'Aborted':
+            job['state'] = 'Aborted'
+        elif state == 'UploadComplete' and job['state'] == 'Open':
+            job['state'] = 'InProgress'
+            self._process_job(job)
+        else:
+            return _error(400, 'INVALIDJOBSTATE', f"Cannot change a job in state {job['state']} to {state}.")
+        return _json(200, _job_info(job))
+
+    def _process_job(self, job):
+        rows = [row for data in job['data'] for row in csv.DictReader(io.StringIO(data))]
+        self._sleep(self.faults.record_latency * len(rows))
+        for row in rows:
+            fields = {name: _bulk_value(value) for name, value in row.items() if value != ''}
+            try:
+                record_id, created = self._write_bulk_row(job, fields)
+                job['successful'].append({'sf__Id': record_id, 'sf__Created': 'true' if created else 'false', **row})
+            except SalesforceRecordError as e:
+                job['failed'].append({'sf__Id': fields.get('Id', ''), 'sf__Error': f"{e.error_code}:{e.message}:{','.join(e.fields)} --", **row})
+        job['state'] = 'JobComplete'
+
+    def _write_bulk_row(self, job, fields):
+        """Applies one row of a job. :return: (record Id, whether the record was created)."""
+        sobject, operation = job['object'], job['operation']
+        if operation == 'insert':
+            return self._insert(sobject, fields), True
+        if operation == 'upsert':
+            return self._upsert(sobject, job['externalIdFieldName'], fields)
+        record_id = fields.pop('Id', None)
+        if not record_id:
+            raise SalesforceRecordError('MISSING_ARGUMENT', 'Id not specified in an update call', ['Id'])
+        self._update(sobject, record_id, fields)
+        return record_id, False
+
+    # --- Helpers ---
+
+    def _random(self):
+        with self._lock:
+            return self._rng.random()
+
+    def _sleep(self, seconds):
+        if seconds > 0:
+            time.sleep(seconds)
+
+class _RequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server_version = 'FakeSalesforce/1.0'
+
+    def setup(self):
+        # The TLS handshake runs here, on the request's own thread, rather than in the accept loop
+        if isinstance(self.request, ssl.SSLSocket):
+            self.request.do_handshake()
+        super().setup()
+
+    def do_GET(self):
+        self._dispatch('GET')
+
+    def do_POST(self):
+        self._dispatch('POST')
+
+    def do_PUT(self):
+        self._dispatch('PUT')
+
+    def do_PATCH(self):
+        self._dispatch('PATCH')
+
+    def do_DELETE(self):
+        self._dispatch('DELETE')
+
+    def _dispatch(self, method):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        if self.headers.get('Content-Encoding', '').lower() == 'gzip':
+            body = gzip.decompress(body)
+
+        status, headers, payload = self.server.app.handle(method, self.path, self.headers, body, self.server.base_url)
+        if len(payload) >= GZIP_MIN_BYTES and 'gzip' in self.headers.get('Accept-Encoding', ''):
+            payload = gzip.compress(payload, compresslevel=5)
+            headers['Content-Encoding'] = 'gzip'
+
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+class _HTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+    def handle_error(self, request, client_address):
+        # Clients that drop the connection or reject the certificate are routine; only trace them when asked
+        if self.verbose:
+            super().handle_error(request, client_address)
+
+class FakeSalesforceServer:
+    """
+    Serves a FakeSalesforce over HTTPS on a background thread.
+
+    Salesforce clients only speak HTTPS, so the server needs a certificate: pass certfile and
+    keyfile, or let it create a self-signed one for the host in cert_dir (this needs the
+    `cryptography` package). Clients trust it through the certificate file, `ca_bundle`.
+    """
+    def __init__(self, app=None, host='localhost', port=0, certfile=None, keyfile=None, cert_dir=None, verbose=False):
+        self.app = app or FakeSalesforce()
+        self.host = host
+        self.port = port
+        self.verbose = verbose
+        if certfile is None:
+            certfile, keyfile = generate_self_signed_cert(cert_dir or tempfile.mkdtemp(prefix='fake_salesforce_'), host)
+        self.ca_bundle = certfile
+        self._keyfile = keyfile
+        self._server = None
+        self._thread = None
+
+    @property
+    def instance_url(self):
+        return f"https://{self.host}:{self.port}"
+
+    def start(self):
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(self.ca_bundle, self._keyfile)
+        self._server = _HTTPServer((self.host, self.port), _RequestHandler)
+        self._server.socket = context.wrap_socket(self._server.socket, server_side=True, do_handshake_on_connect=False)
+        self.port = self._server.server_address[1]
+        self._server.app = self.app
+        self._server.base_url = self.instance_url
+        self._server.verbose = self.verbose
+        self._thread = threading.Thread(target=self._server.serve_forever, name='fake-salesforce', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._thread.join()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+def generate_self_signed_cert(directory, host='localhost'):
+    """
+    Writes a self-signed certificate and key for host (and 127.0.0.1) into directory.
+    :return: A tuple (certificate path, key path).
+    """
+    if not CRYPTOGRAPHY_AVAILABLE:
+        raise RuntimeError("Creating a certificate for the fake Salesforce server needs the 'cryptography' package; "
+                           "install it or pass an existing certificate and key.")
+    os.makedirs(directory, exist_ok=True)
+    key = ec.generate_private_key(ec.SECP256R1())
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, host)])
+    now = datetime.now(timezone.utc)
+    alt_names = {x509.DNSName(host), x509.DNSName('localhost'), x509.IPAddress(ipaddress.ip_address('127.0.0.1'))}
+    cert = (
+        x509.CertificateBuilder()
+        .subject_name(name).issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - timedelta(minutes=5))
+        .not_valid_after(now + timedelta(days=30))
+        .add_extension(x509.SubjectAlternativeName(sorted(alt_names, key=str)), critical=False)
+        .add_extension(x509.BasicConstraints(ca=True, path_length=None), critical=True)
+        .add_extension(x509.KeyUsage(digital_signature=True, key_cert_sign=True, content_commitment=False,
+                                     key_encipherment=False, data_encipherment=False, key_agreement=False,
+                                     crl_sign=False, encipher_only=False, decipher_only=False), critical=True)
+        .add_extension(x509.SubjectKeyIdentifier.from_public_key(key.public_key()), critical=False)
+        .add_extension(x509.AuthorityKeyIdentifier.from_issuer_public_key(key.public_key()), critical=False)
+        .sign(key, hashes.SHA256())
+    )
+    cert_path = os.path.join(directory, 'fake_salesforce_cert.pem')
+    key_path = os.path.join(directory, 'fake_salesforce_key.pem')
+    with open(key_path, 'wb') as f:
+        f.write(key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()))
+    os.chmod(key_path, 0o600)
+    with open(cert_path, 'wb') as f:
+        f.write(cert.public_bytes(serialization.Encoding.PEM))
+    return cert_path, key_path
+
+def _json(status, payload):
+    return status, {'Content-Type': 'application/json;charset=UTF-8'}, json.dumps(payload).encode('utf-8')
+
+def _error(status, error_code, message):
+    return _json(status, [{'message': message, 'errorCode': error_code}])
+
+def _json_body(body):
+    try:
+        return json.loads(body or b'{}')
+    except ValueError as e:
+        raise ValueError(f"Request body is not valid JSON: {e}")
+
+def _soap_fault(code, message):
+    return ('<?xml version="1.0" encoding="UTF-8"?>'
+            '<soapenv:Envelope xmlns:soapenv="http://schemas.xmlsoap.org/soap/envelope/" xmlns:sf="urn:fault.partner.soap.sforce.com">'
+            f'<soapenv:Body><soapenv:Fault><faultcode>sf:{code}</faultcode><faultstring>{code}: {message}</faultstring>'
+            f'<detail><sf:LoginFault><sf:exceptionCode>{code}</sf:exceptionCode><sf:exceptionMessage>{message}</sf:exceptionMessage>'
+            '</sf:LoginFault></detail></soapenv:Fault></soapenv:Body></soapenv:Envelope>').encode('utf-8')
+
+def _record_error(error):
+    return {'statusCode': error.error_code, 'message': error.message, 'fields': error.fields}
+
+def _halted(ref):
+    return {'body': [{'errorCode': 'PROCESSING_HALTED',
+                      'message': 'The transaction was rolled back since another operation in the same transaction failed.'}],
+            'httpHeaders': {}, 'httpStatusCode': 400, 'referenceId': ref}
+
+def _graph_sobject(node):
+    match = re.match(r'^/services/data/v[\d.]+/sobjects/(\w+)/?$', node.get('url') or '')
+    if node.get('method') != 'POST' or not match:
+        raise SalesforceRecordError('NOT_SUPPORTED', f"The fake server only runs sObject create nodes, not {node.get('method')} {node.get('url')}.")
+    return match.group(1)
+
+def _resolve_references(body, responses):
+    """Replaces @{referenceId.field} in a node body with values from earlier node responses."""
+    results = {r['referenceId']: r['body'] for r in responses if r['httpStatusCode'] < 400}
+
+    def resolve(match):
+        ref, field = match.groups()
+        if ref not in results:
+            raise SalesforceRecordError('INVALID_REFERENCE', f"Reference {ref} is not an earlier successful node.")
+        return str(results[ref][field])
+
+    return {name: _REFERENCE.sub(resolve, value) if isinstance(value, str) else value for name, value in body.items()}
+
+def _bulk_value(value):
+    if value in ('true', 'false'):
+        return value == 'true'
+    return None if value == '#N/A' else value
+
+def _job_info(job):
+    info = {key: value for key, value in job.items() if key not in ('data', 'successful', 'failed')}
+    info.update({'apiVersion': float(API_VERSION), 'numberRecordsProcessed': len(job['successful']) + len(job['failed']),
+                 'numberRecordsFailed': len(job['failed'])})
+    return info
+
+def _to_csv(rows):
+    if not rows:
+        return ''
+    fieldnames = list(dict.fromkeys(field for row in rows for field in row))
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fieldnames, lineterminator='\n')
+    writer.writeheader()
+    writer.writerows(rows)
+    return buffer.getvalue()
+
+def main():
+    """Runs the fake Salesforce server until interrupted."""
+    parser = argparse.ArgumentParser(description="A local stand-in for the Salesforce APIs this tool uses, for benchmarks and failure testing.")
+    parser.add_argument('--host', default='localhost', help="Host name to listen on (default: localhost).")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help=f"Port to listen on (default: {DEFAULT_PORT}).")
+    parser.add_argument('--users', type=int, default=0, help="Number of existing Users to seed the org with.")
+    parser.add_argument('--queues', nargs='*', default=[], help="Names of Queues to seed the org with.")
+    parser.add_argument('--seed', type=int, default=0, help="Seed for the generated Users and the injected faults.")
+    parser.add_argument('--latency', type=float, default=0.0, help="Seconds added to every API request.")
+    parser.add_argument('--latency-jitter', type=float, default=0.0, help="Up to this many extra seconds, at random, per request.")
+    parser.add_argument('--record-latency', type=float, default=0.0, help="Seconds added per record written.")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Share of requests (0-1) answered with 503 SERVER_UNAVAILABLE.")
+    parser.add_argument('--lock-error-rate', type=float, default=0.0, help="Share of record writes (0-1) failed with UNABLE_TO_LOCK_ROW.")
+    parser.add_argument('--api-limit', type=int, default=DEFAULT_API_LIMIT, help=f"Daily API allocation (default: {DEFAULT_API_LIMIT}).")
+    parser.add_argument('--max-concurrent', type=int, default=None, help="Requests in flight above which requests are refused with REQUEST_LIMIT_EXCEEDED.")
+    parser.add_argument('--cert-dir', default=DEFAULT_CERT_DIR, help=f"Where the self-signed certificate is written (default: {DEFAULT_CERT_DIR}).")
+    parser.add_argument('--certfile', default=None, help="Use this certificate instead of a self-signed one.")
+    parser.add_argument('--keyfile', default=None, help="Private key of --certfile.")
+    parser.add_argument('--session-id', default=None, help="Access token to accept (default: a random one).")
+    parser.add_argument('--verbose', action='store_true', help="Log every request.")
+    args = parser.parse_args()
+
+    org = FakeOrg()
+    org.add_users(args.users, seed=args.seed)
+    org.add_queues(args.queues)
+    faults = FaultProfile(args.latency, args.latency_jitter, args.record_latency, args.error_rate, args.lock_error_rate,
+                          args.api_limit, args.max_concurrent, args.seed)
+    server = FakeSalesforceServer(FakeSalesforce(org, faults, args.session_id), args.host, args.port,
+                                  args.certfile, args.keyfile, args.cert_dir, args.verbose).start()
+
+    print(f"Fake Salesforce listening on {server.instance_url} with {org.count('User')} users.")
+    print("Point the tool at it with these config.ini settings:\n")
+    print(f"[salesforce_creds]\ninstance_url = {server.instance_url}\nsession_id = {server.app.session_id}\n")
+    print(f"[http]\nca_bundle = {os.path.abspath(server.ca_bundle)}\n")
+    print("Press Ctrl+C to stop.")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+        print(f"\nServed {server.app.api_calls} API calls; the org now has {org.count('User')} users.")
+        for endpoint, count in sorted(server.app.request_counts.items()):
+            print(f"  {endpoint}: {count}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+import re
+import zlib
+from difflib import SequenceMatcher
+import numpy as np
+
+DEFAULT_FUZZY_THRESHOLD = 0.85
+
+# MinHash signatures are split into bands of rows; two strings become a candidate pair
+# when any band is identical. With 16 bands of 3 rows, pairs with a shingle Jaccard
+# similarity of about 0.6 or more are almost always found, while unrelated pairs rarely are.
+NUM_BANDS = 16
+ROWS_PER_BAND = 3
+SHINGLE_SIZE = 3
+
+# How many possible matches to list in a row's Notes.
+MAX_REPORTED_MATCHES = 3
+
+_MERSENNE_PRIME = (1 << 31) - 1
+_NON_ALPHANUMERIC = re.compile(r'[^a-z0-9]+')
+
+def normalize_email_local(email):
+    """Returns the part of an email before the @, lowercased and without punctuation (Brunt-Kelli -> bruntkelli)."""
+    if not isinstance(email, str) or not email.strip():
+        return ''
+    return _NON_ALPHANUMERIC.sub('', email.strip().lower().split('@')[0])
+
+def normalize_name(*parts):
+    """Returns the name's alphanumeric tokens, sorted so 'Brunt, Kelli' and 'Kelli Brunt' compare equal."""
+    tokens = []
+    for part in parts:
+        if isinstance(part, str):
+            tokens.extend(token for token in _NON_ALPHANUMERIC.split(part.lower()) if token)
+    return ' '.join(sorted(tokens))
+
+class MinHashIndex:
+    """
+    A MinHash locality-sensitive hashing index over character shingles.
+
+    Each added string is hashed into NUM_BANDS buckets; a query only has to be compared
+    against the strings that share a bucket with it, instead of against every string.
+    """
+    def __init__(self, seed=0):
+        rng = np.random.default_rng(seed)
+        num_hashes = NUM_BANDS * ROWS_PER_BAND
+        self._a = rng.integers(1, _MERSENNE_PRIME, size=num_hashes, dtype=np.uint64)
+        self._b = rng.integers(0, _MERSENNE_PRIME, size=num_hashes, dtype=np.uint64)
+        self._fold = rng.integers(1, 1 << 62, size=ROWS_PER_BAND, dtype=np.uint64)
+        self._band_offsets = rng.integers(0, 1 << 62, size=NUM_BANDS, dtype=np.uint64)
+        self._buckets = {}
+
+    def add(self, key, text):
+        for band in self._bands(text):
+            self._buckets.setdefault(band, []).append(key)
+
+    def candidates(self, text):
+        """Returns the keys of added strings that share at least one band with the text."""
+        found = {}
+        for band in self._bands(text):
+            for key in self._buckets.get(band, ()):
+                found[key] = None
+        return list(found)
+
+    def _bands(self, text):
+        """Returns one bucket key per band: the band's MinHash values folded into a single integer."""
+        if not text:
+            return []
+        shingles = {text[i:i + SHINGLE_SIZE] for i in range(max(1, len(text) - SHINGLE_SIZE + 1))}
+        hashes = np.fromiter((zlib.crc32(s.encode('utf-8')) for s in shingles), dtype=np.uint64, count=len(shingles))
+        signature = ((self._a[:, None] * hashes[None, :] + self._b[:, None]) % _MERSENNE_PRIME).min(axis=1)
+        # Wrapping uint64 arithmetic is fine here; only equality of the folded keys matters
+        return (signature.reshape(NUM_BANDS, ROWS_PER_BAND) @ self._fold + self._band_offsets).tolist()
+
+def find_possible_duplicates(people, org_users, threshold=DEFAULT_FUZZY_THRESHOLD):
+    """
+    Finds org users who are probably the same person as an input row, even when the
+    email differs slightly (a typo, or a hyphen instead of a dot).
+
+    Candidate pairs come from MinHash indexes over the org users' email local parts and names,
+    so the work grows with the number of users rather than with every input/org pair.
+    Each candidate is then scored with a sequence similarity ratio, averaged over the email
+    and, when both sides have one, the name.
+
+    :param people: An iterable of (row_key, email, name) for the input rows.
+    :param org_users: A list of User records with 'Id', 'Email' and optionally 'Name'.
+    :param threshold: The minimum score (0-1) for a pair to be reported.
+    :return: A dict of row_key -> [(score, user_record), ...], best match first.
+    """
+    email_index, name_index = MinHashIndex(), MinHashIndex()
+    org_keys = []
+    for position, user in enumerate(org_users):
+        email_key = normalize_email_local(user.get('Email'))
+        name_key = normalize_name(user.get('Name'))
+        org_keys.append((email_key, name_key))
+        email_index.add(position, email_key)
+        name_index.add(position, name_key.replace(' ', ''))
+
+    matches = {}
+    for row_key, email, name in people:
+        email_key = normalize_email_local(email)
+        name_key = normalize_name(name)
+        if not email_key and not name_key:
+            continue
+        candidates = dict.fromkeys(email_index.candidates(email_key) + name_index.candidates(name_key.replace(' ', '')))
+        scored = []
+        for position in candidates:
+            score = _similarity(email_key, name_key, *org_keys[position])
+            if score >= threshold:
+                scored.append((score, org_users[position]))
+        if scored:
+            scored.sort(key=lambda pair: pair[0], reverse=True)
+            matches[row_key] = scored
+    return matches
+
+def _similarity(email_a, name_a, email_b, name_b):
+    # A name on its own is too common to suggest a duplicate
+    if not email_a or not email_b:
+        return 0.0
+    scores = [SequenceMatcher(None, email_a, email_b).ratio()]
+    if name_a and name_b:
+        scores.append(SequenceMatcher(None, name_a, name_b).ratio())
+    return sum(scores) / len(scores)
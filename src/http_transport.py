@@ -0,0 +1,132 @@
+import gzip
+import json as json_module
+import requests
+from requests.adapters import HTTPAdapter
+from src.api_limits import ApiUsage, throttle_from_config
+from src.retry import RetryPolicy, RetryRule, CircuitBreaker, note_retry, note_response_errors, ERROR_CODE_RULES
+from src.retry import DEFAULT_RULE, DEFAULT_MAX_DELAY, DEFAULT_FAILURE_THRESHOLD, DEFAULT_RESET_SECONDS
+
+DEFAULT_POOL_SIZE = 10
+# Bodies smaller than this are sent as-is; compressing them costs more than it saves.
+DEFAULT_GZIP_MIN_BYTES = 1024
+
+class SalesforceSession(requests.Session):
+    """
+    The HTTP session shared by every Salesforce call of a run.
+
+    Connections are kept alive in a pool sized for the run's concurrency, responses are
+    requested gzip-compressed, and large request bodies are gzip-compressed before sending.
+    Every response's Sforce-Limit-Info header is tracked in `usage`, and the optional `throttle`
+    (see api_limits.UsageThrottle) is consulted before each request. Transient failures are
+    retried according to `retry_policy`, and `circuit_breaker` stops all requests while the
+    org keeps failing (see the retry module). `ca_bundle` is a certificate file to trust instead
+    of the system's certificate authorities, e.g. for a TLS-intercepting proxy or a local fake org.
+    """
+    def __init__(self, pool_size=DEFAULT_POOL_SIZE, gzip_requests=True, gzip_min_bytes=DEFAULT_GZIP_MIN_BYTES,
+                 keep_alive=True, throttle=None, retry_policy=None, circuit_breaker=None, ca_bundle=None):
+        super().__init__()
+        self.ca_bundle = ca_bundle
+        self.usage = ApiUsage()
+        self.throttle = throttle
+        self.retry_policy = retry_policy
+        self.circuit_breaker = circuit_breaker
+        self.pool_size = pool_size
+        self.gzip_requests = gzip_requests
+        self.gzip_min_bytes = gzip_min_bytes
+
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.mount('https://', adapter)
+        self.mount('http://', adapter)
+        self.headers['Accept-Encoding'] = 'gzip, deflate'
+        if not keep_alive:
+            self.headers['Connection'] = 'close'
+
+    def request(self, method, url, data=None, json=None, headers=None, **kwargs):
+        if self.gzip_requests:
+            data, json, headers = self._compress_body(data, json, headers)
+        if self.ca_bundle:
+            # Passed per request, because REQUESTS_CA_BUNDLE in the environment would override the session's verify
+            kwargs.setdefault('verify', self.ca_bundle)
+
+        attempt = 1
+        while True:
+            if self.circuit_breaker:
+                self.circuit_breaker.before_request()
+            if self.throttle:
+                self.throttle.before_request(self.usage)
+            try:
+                response = super().request(method, url, data=data, json=json, headers=headers, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                rule = self.retry_policy.rule_for_exception(e, method) if self.retry_policy else None
+                self._record_failure(rule)
+                if rule is None or attempt >= rule.max_attempts:
+                    raise
+                print(f"Transient network error on {method} {url} ({type(e).__name__}); retry {attempt} of {rule.max_attempts - 1}...")
+            else:
+                self.usage.record_response(response)
+                note_response_errors(response)
+                rule = self.retry_policy.rule_for_response(response, method) if self.retry_policy else None
+                if rule is None:
+                    if self.circuit_breaker and response.status_code < 500:
+                        self.circuit_breaker.record_success()
+                    return response
+                self._record_failure(rule)
+                if attempt >= rule.max_attempts:
+                    return response
+                print(f"Transient error {response.status_code} on {method} {url}; retry {attempt} of {rule.max_attempts - 1}...")
+
+            note_retry()
+            self.retry_policy.wait(rule, attempt)
+            attempt += 1
+
+    def _record_failure(self, rule):
+        if self.circuit_breaker and rule is not None:
+            self.circuit_breaker.record_failure()
+
+    def _compress_body(self, data, json, headers):
+        if json is not None:
+            data = json_module.dumps(json)
+            json = None
+            headers = {**(headers or {}), 'Content-Type': 'application/json'}
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        if not isinstance(data, bytes) or len(data) < self.gzip_min_bytes:
+            return data, json, headers
+        if any(key.lower() == 'content-encoding' for key in (headers or {})):
+            return data, json, headers
+        return gzip.compress(data, compresslevel=5), None, {**(headers or {}), 'Content-Encoding': 'gzip'}
+
+def session_from_config(config, min_pool_size=None):
+    """
+    Builds a SalesforceSession from the optional [http], [api_limits] and [retry] sections of config.ini.
+    :param min_pool_size: The number of workers that will share the session; the pool is grown to fit them.
+    """
+    http = config['http'] if config.has_section('http') else {}
+    pool_size = int(http.get('pool_size', DEFAULT_POOL_SIZE))
+    if min_pool_size:
+        pool_size = max(pool_size, min_pool_size)
+    return SalesforceSession(
+        pool_size=pool_size,
+        gzip_requests=_as_bool(http.get('gzip_requests', 'true')),
+        gzip_min_bytes=int(http.get('gzip_min_bytes', DEFAULT_GZIP_MIN_BYTES)),
+        keep_alive=_as_bool(http.get('keep_alive', 'true')),
+        ca_bundle=http.get('ca_bundle') or None,
+        throttle=throttle_from_config(config),
+        **_retry_from_config(config)
+    )
+
+def _retry_from_config(config):
+    """Builds the retry policy and circuit breaker from the optional [retry] section of config.ini."""
+    retry = config['retry'] if config.has_section('retry') else {}
+    if not _as_bool(retry.get('enabled', 'true')):
+        return {}
+    default_rule = RetryRule(int(retry.get('max_attempts', DEFAULT_RULE.max_attempts)),
+                             float(retry.get('base_delay', DEFAULT_RULE.base_delay)))
+    return {
+        'retry_policy': RetryPolicy(dict(ERROR_CODE_RULES), default_rule, float(retry.get('max_delay', DEFAULT_MAX_DELAY))),
+        'circuit_breaker': CircuitBreaker(int(retry.get('breaker_threshold', DEFAULT_FAILURE_THRESHOLD)),
+                                          float(retry.get('breaker_reset_seconds', DEFAULT_RESET_SECONDS)))
+    }
+
+def _as_bool(value):
+    return str(value).strip().lower() in ('1', 'true', 'yes', 'on')
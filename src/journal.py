@@ -0,0 +1,82 @@
+import sqlite3
+import threading
+from datetime import datetime
+
+INSERT_STEP = 'insert'
+ASSIGN_STEP_PREFIX = 'assign:'
+
+STARTED = 'started'
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+
+class CreationJournal:
+    """
+    An append-only SQLite journal of user creation outcomes.
+
+    Every step of provisioning a user (the User insert and each assignment) is recorded
+    as an event the moment its outcome is known, so an interrupted run can be resumed
+    without re-inserting users that were already created.
+    """
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS events (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                username TEXT NOT NULL,
+                step TEXT NOT NULL,
+                status TEXT NOT NULL,
+                salesforce_id TEXT,
+                detail TEXT,
+                recorded_at TEXT NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_events_username ON events (username)")
+        self._conn.commit()
+
+    def record(self, username, step, status, salesforce_id=None, detail=''):
+        """Appends one event and commits it immediately."""
+        self.record_many([(username, step, status, salesforce_id, detail)])
+
+    def record_many(self, events):
+        """
+        Appends several events in a single transaction.
+        :param events: An iterable of (username, step, status, salesforce_id, detail) tuples.
+        """
+        recorded_at = datetime.now().isoformat()
+        rows = [(str(username), step, status, salesforce_id, detail or '', recorded_at)
+                for username, step, status, salesforce_id, detail in events]
+        if not rows:
+            return
+        with self._lock:
+            self._conn.executemany(
+                "INSERT INTO events (username, step, status, salesforce_id, detail, recorded_at) VALUES (?, ?, ?, ?, ?, ?)",
+                rows
+            )
+            self._conn.commit()
+
+    def is_empty(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM events").fetchone()[0] == 0
+
+    def load_state(self):
+        """
+        Replays the journal.
+        :return: A dict of username -> {step: (status, salesforce_id, detail)} holding the latest event per step.
+        """
+        state = {}
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT username, step, status, salesforce_id, detail FROM events ORDER BY id"
+            ).fetchall()
+        for username, step, status, salesforce_id, detail in rows:
+            state.setdefault(username, {})[step] = (status, salesforce_id, detail)
+        return state
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -32,6 +32,35 @@ def map_row_to_payload(row, mapping):
             payload[sf_field] = row[source_col]
     return payload
 
+def map_dataframe(df, mapping):
+    """
+    Renames the mapped columns of a DataFrame to their Salesforce field names, column by column.
+    When several source columns map to the same field, the last non-null value wins,
+    matching map_row_to_payload.
+    """
+    fields = {}
+    for source_col, sf_field in mapping.items():
+        if source_col not in df.columns:
+            continue
+        column = df[source_col]
+        if sf_field in fields:
+            column = column.where(column.notna(), fields[sf_field])
+        fields[sf_field] = column
+    return pd.DataFrame(fields, index=df.index)
+
+def frame_to_payloads(frame):
+    """
+    Converts a DataFrame of Salesforce fields into a list of payload dictionaries,
+    leaving out null cells.
+    """
+    field_names = list(frame.columns)
+    values = frame.to_numpy(dtype=object)
+    present = frame.notna().to_numpy()
+    return [
+        {field: value for field, value, keep in zip(field_names, row_values, row_present) if keep}
+        for row_values, row_present in zip(values, present)
+    ]
+
 if __name__ == '__main__':
     # Example Usage
     # Create a dummy mapping file for testing
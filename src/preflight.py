@@ -1,12 +1,20 @@
+import numpy as np
 import pandas as pd
 from simple_salesforce.exceptions import SalesforceError
+from src.soql import query_in_chunks
+from src.fuzzy_match import find_possible_duplicates, MAX_REPORTED_MATCHES
 
-def run_duplicate_check(sf, users_to_add_df):
+def run_duplicate_check(sf, users_to_add_df, user_index=None, fuzzy_threshold=None):
     """
     Checks for duplicate users in Salesforce before attempting to create new ones.
 
     :param sf: The simple-salesforce connection object.
     :param users_to_add_df: DataFrame of users to be added.
+    :param user_index: Optional UserIndex. When given, it is brought up to date with a delta
+                       query and duplicates are looked up locally instead of in the org.
+    :param fuzzy_threshold: Optional similarity score (0-1). When given, rows without an exact match
+                            are also compared against every org user by name and email, and close
+                            matches are marked 'Review - Possible Duplicate'.
     :return: A DataFrame (preflight report) with 'Action' and 'Notes' columns.
     """
     print("--- Starting Pre-flight Duplicate Check ---")
@@ -20,42 +28,39 @@ def run_duplicate_check(sf, users_to_add_df):
     emails_to_check = list(preflight_report['Email (name version)'].dropna().unique())
     usernames_to_check = list(preflight_report['Username'].dropna().unique())
 
-    existing_users = {}
+    existing_users = []
 
-    # Query for existing users by email or username
-    if emails_to_check or usernames_to_check:
-        # Combine checks into one query for efficiency
-        where_clauses = []
-        if emails_to_check:
-            where_clauses.append(f"Email IN ('{ "','".join(emails_to_check) }')")
-        if usernames_to_check:
-            where_clauses.append(f"Username IN ('{ "','".join(usernames_to_check) }')")
-
-        full_where_clause = " OR ".join(where_clauses)
-
-        query = f"SELECT Id, Email, Username, Name FROM User WHERE {full_where_clause}"
+    if user_index is not None:
+        try:
+            user_index.sync(sf)
+        except SalesforceError as e:
+            print(f"Warning: Could not refresh the local user index, using it as of {user_index.last_sync}. {e}")
+        existing_users = user_index.find_matches(emails_to_check + usernames_to_check)
 
+    # Query for existing users by email or username
+    elif emails_to_check or usernames_to_check:
+        # Each field is queried on its own so both value lists can be split into chunks;
+        # a user matching on both fields comes back twice and is de-duplicated by Id.
         try:
-            results = sf.query_all(query)
-            for record in results['records']:
-                if record.get('Email'):
-                    existing_users[record['Email'].lower()] = {'Id': record['Id'], 'Note': f"Email match on User ID {record['Id']}"}
-                if record.get('Username'):
-                    existing_users[record['Username'].lower()] = {'Id': record['Id'], 'Note': f"Username match on User ID {record['Id']}"}
+            records = {}
+            for field, values in (('Email', emails_to_check), ('Username', usernames_to_check)):
+                query = f"SELECT Id, Email, Username, Name FROM User WHERE {field} IN {{in_clause}}"
+                for record in query_in_chunks(sf, query, values)['records']:
+                    records[record['Id']] = record
+            existing_users = list(records.values())
         except SalesforceError as e:
             print(f"Warning: Could not query for duplicate users. {e}")
 
     # Check for duplicates and update the report
-    for index, row in preflight_report.iterrows():
-        email_lower = str(row['Email (name version)']).lower()
-        username_lower = str(row['Username']).lower()
+    _flag_duplicates(preflight_report, existing_users)
 
-        if email_lower in existing_users:
-            preflight_report.loc[index, 'Action'] = 'Skip - Duplicate Found'
-            preflight_report.loc[index, 'Notes'] = existing_users[email_lower]['Note']
-        elif username_lower in existing_users:
-            preflight_report.loc[index, 'Action'] = 'Skip - Duplicate Found'
-            preflight_report.loc[index, 'Notes'] = existing_users[username_lower]['Note']
+    if fuzzy_threshold is not None:
+        try:
+            org_users = user_index.all_users() if user_index is not None else \
+                sf.query_all("SELECT Id, Email, Username, Name FROM User")['records']
+            _flag_possible_duplicates(preflight_report, org_users, fuzzy_threshold)
+        except SalesforceError as e:
+            print(f"Warning: Could not query org users for fuzzy matching. {e}")
 
     print("--- Pre-flight Duplicate Check Finished ---")
     skipped_count = len(preflight_report[preflight_report['Action'] != 'Create New User'])
@@ -63,6 +68,87 @@ def run_duplicate_check(sf, users_to_add_df):
 
     return preflight_report
 
+def _flag_duplicates(preflight_report, existing_users):
+    """
+    Marks rows whose email or username matches an existing user, using joins on whole columns.
+
+    Both input columns are matched against both the Email and the Username of existing users,
+    since usernames are usually email-shaped. Every conflicting User Id is listed in Notes.
+
+    :param preflight_report: The report DataFrame; its 'Action' and 'Notes' columns are updated in place.
+    :param existing_users: A list of User records with 'Id', 'Email' and 'Username'.
+    """
+    if not existing_users:
+        return
+
+    org_users = pd.DataFrame(existing_users, columns=['Id', 'Email', 'Username'])
+    org_keys = pd.concat([
+        pd.DataFrame({'key': org_users[field].str.lower(), 'Field': field, 'Id': org_users['Id']})
+        for field in ('Email', 'Username')
+    ]).dropna(subset=['key']).drop_duplicates()
+
+    row_positions = range(len(preflight_report))
+    input_keys = pd.concat([
+        pd.DataFrame({
+            'row': row_positions,
+            'key': preflight_report[column].astype(str).str.lower().where(preflight_report[column].notna()).to_numpy()
+        })
+        for column in ('Email (name version)', 'Username')
+    ]).dropna(subset=['key'])
+
+    matches = input_keys.merge(org_keys, on='key').drop_duplicates(subset=['row', 'Field', 'Id'])
+    if matches.empty:
+        return
+
+    # One note per matched field, e.g. "Email match on User ID 005..." or "... on User IDs 005..., 005...".
+    # Grouping plain arrays is much cheaper than a pandas groupby with a Python aggregation here.
+    matches = matches.sort_values(['row', 'Field'], kind='stable')
+    ids_by_field = {}
+    for row, field, user_id in zip(matches['row'].to_numpy(), matches['Field'].to_numpy(), matches['Id'].to_numpy()):
+        ids_by_field.setdefault((row, field), []).append(user_id)
+    notes_by_row = {}
+    for (row, field), ids in ids_by_field.items():
+        note = f"{field} match on User ID{'s' if len(ids) > 1 else ''} {', '.join(ids)}"
+        notes_by_row.setdefault(row, []).append(note)
+    row_notes = pd.Series({row: '; '.join(notes) for row, notes in notes_by_row.items()})
+
+    positions = row_notes.index.to_numpy()
+    action_col = preflight_report.columns.get_loc('Action')
+    notes_col = preflight_report.columns.get_loc('Notes')
+    preflight_report.iloc[positions, action_col] = 'Skip - Duplicate Found'
+    preflight_report.iloc[positions, notes_col] = row_notes.to_numpy()
+
+def _flag_possible_duplicates(preflight_report, org_users, threshold):
+    """
+    Marks rows that have no exact match but closely resemble an existing user as 'Review - Possible Duplicate',
+    listing the best matches and their similarity scores in Notes.
+    """
+    unmatched = preflight_report['Action'] == 'Create New User'
+    if not unmatched.any() or not org_users:
+        return
+
+    candidates = preflight_report[unmatched]
+    first_names = candidates['FirstName'] if 'FirstName' in candidates else pd.Series(None, index=candidates.index)
+    last_names = candidates['LastName'] if 'LastName' in candidates else pd.Series(None, index=candidates.index)
+    people = (
+        (position, email, ' '.join(str(part) for part in (first, last) if pd.notna(part)))
+        for position, email, first, last in zip(
+            np.flatnonzero(unmatched.to_numpy()), candidates['Email (name version)'], first_names, last_names
+        )
+    )
+    matches = find_possible_duplicates(people, org_users, threshold)
+    if not matches:
+        return
+
+    positions = np.fromiter(matches.keys(), dtype=int, count=len(matches))
+    notes = [
+        '; '.join(f"Possible match on User ID {user['Id']} ({user.get('Email')}, score {score:.2f})"
+                  for score, user in scored[:MAX_REPORTED_MATCHES])
+        for scored in matches.values()
+    ]
+    preflight_report.iloc[positions, preflight_report.columns.get_loc('Action')] = 'Review - Possible Duplicate'
+    preflight_report.iloc[positions, preflight_report.columns.get_loc('Notes')] = notes
+
 
 if __name__ == '__main__':
     print("This module provides functions for pre-flight checks. It is not meant to be run directly.")
@@ -0,0 +1,34 @@
+import threading
+import time
+
+class RateLimiter:
+    """
+    A thread-safe token bucket that caps the number of API requests per second
+    across every worker sharing it.
+    """
+    def __init__(self, requests_per_second, burst=None):
+        """
+        :param requests_per_second: The sustained request rate allowed.
+        :param burst: How many requests may be sent back to back after an idle period.
+                      Defaults to one second's worth of requests.
+        """
+        if requests_per_second <= 0:
+            raise ValueError("requests_per_second must be greater than zero.")
+        self.rate = float(requests_per_second)
+        self.capacity = float(burst if burst is not None else max(1, requests_per_second))
+        self._tokens = self.capacity
+        self._last_refill = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Blocks until a request may be sent."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._last_refill) * self.rate)
+                self._last_refill = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
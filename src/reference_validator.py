@@ -0,0 +1,109 @@
+import re
+import pandas as pd
+from simple_salesforce.exceptions import SalesforceError
+from src.soql import query_in_chunks
+
+# Processed-data columns holding record Ids, with the sObject they point to and its key prefix.
+ID_REFERENCES = {
+    'ProfileID': ('Profile', '00e'),
+    'RoleID': ('UserRole', '00E'),
+    'PermissionSetGroupIDs': ('PermissionSetGroup', '0PG'),
+}
+REFERENCE_LABELS = {'ProfileID': 'Profile', 'RoleID': 'Role', 'PermissionSetGroupIDs': 'Permission Set Group', 'Queues': 'Queue'}
+
+# A missing Profile or Role fails the User insert itself; a missing PSG or queue only fails an assignment.
+BLOCKING_REFERENCES = ('ProfileID', 'RoleID')
+
+_ID_PATTERN = re.compile(r'^[a-zA-Z0-9]{15}([a-zA-Z0-9]{3})?$')
+
+class ReferenceValidator:
+    """
+    Checks that the Profiles, Roles, Permission Set Groups and queues that processed data refers to
+    exist in the org, before any user is inserted. Each kind of reference takes one batched query
+    (split only when its IN list gets too long), and results are remembered, so checking more rows
+    later (e.g. the next streaming chunk) only queries values not seen before.
+    """
+    def __init__(self, sf):
+        self.sf = sf
+        # Column -> values not found in the org, as written in the data
+        self.missing = {column: set() for column in REFERENCE_LABELS}
+        # Queue name -> Id of every queue found, usable as create_salesforce_users' queue_ids
+        self.queue_ids = {}
+        self._checked = {column: set() for column in REFERENCE_LABELS}
+        # Columns whose lookup failed, so some of their values are unchecked
+        self.unchecked = set()
+
+    def check(self, processed_data):
+        """
+        Looks up the references of processed_data that were not checked yet.
+        A kind whose query fails is left unchecked (with a warning) rather than reported missing.
+        :return: The `missing` dict, for create_salesforce_users' missing_references.
+        """
+        for column, values in collect_references(processed_data).items():
+            new_values = values - self._checked[column]
+            if column in ID_REFERENCES:
+                # An Id of the wrong shape or object cannot exist, and would make the query fail
+                malformed = {value for value in new_values if not _could_be_id(column, value)}
+                self.missing[column].update(malformed)
+                self._checked[column].update(malformed)
+                new_values -= malformed
+            if not new_values:
+                continue
+            try:
+                found = self._find_queues(new_values) if column == 'Queues' else self._find_ids(column, new_values)
+            except SalesforceError as e:
+                print(f"Warning: Could not check {REFERENCE_LABELS[column]} references. {e}")
+                self.unchecked.add(column)
+                continue
+            self.missing[column].update(new_values - found)
+            self._checked[column].update(new_values)
+        return self.missing
+
+    def _find_ids(self, column, values):
+        sobject = ID_REFERENCES[column][0]
+        results = query_in_chunks(self.sf, f"SELECT Id FROM {sobject} WHERE Id IN {{in_clause}}", sorted(values))
+        # Salesforce returns 18-character Ids; the data may hold either form
+        found = {record['Id'][:15] for record in results['records']}
+        return {value for value in values if value[:15] in found}
+
+    def _find_queues(self, names):
+        query = "SELECT Id, Name FROM Group WHERE Type = 'Queue' AND Name IN {in_clause}"
+        for record in query_in_chunks(self.sf, query, sorted(names))['records']:
+            self.queue_ids[record['Name']] = record['Id']
+        return names & set(self.queue_ids)
+
+def _could_be_id(column, value):
+    return bool(_ID_PATTERN.match(value)) and value.startswith(ID_REFERENCES[column][1])
+
+def collect_references(processed_data):
+    """
+    Gathers the distinct references of processed data (as built by process_dataframes).
+    :return: A dict of column -> set of referenced values, for the columns present.
+    """
+    references = {}
+    for column in REFERENCE_LABELS:
+        if column in processed_data.columns:
+            references[column] = {value for cell in processed_data[column].dropna().unique() for value in split_references(column, cell)}
+    return references
+
+def split_references(column, cell):
+    """The individual values of one cell: PSG Ids are ';'-separated and queue names one per line."""
+    if cell is None or (not isinstance(cell, str) and pd.isna(cell)):
+        return []
+    separator = {'PermissionSetGroupIDs': ';', 'Queues': '\n'}.get(column)
+    parts = str(cell).split(separator) if separator else [str(cell)]
+    return [part.strip() for part in parts if part.strip()]
+
+def format_missing_references(missing, processed_data=None):
+    """Summarizes missing references as printable lines, with how many users of processed_data each kind affects."""
+    lines = []
+    for column, values in missing.items():
+        if not values:
+            continue
+        line = f"  {REFERENCE_LABELS[column]}: {', '.join(sorted(values))} not found"
+        if processed_data is not None and column in processed_data.columns:
+            users = sum(any(value in values for value in split_references(column, cell)) for cell in processed_data[column])
+            effect = 'will not be created' if column in BLOCKING_REFERENCES else 'will be created without it'
+            line += f" ({users} users {effect})"
+        lines.append(line)
+    return '\n'.join(lines)
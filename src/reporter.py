@@ -2,6 +2,7 @@ import pandas as pd
 import os
 from datetime import datetime
 from simple_salesforce.exceptions import SalesforceError
+from src.soql import query_in_chunks
 
 def generate_report(sf, user_ids):
     """
@@ -17,16 +18,15 @@ def generate_report(sf, user_ids):
     print(f"Generating report for {len(user_ids)} newly created users...")
 
     # SOQL query to get details of the created users
-    # We need to format the list of IDs into a string for the IN clause
-    id_list_str = "('" + "','".join(user_ids) + "')"
-    query = f"""
+    # The IDs are split across as many IN clauses as needed to stay within query limits
+    query = """
     SELECT Id, Username, Name, Email, Profile.Name, UserRole.Name, FederationIdentifier, IsActive
     FROM User
-    WHERE Id IN {id_list_str}
+    WHERE Id IN {in_clause}
     """
 
     try:
-        results = sf.query_all(query)
+        results = query_in_chunks(sf, query, user_ids)
         records = results['records']
 
         # The API might return an OrderedDict, so we convert it to a list of dicts
@@ -72,18 +72,18 @@ def generate_report(sf, user_ids):
 def validate_created_users(sf, user_ids):
     """
     Queries for the newly created users and prints a summary for visual validation.
+    :return: The validation results as a DataFrame, or None if nothing could be validated.
     """
     if not user_ids:
-        return # No users to validate
+        return None # No users to validate
 
     print("\n--- Final Validation Step ---")
     print(f"Querying for {len(user_ids)} newly created users to validate their status...")
 
-    id_list_str = "('" + "','".join(user_ids) + "')"
-    query = f"SELECT Id, Name, Username, Profile.Name, IsActive FROM User WHERE Id IN {id_list_str}"
+    query = "SELECT Id, Name, Username, Profile.Name, IsActive FROM User WHERE Id IN {in_clause}"
 
     try:
-        results = sf.query_all(query)
+        results = query_in_chunks(sf, query, user_ids)
         records = results['records']
 
         processed_records = []
@@ -100,8 +100,10 @@ def validate_created_users(sf, user_ids):
         validation_df = pd.DataFrame(processed_records)
         print("Validation Results:")
         print(validation_df.to_string())
+        return validation_df
     except SalesforceError as e:
         print(f"Error during final validation query: {e}")
+        return None
 
 
 if __name__ == '__main__':
@@ -0,0 +1,183 @@
+import random
+import threading
+import time
+from collections import namedtuple
+import requests
+from urllib3.exceptions import NewConnectionError
+
+# How often a transient failure is retried, and the delay before the first retry (doubled on each attempt).
+RetryRule = namedtuple('RetryRule', ['max_attempts', 'base_delay'])
+
+DEFAULT_RULE = RetryRule(max_attempts=4, base_delay=1.0)
+
+# Another transaction holds the row (often the role hierarchy or a shared group)
+LOCK_ERROR_CODE = 'UNABLE_TO_LOCK_ROW'
+
+# Per-error-code policy for failures Salesforce reports in the response body.
+ERROR_CODE_RULES = {
+    # Row locks clear within seconds
+    LOCK_ERROR_CODE: RetryRule(max_attempts=5, base_delay=0.5),
+    # Too many concurrent long-running requests; back off for longer
+    'REQUEST_LIMIT_EXCEEDED': RetryRule(max_attempts=4, base_delay=5.0),
+    'SERVER_UNAVAILABLE': RetryRule(max_attempts=4, base_delay=2.0),
+}
+
+# HTTP statuses that mean the org or a proxy is temporarily unable to serve the request.
+TRANSIENT_STATUSES = {502, 503, 504}
+# Gateway errors a proxy may return after the org already applied the request, like a read timeout.
+GATEWAY_STATUSES = {502, 504}
+
+IDEMPOTENT_METHODS = {'GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'}
+
+DEFAULT_MAX_DELAY = 60.0
+DEFAULT_FAILURE_THRESHOLD = 10
+DEFAULT_RESET_SECONDS = 30.0
+
+class CircuitOpenError(Exception):
+    """Raised instead of sending a request while the circuit breaker is open."""
+
+class RetryPolicy:
+    """
+    Decides which failures are transient and how long to wait before retrying them:
+    exponential backoff with jitter, capped at max_delay.
+    """
+    def __init__(self, error_code_rules=None, default_rule=DEFAULT_RULE, max_delay=DEFAULT_MAX_DELAY,
+                 sleep=time.sleep, jitter=random.random):
+        self.error_code_rules = ERROR_CODE_RULES if error_code_rules is None else error_code_rules
+        self.default_rule = default_rule
+        self.max_delay = max_delay
+        self.sleep = sleep
+        self._jitter = jitter
+
+    def rule_for_response(self, response, method):
+        """
+        Returns the RetryRule for a failed response, or None if it should not be retried.
+        A 502 or 504 leaves it open whether the org applied the request, so only idempotent
+        requests are retried after one; a 503 means it was refused and is always retried.
+        """
+        if response.status_code < 400:
+            return None
+        if response.status_code in GATEWAY_STATUSES:
+            return self.default_rule if method.upper() in IDEMPOTENT_METHODS else None
+        if response.status_code in TRANSIENT_STATUSES:
+            return self.default_rule
+        return self.rule_for_error_codes(_error_codes(response))
+
+    def rule_for_error_codes(self, error_codes):
+        """Returns the RetryRule of the first transient error code, or None."""
+        for code in error_codes:
+            if code in self.error_code_rules:
+                return self.error_code_rules[code]
+        return None
+
+    def rule_for_exception(self, exception, method):
+        """
+        Returns the RetryRule for a network error, or None.
+        A read timeout or a connection lost mid-request means the org may already have applied
+        the request, so only idempotent requests are retried after one; a connection that could
+        not be established is always retried, TLS errors never.
+        """
+        if isinstance(exception, requests.exceptions.SSLError):
+            # Certificate problems do not go away by themselves
+            return None
+        if not isinstance(exception, (requests.ConnectionError, requests.Timeout)):
+            return None
+        if method.upper() in IDEMPOTENT_METHODS or request_not_sent(exception):
+            return self.default_rule
+        # Left to the caller, e.g. an insert is reconciled through the journal on --resume
+        return None
+
+    def wait(self, rule, attempt):
+        """Sleeps before retry number `attempt` (1-based): half the backoff plus a random share of the other half."""
+        backoff = min(self.max_delay, rule.base_delay * 2 ** (attempt - 1))
+        self.sleep(backoff / 2 + self._jitter() * backoff / 2)
+
+class CircuitBreaker:
+    """
+    Stops sending requests to an org that keeps failing.
+
+    After `failure_threshold` transient failures in a row the circuit opens and requests
+    fail fast with CircuitOpenError. After `reset_seconds` one trial request is let through;
+    its success closes the circuit again, its failure reopens it.
+    """
+    def __init__(self, failure_threshold=DEFAULT_FAILURE_THRESHOLD, reset_seconds=DEFAULT_RESET_SECONDS, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+
+    def before_request(self):
+        with self._lock:
+            if self._opened_at is None:
+                return
+            if self._clock() - self._opened_at < self.reset_seconds:
+                raise CircuitOpenError(
+                    f"Salesforce is failing repeatedly ({self._failures} transient errors in a row); "
+                    f"not sending requests for {self.reset_seconds:.0f}s."
+                )
+            # Half-open: let this request through as a trial, and hold the others off meanwhile
+            self._opened_at = self._clock()
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._failures >= self.failure_threshold:
+                if self._opened_at is None:
+                    print(f"Warning: {self._failures} transient Salesforce errors in a row; pausing requests for {self.reset_seconds:.0f}s.")
+                self._opened_at = self._clock()
+
+def request_not_sent(exception):
+    """
+    Whether a network error happened before the request reached the org: the connection timed out,
+    could not be established (e.g. it was refused) or failed its TLS handshake.
+    """
+    if isinstance(exception, (requests.ConnectTimeout, requests.exceptions.SSLError)):
+        return True
+    cause = exception.args[0] if isinstance(exception, requests.ConnectionError) and exception.args else None
+    # requests wraps urllib3's error in a MaxRetryError, whose reason is the original one
+    return isinstance(getattr(cause, 'reason', cause), NewConnectionError)
+
+_local = threading.local()
+
+def note_retry():
+    """Counts one retry against the current thread."""
+    _local.retries = getattr(_local, 'retries', 0) + 1
+
+def reset_retry_count():
+    _local.retries = 0
+
+def retry_count():
+    """The retries made by the current thread since the last reset_retry_count()."""
+    return getattr(_local, 'retries', 0)
+
+def note_error_codes(error_codes):
+    """Counts the row-lock errors among error codes Salesforce returned to the current thread, retried or not."""
+    _local.lock_errors = lock_error_count() + sum(code == LOCK_ERROR_CODE for code in error_codes)
+
+def note_response_errors(response):
+    """Counts the row-lock errors in a failed HTTP response (see note_error_codes)."""
+    if response.status_code >= 400:
+        note_error_codes(_error_codes(response))
+
+def reset_lock_error_count():
+    _local.lock_errors = 0
+
+def lock_error_count():
+    """The row-lock errors seen by the current thread since the last reset_lock_error_count()."""
+    return getattr(_local, 'lock_errors', 0)
+
+def _error_codes(response):
+    """Extracts the errorCode values from a Salesforce error response body."""
+    try:
+        body = response.json()
+    except ValueError:
+        return []
+    errors = body if isinstance(body, list) else [body]
+    return [err.get('errorCode') for err in errors if isinstance(err, dict) and err.get('errorCode')]
@@ -1,23 +1,37 @@
 import configparser
+import requests
 from simple_salesforce import Salesforce
-from simple_salesforce.exceptions import SalesforceAuthenticationFailed
+from simple_salesforce.exceptions import SalesforceAuthenticationFailed, SalesforceError
+from src.session_cache import SessionCache
+from src.http_transport import session_from_config
 
 class SalesforceClient:
     """
     A client to connect to the Salesforce API using settings from a config file.
     """
-    def __init__(self, config: configparser.ConfigParser):
+    def __init__(self, config: configparser.ConfigParser, min_pool_size=None):
         """
         Initializes the SalesforceClient.
         Reads credentials from the provided config object.
+        :param min_pool_size: How many workers will share the connection; the HTTP connection pool
+                              is at least this large.
         """
         self.creds = config['salesforce_creds']
+        # Every API call of the run goes through this pooled, gzip-enabled session
+        self.session = session_from_config(config, min_pool_size)
         self.sf = None
         self.auth_method = None
         self.connection_params = {}
 
         # Determine authentication method
-        if self.creds.get('private_key_file') and self.creds.get('consumer_key'):
+        if self.creds.get('session_id') and self.creds.get('instance_url'):
+            # An existing session or access token, e.g. from 'sf org display' or a local fake org
+            self.auth_method = 'session'
+            self.connection_params = {
+                'instance_url': self.creds.get('instance_url'),
+                'session_id': self.creds.get('session_id')
+            }
+        elif self.creds.get('private_key_file') and self.creds.get('consumer_key'):
             self.auth_method = 'jwt'
             self.connection_params = {
                 'username': self.creds.get('username'),
@@ -41,6 +55,10 @@ class SalesforceClient:
         else:
             raise ValueError("Salesforce credentials are not fully set in config file.")
 
+        # Optional cache of the session between runs, e.g. session_cache = ~/.salesforce_admin/sessions.json
+        session_cache_path = self.creds.get('session_cache')
+        self.session_cache = SessionCache(session_cache_path) if session_cache_path and self.auth_method != 'session' else None
+
     def connect(self):
         """
         Connects to Salesforce using the determined authentication method.
@@ -54,12 +72,20 @@ class SalesforceClient:
             logging_params['password'] = '********'
         if 'security_token' in logging_params:
             logging_params['security_token'] = '********'
+        if 'session_id' in logging_params:
+            logging_params['session_id'] = '********'
+
+        if self.session_cache:
+            self.sf = self._connect_from_cache()
+            if self.sf:
+                return self.sf
 
         print(f"Attempting to connect to Salesforce using '{self.auth_method}' auth with params: {logging_params}")
 
         try:
-            self.sf = Salesforce(**active_params)
+            self.sf = Salesforce(**active_params, session=self.session)
             print("Successfully connected to Salesforce.")
+            self._cache_session(self.sf)
         except SalesforceAuthenticationFailed as e:
             print("\n--- Salesforce Authentication Failed ---")
             print(f"Error: {e.content[0]['message']} (ErrorCode: {e.content[0]['errorCode']})")
@@ -73,3 +99,52 @@ class SalesforceClient:
             print(f"An unexpected error occurred during connection: {e}")
             self.sf = None
         return self.sf
+
+    @property
+    def api_usage(self):
+        """The calls made through this client and the org's latest reported daily API usage (api_limits.ApiUsage)."""
+        return self.session.usage
+
+    def cache_key(self):
+        """Identifies the org and user a cached session belongs to."""
+        params = self.connection_params
+        org = params.get('domain') or params.get('instance_url') or 'login'
+        return f"{self.auth_method}:{params.get('username')}@{org}"
+
+    def _connect_from_cache(self):
+        """
+        Reuses a cached session if it is still valid. The returned connection logs in again by itself
+        when Salesforce reports INVALID_SESSION_ID later in the run.
+        """
+        cached = self.session_cache.get(self.cache_key())
+        if not cached:
+            return None
+
+        sf = Salesforce(instance_url=cached['instance_url'], session_id=cached['session_id'], session=self.session)
+        try:
+            # The cheapest authenticated call: lists the REST resources of the API version
+            sf.restful('')
+        except (SalesforceError, requests.RequestException) as e:
+            print(f"Cached session is no longer valid, logging in again. ({type(e).__name__})")
+            self.session_cache.remove(self.cache_key())
+            return None
+
+        sf._salesforce_login_partial = self._login
+        print(f"Reusing cached Salesforce session for {self.connection_params.get('username')} (saved {cached['saved_at']}).")
+        return sf
+
+    def _login(self):
+        """Logs in from scratch and returns (session_id, instance), as simple-salesforce expects when refreshing."""
+        active_params = {k: v for k, v in self.connection_params.items() if v is not None}
+        print("Salesforce session expired, logging in again...")
+        sf = Salesforce(**active_params, session=self.session)
+        self._cache_session(sf)
+        return sf.session_id, sf.sf_instance
+
+    def _cache_session(self, sf):
+        if not self.session_cache:
+            return
+        try:
+            self.session_cache.put(self.cache_key(), sf.session_id, f"https://{sf.sf_instance}")
+        except OSError as e:
+            print(f"Warning: Could not save the session cache {self.session_cache.path}: {e}")
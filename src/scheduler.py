@@ -0,0 +1,159 @@
+import threading
+import time
+from collections import Counter, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain, zip_longest
+import pandas as pd
+from src.rate_limiter import RateLimiter
+from src.retry import reset_lock_error_count, lock_error_count
+from src.user_creator import create_salesforce_users, failed_results, query_queue_ids, MAX_COLLECTION_SIZE
+
+# A slice of users sharing one role and one set of queues, and the parent records its inserts lock:
+# the role (role hierarchy sharing) and each queue (group membership sharing).
+Batch = namedtuple('Batch', ['group', 'rows', 'parents'])
+
+# Creation modes the scheduler can split into batches; a Bulk API job is already one server-side batch.
+SCHEDULED_MODES = ('rest', 'collections', 'graph')
+
+REPORT_COLUMNS = ['RoleID', 'Queues', 'Users', 'Batches', 'Succeeded', 'Failed', 'Seconds', 'UsersPerSecond',
+                  'LockErrors', 'LockErrorRate']
+
+def plan_batches(processed_data, batch_size=MAX_COLLECTION_SIZE):
+    """
+    Groups users by RoleID and queues (as added by process_dataframes) and splits each group into
+    batches of at most batch_size users. Batches of different groups are interleaved, so that
+    consecutive batches tend to lock different parent records.
+    :return: A list of Batch, whose rows are positions in processed_data.
+    """
+    if batch_size < 1:
+        raise ValueError(f"Batch size must be at least 1, got {batch_size}.")
+    roles = _column(processed_data, 'RoleID').fillna('').astype(str)
+    queues = _column(processed_data, 'Queues').map(_queue_set)
+
+    groups = {}
+    for position, group in enumerate(zip(roles, queues)):
+        groups.setdefault(group, []).append(position)
+
+    group_batches = []
+    for (role, queue_set), rows in sorted(groups.items()):
+        parents = frozenset(([('role', role)] if role else []) + [('queue', queue) for queue in queue_set])
+        group_batches.append([Batch((role, queue_set), rows[start:start + batch_size], parents)
+                              for start in range(0, len(rows), batch_size)])
+    return [batch for batch in chain.from_iterable(zip_longest(*group_batches)) if batch is not None]
+
+def schedule_create_users(sf, processed_data, mapping, dry_run=True, mode='collections', batch_size=MAX_COLLECTION_SIZE,
+                          concurrency=4, max_batches_per_parent=1, requests_per_second=None, limiter=None, queue_ids=None,
+                          **creation_options):
+    """
+    Creates users batch by batch (see plan_batches) on `concurrency` threads, never running more than
+    max_batches_per_parent batches at once that insert under the same role or into the same queue.
+    Each batch goes through create_salesforce_users.
+
+    :param limiter: Optional RateLimiter shared with other calls, used instead of requests_per_second.
+    :param queue_ids: Optional dict of queue name -> Id; by default the queues are queried once for all batches.
+    :param creation_options: Passed on to create_salesforce_users (journal, resume, graph_size...).
+    :return: A tuple (results DataFrame in processed_data order, per-group report DataFrame with
+             REPORT_COLUMNS: users per second while the group's batches ran and row-lock errors per user).
+    """
+    if mode not in SCHEDULED_MODES:
+        raise ValueError(f"The scheduler supports modes {', '.join(SCHEDULED_MODES)}, not '{mode}'.")
+    if concurrency < 1 or max_batches_per_parent < 1:
+        raise ValueError("Concurrency and batches per parent must be at least 1.")
+
+    batches = plan_batches(processed_data, batch_size)
+    slots = ParentSlots(batches, max_batches_per_parent)
+    if limiter is None and requests_per_second:
+        limiter = RateLimiter(requests_per_second)
+    if queue_ids is None:
+        queue_ids = {} if dry_run else query_queue_ids(sf, processed_data)
+    stats = {}
+    stats_lock = threading.Lock()
+    batch_results = []
+
+    def run_batch():
+        while True:
+            batch = slots.acquire()
+            if batch is None:
+                return
+            reset_lock_error_count()
+            start = time.perf_counter()
+            try:
+                results_df = create_salesforce_users(sf, processed_data.iloc[batch.rows], mapping, dry_run, mode=mode,
+                                                     batch_size=min(batch_size, MAX_COLLECTION_SIZE), limiter=limiter,
+                                                     queue_ids=queue_ids, **creation_options)
+            except Exception as e:
+                print(f"Error creating batch of {len(batch.rows)} users: {e}")
+                results_df = failed_results(processed_data.iloc[batch.rows], str(e))
+            finally:
+                slots.release(batch)
+            seconds = time.perf_counter() - start
+            statuses = results_df['Status']
+            with stats_lock:
+                group = stats.setdefault(batch.group, Counter())
+                group.update(Users=len(batch.rows), Batches=1, Succeeded=int(statuses.str.startswith('Success').sum()),
+                             Failed=int((statuses == 'Failed').sum()), Seconds=seconds, LockErrors=lock_error_count())
+                batch_results.append(results_df.set_axis(batch.rows))
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for future in [executor.submit(run_batch) for _ in range(concurrency)]:
+            future.result()
+
+    results_df = pd.concat(batch_results).sort_index().reset_index(drop=True) if batch_results else pd.DataFrame()
+    return results_df, _group_report(stats)
+
+class ParentSlots:
+    """
+    Hands out batches to worker threads, holding back a batch while max_per_parent batches
+    that share one of its parent records are still running.
+    """
+    def __init__(self, batches, max_per_parent=1):
+        self._pending = list(batches)
+        self._running = Counter()
+        self._max_per_parent = max_per_parent
+        self._condition = threading.Condition()
+
+    def acquire(self):
+        """Blocks until a pending batch may start and returns it, or returns None once none are left."""
+        with self._condition:
+            while self._pending:
+                for i, batch in enumerate(self._pending):
+                    if all(self._running[parent] < self._max_per_parent for parent in batch.parents):
+                        del self._pending[i]
+                        self._running.update(batch.parents)
+                        return batch
+                # Something is running whenever nothing may start, so a release will wake us
+                self._condition.wait()
+            return None
+
+    def release(self, batch):
+        with self._condition:
+            self._running.subtract(batch.parents)
+            self._condition.notify_all()
+
+def format_group_report(report_df, limit=10):
+    """The groups with the highest lock-error rates, as printable lines."""
+    lines = []
+    for row in report_df.sort_values('LockErrorRate', ascending=False, kind='stable').head(limit).itertuples():
+        lines.append(f"  Role {row.RoleID or '(none)'} / Queues {row.Queues or '(none)'}: {row.Users} users, "
+                     f"{row.UsersPerSecond:.1f} users/s, {row.LockErrors} lock errors ({row.LockErrorRate:.1%})")
+    return '\n'.join(lines)
+
+def _group_report(stats):
+    rows = []
+    for (role, queue_set), counts in sorted(stats.items()):
+        seconds = counts['Seconds']
+        rows.append({
+            'RoleID': role, 'Queues': '; '.join(queue_set), 'Users': counts['Users'], 'Batches': counts['Batches'],
+            'Succeeded': counts['Succeeded'], 'Failed': counts['Failed'], 'Seconds': round(seconds, 3),
+            'UsersPerSecond': round(counts['Users'] / seconds, 2) if seconds else 0.0,
+            'LockErrors': counts['LockErrors'], 'LockErrorRate': round(counts['LockErrors'] / counts['Users'], 4)
+        })
+    return pd.DataFrame(rows, columns=REPORT_COLUMNS)
+
+def _column(df, name):
+    return df[name].reset_index(drop=True) if name in df.columns else pd.Series([None] * len(df), dtype=object)
+
+def _queue_set(queues):
+    if not isinstance(queues, str):
+        return ()
+    return tuple(sorted({name.strip() for name in queues.split('\n') if name.strip()}))
@@ -0,0 +1,58 @@
+import json
+import os
+import tempfile
+from datetime import datetime
+
+DEFAULT_SESSION_CACHE = os.path.join('~', '.salesforce_admin', 'sessions.json')
+
+class SessionCache:
+    """
+    A small JSON file of Salesforce session ids and instance URLs, one entry per org and user.
+
+    The file holds live access tokens, so it is only ever written with owner-only permissions.
+    """
+    def __init__(self, path=DEFAULT_SESSION_CACHE):
+        self.path = os.path.expanduser(path)
+
+    def get(self, key):
+        """Returns the cached {'session_id', 'instance_url', 'saved_at'} entry for a key, or None."""
+        entry = self._read().get(key)
+        if not isinstance(entry, dict) or not entry.get('session_id') or not entry.get('instance_url'):
+            return None
+        return entry
+
+    def put(self, key, session_id, instance_url):
+        entries = self._read()
+        entries[key] = {'session_id': session_id, 'instance_url': instance_url, 'saved_at': datetime.now().isoformat()}
+        self._write(entries)
+
+    def remove(self, key):
+        entries = self._read()
+        if entries.pop(key, None) is not None:
+            self._write(entries)
+
+    def _read(self):
+        try:
+            with open(self.path, 'r') as f:
+                entries = json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            print(f"Warning: Ignoring unreadable session cache {self.path}: {e}")
+            return {}
+        return entries if isinstance(entries, dict) else {}
+
+    def _write(self, entries):
+        directory = os.path.dirname(self.path) or '.'
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        # mkstemp creates the file with mode 0600, and os.replace keeps it, so the token is never world-readable
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(entries, f, indent=2)
+            os.chmod(tmp_path, 0o600)
+            os.replace(tmp_path, self.path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
@@ -0,0 +1,133 @@
+import configparser
+import contextlib
+import multiprocessing
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+import pandas as pd
+from src.journal import CreationJournal
+from src.salesforce_client import SalesforceClient
+from src.session_cache import SessionCache
+from src.user_creator import create_salesforce_users, failed_results
+
+# Users are routed to shards by this processed-data column, so users under the same role
+# are created by one worker and workers don't contend for the same role-hierarchy locks.
+SHARD_KEY = 'RoleID'
+
+def assign_shards(processed_data, shards, key=SHARD_KEY):
+    """
+    Splits users across shards, keeping all users with the same role on the same shard.
+    Roles are placed largest first, each on the shard with the fewest users so far; users without
+    a role take no role locks and are spread over the shards to even out their sizes.
+    :return: A list of `shards` arrays of row positions, each in input order.
+    """
+    if shards < 1:
+        raise ValueError(f"The number of shards must be at least 1, got {shards}.")
+    roles = processed_data[key] if key in processed_data.columns else pd.Series(None, index=processed_data.index, dtype=object)
+    has_role = roles.notna().to_numpy()
+    role_codes, role_names = pd.factorize(roles[has_role])
+
+    loads = [0] * shards
+    shard_of_role = np.zeros(len(role_names), dtype=int)
+    counts = np.bincount(role_codes, minlength=len(role_names))
+    for code in sorted(range(len(role_names)), key=lambda c: (-counts[c], str(role_names[c]))):
+        shard = min(range(shards), key=lambda s: (loads[s], s))
+        shard_of_role[code] = shard
+        loads[shard] += counts[code]
+
+    shard_ids = np.empty(len(processed_data), dtype=int)
+    shard_ids[has_role] = shard_of_role[role_codes]
+    for piece in np.array_split(np.flatnonzero(~has_role), shards):
+        shard = min(range(shards), key=lambda s: (loads[s], s))
+        shard_ids[piece] = shard
+        loads[shard] += len(piece)
+    return [np.flatnonzero(shard_ids == shard) for shard in range(shards)]
+
+def create_users_in_shards(sf, config, processed_data, mapping, shards, log_path_prefix, dry_run=True, queue_ids=None,
+                           requests_per_second=None, journal_path=None, **creation_options):
+    """
+    Creates users in `shards` worker processes, each with its own SalesforceClient and HTTP session,
+    and merges their results back into input order.
+
+    :param sf: The parent's connection; workers reuse its session instead of logging in again (see worker_sections).
+    :param config: The ConfigParser the parent connected with (HTTP, retry and API limit settings are reused).
+    :param log_path_prefix: Worker N writes its console output to '<log_path_prefix>.shard<N>.log'.
+    :param requests_per_second: Optional cap on API calls per second, split evenly across the workers.
+    :param journal_path: Optional CreationJournal path, shared by all workers.
+    :param creation_options: Passed on to create_salesforce_users in every worker (mode, batch_size, resume...).
+    :return: A DataFrame of results, one row per user in processed_data order. The workers' API calls
+             are added to the parent connection's usage (api_limits.ApiUsage), if it tracks any.
+    """
+    positions = assign_shards(processed_data, shards)
+    worker_rate = requests_per_second / shards if requests_per_second else None
+
+    api_usage = getattr(sf.session, 'usage', None)
+    shard_results = {}
+    context = multiprocessing.get_context('spawn')
+    with tempfile.TemporaryDirectory(prefix='shards_') as cache_dir, \
+            ProcessPoolExecutor(max_workers=shards, mp_context=context) as executor:
+        sections = worker_sections(sf, config, os.path.join(cache_dir, 'sessions.json'))
+        futures = {}
+        for shard, rows in enumerate(positions, 1):
+            if len(rows) == 0:
+                continue
+            log_path = f"{log_path_prefix}.shard{shard}.log"
+            future = executor.submit(_run_shard, sections, processed_data.iloc[rows], mapping, dry_run, queue_ids,
+                                     worker_rate, journal_path, log_path, creation_options)
+            futures[future] = (shard, rows, log_path)
+            print(f"Shard {shard}: {len(rows)} users (log: {log_path})")
+
+        for future in as_completed(futures):
+            shard, rows, log_path = futures[future]
+            try:
+                results_df, (calls_made, used, limit) = future.result()
+                if api_usage:
+                    api_usage.add_worker_usage(calls_made, used, limit)
+                statuses = results_df['Status'].value_counts()
+                print(f"Shard {shard} finished with {calls_made} API calls: "
+                      + ', '.join(f"{status}: {count}" for status, count in statuses.items()))
+            except Exception as e:
+                # Some of the shard's users may have been created before it stopped
+                error = f"Shard {shard} stopped before reporting its results ({e}); the outcome of its users is unknown."
+                if journal_path:
+                    error += " Run again with --resume to reconcile them through the journal."
+                print(f"{error} See {log_path}.")
+                results_df = failed_results(processed_data.iloc[rows], error)
+            shard_results[shard] = results_df.set_axis(rows)
+
+    return pd.concat([shard_results[shard] for shard in sorted(shard_results)]).sort_index().reset_index(drop=True)
+
+def worker_sections(sf, config, session_cache_path):
+    """
+    The config sections workers connect with. They reuse the parent's session through a session cache
+    at session_cache_path that holds it, and keep the original credentials, so they log in again by
+    themselves if the session expires mid-run. A config that is itself a session id has nothing to
+    log in with and is passed on as it is.
+    """
+    sections = {section: dict(config.items(section, raw=True)) for section in config.sections()}
+    parent_client = SalesforceClient(config)
+    if parent_client.auth_method == 'session':
+        sections['salesforce_creds'] = {'instance_url': f"https://{sf.sf_instance}", 'session_id': sf.session_id}
+        return sections
+    SessionCache(session_cache_path).put(parent_client.cache_key(), sf.session_id, f"https://{sf.sf_instance}")
+    sections['salesforce_creds']['session_cache'] = session_cache_path
+    return sections
+
+def _run_shard(sections, shard_data, mapping, dry_run, queue_ids, requests_per_second, journal_path, log_path, creation_options):
+    """Runs in a worker process: connects its own client and creates one shard of users."""
+    config = configparser.ConfigParser()
+    config.read_dict(sections)
+    with open(log_path, 'w') as log, contextlib.redirect_stdout(log):
+        sf_client = SalesforceClient(config, min_pool_size=creation_options.get('concurrency'))
+        sf = sf_client.connect()
+        if sf is None:
+            raise RuntimeError("the worker could not connect to Salesforce")
+        journal = CreationJournal(journal_path) if journal_path else None
+        try:
+            results_df = create_salesforce_users(sf, shard_data, mapping, dry_run, requests_per_second=requests_per_second,
+                                                 journal=journal, queue_ids=queue_ids, **creation_options)
+        finally:
+            if journal: journal.close()
+    api_usage = sf_client.api_usage
+    return results_df, (api_usage.calls_made, api_usage.used, api_usage.limit)
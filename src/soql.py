@@ -0,0 +1,61 @@
+from concurrent.futures import ThreadPoolExecutor
+
+# Queries are sent as GET parameters, so keep each IN list well under both the
+# SOQL statement limit and typical URI length limits once URL-encoded.
+MAX_IN_CLAUSE_CHARS = 4000
+
+# How many chunk queries may run at once.
+DEFAULT_MAX_WORKERS = 4
+
+_SOQL_ESCAPES = {
+    '\\': '\\\\', "'": "\\'", '"': '\\"',
+    '\n': '\\n', '\r': '\\r', '\t': '\\t', '\b': '\\b', '\f': '\\f'
+}
+
+def escape_soql(value):
+    """Escapes a value for use inside a single-quoted SOQL string literal."""
+    return ''.join(_SOQL_ESCAPES.get(char, char) for char in str(value))
+
+def build_in_clauses(values, max_chars=MAX_IN_CLAUSE_CHARS):
+    """
+    Splits values into IN clauses of the form ('a','b'), each at most `max_chars` long.
+    Values are escaped and de-duplicated, keeping their first-seen order.
+    """
+    clauses = []
+    current, current_len = [], 2
+    for value in dict.fromkeys(str(v) for v in values):
+        literal = f"'{escape_soql(value)}'"
+        added_len = len(literal) + (1 if current else 0)
+        if current and current_len + added_len > max_chars:
+            clauses.append(f"({','.join(current)})")
+            current, current_len = [], 2
+            added_len = len(literal)
+        current.append(literal)
+        current_len += added_len
+    if current:
+        clauses.append(f"({','.join(current)})")
+    return clauses
+
+def query_in_chunks(sf, query_template, values, max_chars=MAX_IN_CLAUSE_CHARS, max_workers=DEFAULT_MAX_WORKERS):
+    """
+    Runs a query whose IN list may be arbitrarily long by splitting the values into
+    size-bounded chunks, querying the chunks in parallel and merging the records.
+
+    :param sf: The simple-salesforce connection object.
+    :param query_template: The SOQL query with an `{in_clause}` placeholder,
+                           e.g. "SELECT Id FROM User WHERE Id IN {in_clause}".
+    :param values: The values to match.
+    :return: A query_all-style dict with the records of every chunk, in chunk order.
+    """
+    queries = [query_template.format(in_clause=clause) for clause in build_in_clauses(values, max_chars)]
+    if not queries:
+        return {'totalSize': 0, 'done': True, 'records': []}
+
+    if len(queries) == 1:
+        results = [sf.query_all(queries[0])]
+    else:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(queries))) as executor:
+            results = list(executor.map(sf.query_all, queries))
+
+    records = [record for result in results for record in result['records']]
+    return {'totalSize': len(records), 'done': True, 'records': records}
@@ -0,0 +1,57 @@
+import os
+from collections import Counter
+import pandas as pd
+from src.data_processor import process_dataframes
+from src.rate_limiter import RateLimiter
+from src.user_creator import create_salesforce_users, query_queue_ids
+
+# Pre-flight rows read, joined and created at a time in streaming mode.
+DEFAULT_CHUNK_SIZE = 5000
+
+def iter_csv_chunks(path, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yields the rows of a CSV file as DataFrames of at most chunk_size rows, reading lazily."""
+    if chunk_size < 1:
+        raise ValueError(f"Chunk size must be at least 1, got {chunk_size}.")
+    with pd.read_csv(path, chunksize=chunk_size) as reader:
+        yield from reader
+
+def stream_create_users(sf, chunks, persona_df, sso_df, mapping, output_path, environment='Training', dry_run=True,
+                        requests_per_second=None, reference_validator=None, **creation_options):
+    """
+    Creates users one chunk of the pre-flight report at a time, so memory use stays flat however
+    large the input is. Each chunk is joined with the (small) persona and SSO tables, created with
+    create_salesforce_users, and its results are appended to output_path before the next chunk is read.
+
+    :param chunks: An iterable of pre-flight report DataFrames (see iter_csv_chunks). Only rows whose
+                   Action is 'Create New User' are created.
+    :param output_path: The creation results CSV, rewritten from the start. It is removed again if
+                        no users were processed.
+    :param requests_per_second: Optional cap on API calls per second, shared by all chunks.
+    :param reference_validator: Optional ReferenceValidator that checks each chunk's references before
+                                it is created; values already checked for earlier chunks are not queried again.
+    :param creation_options: Passed on to create_salesforce_users (mode, batch_size, journal, resume...).
+    :return: A Counter of result Status -> number of users.
+    """
+    # Queues are looked up once for every persona instead of once per chunk
+    queue_ids = {} if dry_run else query_queue_ids(sf, persona_df)
+    limiter = RateLimiter(requests_per_second) if requests_per_second else None
+    statuses = Counter()
+
+    try:
+        with open(output_path, 'w', newline='') as output:
+            for chunk_number, chunk in enumerate(chunks, 1):
+                users_to_create_df = chunk[chunk['Action'] == 'Create New User']
+                if users_to_create_df.empty:
+                    continue
+                processed_data = process_dataframes(users_to_create_df, persona_df, sso_df, environment)
+                missing_references = reference_validator.check(processed_data) if reference_validator else None
+                results_df = create_salesforce_users(sf, processed_data, mapping, dry_run, queue_ids=queue_ids, limiter=limiter,
+                                                     missing_references=missing_references, **creation_options)
+                results_df.to_csv(output, header=not statuses, index=False)
+                output.flush()
+                statuses.update(results_df['Status'])
+                print(f"Chunk {chunk_number}: {len(results_df)} users processed ({sum(statuses.values())} so far).")
+    finally:
+        if not statuses:
+            os.remove(output_path)
+    return statuses
@@ -0,0 +1,157 @@
+import argparse
+import importlib.util
+import os
+import numpy as np
+import pandas as pd
+from src.workbook_loader import TEMPLATE_SHEET, PERSONA_SHEET, SSO_SHEET
+
+FORMATS = ('xlsx', 'csv', 'parquet')
+ENVIRONMENTS = ('QA2', 'Training', 'Prod')
+
+# File names of the sheets when the data is written as csv or parquet, one file per sheet.
+SHEET_FILES = {TEMPLATE_SHEET: 'training_template', PERSONA_SHEET: 'persona_mapping', SSO_SHEET: 'tsso_train_the_trainer'}
+
+# An Excel worksheet holds at most this many rows, including the header.
+MAX_EXCEL_ROWS = 1048576
+
+DEFAULT_PERSONAS = 25
+DEFAULT_QUEUES = 8
+DEFAULT_SSO_FRACTION = 0.05
+EMAIL_DOMAIN = 'synthetic.example.org'
+
+_FIRST_NAMES = np.array(['Kelli', 'Tina', 'Littel', 'Ana', 'Ben', 'Chen', 'Dana', 'Eli', 'Fatima', 'Gus', 'Hana', 'Ivan',
+                         'Jo', 'Kim', 'Luis', 'Mia', 'Noor', 'Omar', 'Priya', 'Quinn', 'Rosa', 'Sam', 'Tariq', 'Uma'])
+_LAST_NAMES = np.array(['Brunt', 'Cooper', 'Gaines', 'Adams', 'Diaz', 'Evans', 'Huang', 'Ito', 'Khan', 'Lopez', 'Novak',
+                        'Okafor', 'Patel', 'Reyes', 'Silva', 'Tran', 'Vargas', 'Weber', 'Young', 'Zhou'])
+_TIME_ZONES = np.array(['America/Chicago', 'America/New_York', 'America/Los_Angeles', 'America/Denver'])
+_LANGUAGES = np.array(['en_US', 'en_US', 'en_US', 'es_MX'])
+_ROLES = ('Tier 1 Rep - English', 'Tier 1 Rep - Spanish/Bilingual', 'Tier 1 Supervisor', 'Tier 2 Rep', 'Quality Analyst')
+
+def queue_names(count=DEFAULT_QUEUES):
+    """The names of the queues the generated personas are assigned to."""
+    return [f"Queue{n}" for n in range(1, count + 1)]
+
+def generate_workbook_frames(rows, seed=0, personas=DEFAULT_PERSONAS, queues=DEFAULT_QUEUES, sso_fraction=DEFAULT_SSO_FRACTION):
+    """
+    Generates the three sheets of a source workbook with `rows` users. The same arguments always
+    produce the same data.
+
+    :param rows: Number of Training Template rows.
+    :param seed: Seed of the random generator.
+    :param personas: Number of personas in the Persona Mapping, each with IDs for every environment.
+    :param queues: Number of distinct queue names the personas draw from (see queue_names).
+    :param sso_fraction: Share of the users also listed on the TSSO_TrainTheTrainer sheet.
+    :return: A dict of sheet name -> DataFrame, with the columns of a real workbook.
+    """
+    rng = np.random.default_rng(seed)
+    persona_df = _generate_personas(rng, personas, queue_names(queues))
+
+    first = pd.Series(_FIRST_NAMES[rng.integers(0, len(_FIRST_NAMES), rows)])
+    last = pd.Series(_LAST_NAMES[rng.integers(0, len(_LAST_NAMES), rows)])
+    number = pd.Series(np.arange(1, rows + 1)).astype(str)
+    employee_id = number.str.zfill(7)
+    name_email = last + '-' + first + number + '@' + EMAIL_DOMAIN
+
+    user_df = pd.DataFrame({
+        'Email (employee ID version)': employee_id + '@' + EMAIL_DOMAIN,
+        'Email (name version)': name_email,
+        'FirstName': first,
+        'LastName': last,
+        'Persona Name': persona_df['Persona Name'].to_numpy()[rng.integers(0, personas, rows)],
+        'Username': name_email + '.train',
+        'Alias': (first.str[0] + last.str[:4]).str.lower() + number.str[-3:],
+        'TimeZoneSidKey': _TIME_ZONES[rng.integers(0, len(_TIME_ZONES), rows)],
+        'LocaleSidKey': 'en_US',
+        'LanguageLocaleKey': _LANGUAGES[rng.integers(0, len(_LANGUAGES), rows)],
+        'EmailEncodingKey': 'UTF-8',
+        'IsActive': rng.random(rows) < 0.95,
+        'UserPermissionsInteractionUser': rng.random(rows) < 0.5,
+        'Is_Migrated__c': False,
+        'Contact Center': 'center' + pd.Series(rng.integers(1, 6, rows)).astype(str),
+        'FederationIdentifier': 'e' + employee_id,
+        'added by': np.where(rng.random(rows) < 0.8, 'Josh', 'Not Josh')
+    })
+
+    sso_rows = np.sort(rng.choice(rows, size=int(rows * sso_fraction), replace=False))
+    sso_df = user_df.iloc[sso_rows][['Email (employee ID version)', 'Email (name version)', 'FirstName', 'LastName', 'Persona Name']]
+    sso_df = sso_df.rename(columns={'FirstName': 'First Name', 'LastName': 'Last Name'}).reset_index(drop=True)
+
+    return {TEMPLATE_SHEET: user_df, PERSONA_SHEET: persona_df, SSO_SHEET: sso_df}
+
+def _generate_personas(rng, count, queues):
+    persona = {'Persona Name': [f"{_ROLES[n % len(_ROLES)]} {n + 1:03d}" for n in range(count)]}
+    for env_index, environment in enumerate(ENVIRONMENTS):
+        # Ids are shaped like real 18-character Salesforce Ids and differ per environment
+        persona[f'Profile ID ({environment})'] = [f"00eSYN{env_index}{n % 5:011d}" for n in range(count)]
+        persona[f'Role ID ({environment})'] = [f"00ESYN{env_index}{n:011d}" for n in range(count)]
+        persona[f'Permission Set Group IDs ({environment})'] = [
+            ';'.join(f"0PGSYN{env_index}{g:011d}" for g in sorted(rng.choice(10, size=rng.integers(1, 4), replace=False)))
+            for _ in range(count)
+        ]
+        persona[f'Contact Center {environment}'] = [f"04vSYN{env_index}{n % 5:011d}" for n in range(count)]
+    persona['Queues'] = ['\n'.join(rng.choice(queues, size=rng.integers(1, 3), replace=False)) for _ in range(count)]
+    return pd.DataFrame(persona)
+
+def write_workbook_frames(frames, path, fmt='xlsx'):
+    """
+    Writes generated sheets to disk.
+
+    :param path: The .xlsx file for 'xlsx'; for 'csv' and 'parquet', a directory that receives
+                 one file per sheet (named as in SHEET_FILES), as load_and_process_csv_data expects.
+    :return: The paths written.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format '{fmt}'. Choose from: {', '.join(FORMATS)}.")
+    if fmt == 'xlsx':
+        if any(len(df) >= MAX_EXCEL_ROWS for df in frames.values()):
+            raise ValueError(f"An Excel sheet holds at most {MAX_EXCEL_ROWS - 1} data rows; use csv or parquet.")
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with pd.ExcelWriter(path, engine='openpyxl') as writer:
+            for sheet_name, df in frames.items():
+                df.to_excel(writer, sheet_name=sheet_name, index=False)
+        return [path]
+
+    if fmt == 'parquet' and not (importlib.util.find_spec('pyarrow') or importlib.util.find_spec('fastparquet')):
+        raise ValueError("Writing parquet needs the pyarrow or fastparquet package.")
+    os.makedirs(path, exist_ok=True)
+    paths = []
+    for sheet_name, df in frames.items():
+        file_path = os.path.join(path, f"{SHEET_FILES[sheet_name]}.{fmt}")
+        if fmt == 'csv':
+            df.to_csv(file_path, index=False)
+        else:
+            df.to_parquet(file_path, index=False)
+        paths.append(file_path)
+    return paths
+
+def read_workbook_frames(path, fmt='xlsx'):
+    """Reads back sheets written by write_workbook_frames. :return: A dict of sheet name -> DataFrame."""
+    if fmt == 'xlsx':
+        return pd.read_excel(path, sheet_name=list(SHEET_FILES))
+    read = pd.read_csv if fmt == 'csv' else pd.read_parquet
+    return {sheet_name: read(os.path.join(path, f"{file_name}.{fmt}")) for sheet_name, file_name in SHEET_FILES.items()}
+
+def main():
+    """Writes a synthetic source workbook of any size."""
+    parser = argparse.ArgumentParser(description="Generate a deterministic synthetic source workbook for testing and benchmarks.")
+    parser.add_argument('--rows', type=int, required=True, help="Number of users in the Training Template.")
+    parser.add_argument('--seed', type=int, default=0, help="Random seed; the same seed always produces the same data.")
+    parser.add_argument('--format', choices=FORMATS, default='xlsx', help="Output format (csv and parquet write one file per sheet).")
+    parser.add_argument('--output', type=str, default=None, help="Output file (xlsx) or directory (csv, parquet). Default: reports/synthetic_<rows>[.xlsx].")
+    parser.add_argument('--personas', type=int, default=DEFAULT_PERSONAS, help=f"Number of personas (default: {DEFAULT_PERSONAS}).")
+    parser.add_argument('--queues', type=int, default=DEFAULT_QUEUES, help=f"Number of queues the personas use (default: {DEFAULT_QUEUES}).")
+    parser.add_argument('--sso-fraction', type=float, default=DEFAULT_SSO_FRACTION, help=f"Share of users listed for SSO (default: {DEFAULT_SSO_FRACTION}).")
+    args = parser.parse_args()
+
+    output = args.output or os.path.join('reports', f"synthetic_{args.rows}" + ('.xlsx' if args.format == 'xlsx' else ''))
+    frames = generate_workbook_frames(args.rows, args.seed, args.personas, args.queues, args.sso_fraction)
+    try:
+        paths = write_workbook_frames(frames, output, args.format)
+    except ValueError as e:
+        print(f"Error: {e}")
+        return
+    print(f"Wrote {args.rows} users, {args.personas} personas and {len(frames[SSO_SHEET])} SSO users to {', '.join(paths)}.")
+    print(f"Queues used by the personas: {' '.join(queue_names(args.queues))}")
+
+if __name__ == '__main__':
+    main()
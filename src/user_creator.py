@@ -1,104 +1,744 @@
 import pandas as pd
+import requests
+from concurrent.futures import ThreadPoolExecutor
 from simple_salesforce.exceptions import SalesforceError
-from src.mapper import map_row_to_payload
+from src.mapper import map_dataframe, frame_to_payloads
+from src.bulk_ingest import BulkIngestClient, parse_bulk_error
+from src.rate_limiter import RateLimiter
+from src.soql import query_in_chunks
+from src.reference_validator import BLOCKING_REFERENCES, REFERENCE_LABELS, split_references
+from src.journal import INSERT_STEP, ASSIGN_STEP_PREFIX, STARTED, SUCCEEDED, FAILED
+from src.retry import RetryPolicy, reset_retry_count, retry_count, note_error_codes, request_not_sent
 
-def create_salesforce_users(sf, processed_data, mapping, dry_run=True):
+# Salesforce accepts at most 200 records per sObject Collections request.
+MAX_COLLECTION_SIZE = 200
+
+# Composite Graph limits: graphs per request and nodes (subrequests) per request.
+MAX_GRAPHS_PER_REQUEST = 75
+MAX_GRAPH_NODES = 500
+
+CREATION_MODES = ('rest', 'collections', 'bulk', 'graph')
+
+# Modes that can upsert users by an external ID instead of inserting them.
+UPSERT_MODES = ('collections', 'bulk')
+DEFAULT_UPSERT_FIELD = 'FederationIdentifier'
+
+def create_salesforce_users(sf, processed_data, mapping, dry_run=True, mode='rest', batch_size=MAX_COLLECTION_SIZE,
+                            concurrency=1, requests_per_second=None, graph_size=1, journal=None, resume=False,
+                            queue_ids=None, limiter=None, upsert_field=None, missing_references=None):
     """
     Creates users in Salesforce using a dynamic mapping.
+
+    :param mode: 'rest' creates one user per REST call; 'collections' sends up to
+                 `batch_size` User records per sObject Collections request; 'bulk'
+                 loads all users through a Bulk API 2.0 ingest job; 'graph' creates each
+                 user together with its assignments in an all-or-nothing Composite Graph.
+    :param batch_size: Number of users per collections request (1-200).
+    :param concurrency: In 'rest' mode, how many users are provisioned in parallel.
+    :param requests_per_second: Optional cap on API calls per second across all workers.
+    :param graph_size: In 'graph' mode, how many users share one all-or-nothing graph. Fewer users
+                       share it when their assignments would exceed the graph node limit.
+    :param journal: Optional CreationJournal that records every insert and assignment outcome as it happens.
+    :param resume: If True, users the journal shows as created are not inserted again;
+                   only their unfinished assignment steps are retried.
+    :param queue_ids: Optional dict of queue name -> Id that was already looked up (see query_queue_ids).
+                      By default the queues named in processed_data are queried.
+    :param limiter: Optional RateLimiter shared with other calls, used instead of requests_per_second.
+    :param upsert_field: Optional external ID field (e.g. FederationIdentifier). Users are then upserted
+                         by it, in 'collections' or 'bulk' mode: new users are created and existing ones
+                         updated in the same pass, and the results gain an Operation column
+                         ('Created', 'Updated' or 'Failed'). An upsert is safe to repeat, so resuming
+                         submits every user again.
+    :param missing_references: Optional dict of column -> values not found in the org, from
+                               ReferenceValidator.check. Users with a missing Profile or Role fail
+                               without an insert; missing Permission Set Groups are skipped and
+                               reported in AssignmentErrors, like queues that don't exist.
     """
-    results_list = []
+    if mode not in CREATION_MODES:
+        raise ValueError(f"Unknown creation mode '{mode}'. Expected one of: {', '.join(CREATION_MODES)}.")
+    if mode == 'collections' and not 1 <= batch_size <= MAX_COLLECTION_SIZE:
+        raise ValueError(f"Batch size must be between 1 and {MAX_COLLECTION_SIZE}, got {batch_size}.")
+    if concurrency < 1:
+        raise ValueError(f"Concurrency must be at least 1, got {concurrency}.")
+    if concurrency > 1 and mode != 'rest':
+        raise ValueError("Concurrency greater than 1 is only supported in 'rest' mode.")
+    if graph_size < 1:
+        raise ValueError(f"Graph size must be at least 1, got {graph_size}.")
+    if resume and journal is None:
+        raise ValueError("A journal is required to resume a run.")
+    if upsert_field and mode not in UPSERT_MODES:
+        raise ValueError(f"Upserting users is only supported in {' and '.join(repr(m) for m in UPSERT_MODES)} modes.")
 
-    queue_ids = {}
-    if not dry_run:
-        all_queue_names = set(
-            q_name.strip()
-            for queues in processed_data['Queues'].dropna()
-            for q_name in queues.split('\n')
-            if q_name.strip()
-        )
-        if all_queue_names:
-            in_clause = "('" + "','".join(all_queue_names) + "')"
-            query = f"SELECT Id, Name FROM Group WHERE Type = 'Queue' AND Name IN {in_clause}"
-            try:
-                results = sf.query_all(query)
-                for record in results['records']:
-                    queue_ids[record['Name']] = record['Id']
-            except SalesforceError as e:
-                print(f"Warning: Could not query for Queue IDs. {e}")
-
-    for index, user_data in processed_data.iterrows():
+    if limiter is None and requests_per_second:
+        limiter = RateLimiter(requests_per_second)
+
+    if queue_ids is None:
+        queue_ids = {} if dry_run else query_queue_ids(sf, processed_data)
+
+    results_list = []
+    pending = []
+    user_payloads = build_user_payloads(processed_data, mapping)
+    for index, user_data, user_payload in zip(processed_data.index, processed_data.to_dict('records'), user_payloads):
         user_identifier = user_data.get('Username', f"Row_{index}")
-        print(f"--- Processing user: {user_identifier} ---")
 
         result_record = {
-            'Username': user_identifier, 'Status': '', 'SalesforceId': None, 'Error': '', 'AssignmentErrors': ''
+            'Username': user_identifier, 'Status': '', 'SalesforceId': None, 'Error': '', 'AssignmentErrors': '',
+            'Retries': 0
         }
+        if upsert_field:
+            result_record['Operation'] = ''
+        results_list.append(result_record)
 
-        # Use the mapper to create the payload
-        user_payload = map_row_to_payload(user_data, mapping)
-
-        # Add fields from the processed data that are not in the mapping file
-        if 'ProfileID' in user_data and pd.notna(user_data['ProfileID']):
-             user_payload['ProfileId'] = user_data['ProfileID']
-        if 'RoleID' in user_data and pd.notna(user_data['RoleID']):
-             user_payload['UserRoleId'] = user_data['RoleID']
-        if 'EnableSSO' in user_data and user_data['EnableSSO'] and 'FederationIdentifier' not in user_payload:
-            # If SSO is enabled but FederationIdentifier was not in the mapping, use a default
-            if 'FederationIdentifier' in user_data and pd.notna(user_data['FederationIdentifier']):
-                user_payload['FederationIdentifier'] = user_data['FederationIdentifier']
-
+        if missing_references:
+            blocking_errors, user_data = _check_missing_references(user_data, missing_references)
+            if blocking_errors:
+                err_msg = f"Reference check failed: {'; '.join(blocking_errors)}"
+                print(f"Error processing user {user_identifier}: {err_msg}")
+                result_record.update({'Status': 'Failed', 'Error': err_msg})
+                continue
 
         if dry_run:
-            print(f"[DRY RUN] Would create user with payload: {user_payload}")
+            print(f"--- Processing user: {user_identifier} ---")
+            print(f"[DRY RUN] Would {f'upsert (by {upsert_field})' if upsert_field else 'create'} user with payload: {user_payload}")
             result_record['Status'] = 'Dry Run - Not Created'
-            results_list.append(result_record)
             continue
 
+        pending.append((user_data, user_payload, result_record))
+
+    resumed = []
+    if resume and not upsert_field:
+        pending, resumed = _resume_from_journal(sf, pending, journal)
+
+    if mode == 'collections':
+        _create_users_in_collections(sf, pending, queue_ids, batch_size, limiter, journal, upsert_field)
+    elif mode == 'bulk':
+        _create_users_with_bulk_api(sf, pending, queue_ids, journal, upsert_field)
+    elif mode == 'graph':
+        _create_users_in_graphs(sf, pending, queue_ids, graph_size, limiter, journal)
+    elif concurrency > 1:
+        _create_users_concurrently(sf, pending, queue_ids, concurrency, limiter, journal)
+    else:
+        for user_data, user_payload, result_record in pending:
+            _create_user(sf, user_data, user_payload, result_record, queue_ids, limiter, journal=journal)
+
+    for user_id, user_data, result_record, completed_steps in resumed:
+        print(f"--- Resuming assignments for user: {result_record['Username']} ---")
+        reset_retry_count()
+        _record_assignment_errors(result_record, _assign_access(sf, user_id, user_data, queue_ids, limiter,
+                                                                journal=journal, username=result_record['Username'],
+                                                                completed_steps=completed_steps))
+        result_record['Retries'] += retry_count()
+
+    if upsert_field:
+        for result_record in results_list:
+            if result_record['Status'] == 'Failed':
+                result_record['Operation'] = 'Failed'
+    return pd.DataFrame(results_list)
+
+def build_user_payloads(processed_data, mapping):
+    """
+    Builds the User payloads for all rows of processed data at once, working on whole columns.
+    :return: A list of payload dictionaries in row order, without null fields.
+    """
+    # Fields from the processed data that are not in the mapping file override the mapped values
+    fields = map_dataframe(processed_data, {**mapping, 'ProfileID': 'ProfileId', 'RoleID': 'UserRoleId'})
+
+    if 'EnableSSO' in processed_data.columns and 'FederationIdentifier' in processed_data.columns:
+        # If SSO is enabled but FederationIdentifier was not in the mapping, use the value from the data
+        sso_ids = processed_data['FederationIdentifier'].where(processed_data['EnableSSO'].astype(bool))
+        if 'FederationIdentifier' in fields.columns:
+            fields['FederationIdentifier'] = fields['FederationIdentifier'].where(fields['FederationIdentifier'].notna(), sso_ids)
+        else:
+            fields['FederationIdentifier'] = sso_ids
+
+    return frame_to_payloads(fields)
+
+def failed_results(processed_data, error):
+    """Results in the shape create_salesforce_users returns, marking every user of processed_data as failed with `error`."""
+    usernames = processed_data['Username'] if 'Username' in processed_data.columns else [f"Row_{index}" for index in processed_data.index]
+    return pd.DataFrame({
+        'Username': list(usernames), 'Status': 'Failed', 'SalesforceId': None, 'Error': error, 'AssignmentErrors': '', 'Retries': 0
+    })
+
+def query_queue_ids(sf, processed_data):
+    """Looks up the Ids of every queue referenced in the 'Queues' column of processed data (or the Persona Mapping)."""
+    queue_ids = {}
+    all_queue_names = set(
+        q_name.strip()
+        for queues in processed_data['Queues'].dropna()
+        for q_name in queues.split('\n')
+        if q_name.strip()
+    )
+    if all_queue_names:
+        query = "SELECT Id, Name FROM Group WHERE Type = 'Queue' AND Name IN {in_clause}"
         try:
-            result = sf.User.create(user_payload)
-            if not result.get('success', False):
-                raise Exception(f"User creation failed: {result.get('errors', 'Unknown error')}")
-
-            user_id = result['id']
-            print(f"Successfully created user with ID: {user_id}")
-            result_record.update({'Status': 'Success', 'SalesforceId': user_id})
-
-            assignment_errors = []
-            # Assign Permission Set Groups
-            if 'PermissionSetGroupIDs' in user_data and pd.notna(user_data['PermissionSetGroupIDs']):
-                for psg_id in str(user_data['PermissionSetGroupIDs']).split(';'):
-                    psg_id = psg_id.strip()
-                    if not psg_id: continue
-                    try:
-                        sf.PermissionSetAssignment.create({'AssigneeId': user_id, 'PermissionSetGroupId': psg_id})
-                        print(f"Assigned Permission Set Group {psg_id} to user {user_id}")
-                    except Exception as e:
-                        err_msg = f"Failed to assign PSG {psg_id}: {e}"
-                        print(err_msg)
-                        assignment_errors.append(err_msg)
-
-            # Assign to Queues
-            if 'Queues' in user_data and pd.notna(user_data['Queues']):
-                for q_name in [q.strip() for q in user_data['Queues'].split('\n') if q.strip()]:
-                    if q_name in queue_ids:
-                        try:
-                            sf.GroupMember.create({'GroupId': queue_ids[q_name], 'UserOrGroupId': user_id})
-                            print(f"Assigned user {user_id} to queue {q_name}")
-                        except Exception as e:
-                            err_msg = f"Failed to assign to Queue {q_name}: {e}"
-                            print(err_msg)
-                            assignment_errors.append(err_msg)
-                    else:
-                        assignment_errors.append(f"Queue '{q_name}' not found.")
-
-            if assignment_errors:
-                result_record['Status'] = 'Success with errors'
-                result_record['AssignmentErrors'] = "\n".join(assignment_errors)
+            results = query_in_chunks(sf, query, sorted(all_queue_names))
+            for record in results['records']:
+                queue_ids[record['Name']] = record['Id']
+        except SalesforceError as e:
+            print(f"Warning: Could not query for Queue IDs. {e}")
+    return queue_ids
+
+def _resume_from_journal(sf, pending, journal):
+    """
+    Splits the pending users into those that still need a User insert and those the
+    journal shows as already created.
+
+    Users whose insert was started but never recorded an outcome (the run died mid-call)
+    are looked up by Username, so they are not inserted a second time.
+
+    :return: A tuple (still_pending, resumed) where resumed holds
+             (user_id, user_data, result_record, completed_steps) tuples.
+    """
+    state = journal.load_state()
+
+    in_doubt = [result_record['Username'] for _, _, result_record in pending
+                if state.get(str(result_record['Username']), {}).get(INSERT_STEP, (None,))[0] == STARTED]
+    existing_ids = _find_existing_usernames(sf, in_doubt) if in_doubt else {}
+
+    still_pending, resumed = [], []
+    for user_data, user_payload, result_record in pending:
+        username = str(result_record['Username'])
+        steps = state.get(username, {})
+        insert_status, user_id, _ = steps.get(INSERT_STEP, (None, None, ''))
 
+        if insert_status == STARTED and username in existing_ids:
+            user_id = existing_ids[username]
+            journal.record(username, INSERT_STEP, SUCCEEDED, user_id, 'Found in org while resuming')
+        elif insert_status != SUCCEEDED:
+            still_pending.append((user_data, user_payload, result_record))
+            continue
+
+        result_record.update({'Status': 'Success', 'SalesforceId': user_id})
+        completed_steps = {step for step, (status, _, _) in steps.items()
+                           if step.startswith(ASSIGN_STEP_PREFIX) and status == SUCCEEDED}
+        resumed.append((user_id, user_data, result_record, completed_steps))
+
+    print(f"Resuming from journal: {len(resumed)} users already created, {len(still_pending)} still to create.")
+    return still_pending, resumed
+
+def _find_existing_usernames(sf, usernames):
+    """Returns a dict of Username -> Id for the given usernames that already exist in the org."""
+    results = query_in_chunks(sf, "SELECT Id, Username FROM User WHERE Username IN {in_clause}", usernames)
+    return {record['Username']: record['Id'] for record in results['records']}
+
+def _create_user(sf, user_data, user_payload, result_record, queue_ids, limiter=None, log=print, journal=None):
+    """Creates a single user with one REST call, then assigns its access."""
+    user_identifier = result_record['Username']
+    log(f"--- Processing user: {user_identifier} ---")
+    reset_retry_count()
+    try:
+        _wait_for_slot(limiter)
+        _journal_insert_started(journal, [result_record])
+        result = sf.User.create(user_payload)
+        if not result.get('success', False):
+            raise Exception(f"User creation failed: {result.get('errors', 'Unknown error')}")
+
+        user_id = result['id']
+        log(f"Successfully created user with ID: {user_id}")
+        _mark_created(result_record, user_id, journal)
+
+        _record_assignment_errors(result_record, _assign_access(sf, user_id, user_data, queue_ids, limiter, log,
+                                                                journal, user_identifier))
+
+    except Exception as e:
+        log(f"Error processing user {user_identifier}: {e}")
+        if result_record['Status'] == 'Success':
+            result_record.update({'Status': 'Success with errors', 'AssignmentErrors': str(e)})
+        else:
+            _mark_insert_error(result_record, e, journal)
+    finally:
+        result_record['Retries'] += retry_count()
+
+def _create_users_concurrently(sf, pending, queue_ids, concurrency, limiter, journal=None):
+    """
+    Provisions up to `concurrency` users at a time on a thread pool.
+
+    Each worker only touches its own result record and buffers its own log lines,
+    which are printed in input order so the output is the same on every run.
+    """
+    def provision(entry):
+        user_data, user_payload, result_record = entry
+        log_lines = []
+        _create_user(sf, user_data, user_payload, result_record, queue_ids, limiter, log_lines.append, journal)
+        return log_lines
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for log_lines in executor.map(provision, pending):
+            print("\n".join(log_lines))
+
+def _create_users_in_collections(sf, pending, queue_ids, batch_size, limiter=None, journal=None, upsert_field=None):
+    """
+    Inserts users through the sObject Collections API, `batch_size` records per request, or upserts
+    them by `upsert_field`. Each per-record outcome is mapped back onto its result record by position.
+    """
+    if upsert_field:
+        pending = list(_index_by_key(pending, upsert_field, 'upsert users').values())
+    action = f"Upserting (by {upsert_field})" if upsert_field else "Creating"
+    created = []
+    for start in range(0, len(pending), batch_size):
+        batch = pending[start:start + batch_size]
+        print(f"--- {action} users {start + 1}-{start + len(batch)} of {len(pending)} via sObject Collections ---")
+        records = [dict(user_payload, attributes={'type': 'User'}) for _, user_payload, _ in batch]
+
+        reset_retry_count()
+        try:
+            _journal_insert_started(journal, [result_record for _, _, result_record in batch])
+            responses, retries = _post_collection(sf, records, limiter, upsert_field)
         except Exception as e:
-            print(f"Error processing user {user_identifier}: {e}")
-            result_record.update({'Status': 'Failed', 'Error': str(e)})
+            print(f"Error creating batch of {len(batch)} users: {e}")
+            for _, _, result_record in batch:
+                result_record['Retries'] += retry_count()
+                _mark_insert_error(result_record, e, journal)
+            continue
 
-        results_list.append(result_record)
+        for (user_data, _, result_record), response, record_retries in zip(batch, responses, retries):
+            user_identifier = result_record['Username']
+            result_record['Retries'] += record_retries
+            if response is None:
+                _mark_failed(result_record, 'No result returned for this record.', journal)
+                continue
+            if not response.get('success', False):
+                err_msg = f"User {'upsert' if upsert_field else 'creation'} failed: {_format_errors(response.get('errors'))}"
+                print(f"Error processing user {user_identifier}: {err_msg}")
+                _mark_failed(result_record, err_msg, journal)
+                continue
 
-    return pd.DataFrame(results_list)
+            user_id = response['id']
+            _mark_created(result_record, user_id, journal)
+            if upsert_field:
+                result_record['Operation'] = 'Created' if response.get('created') else 'Updated'
+            print(f"Successfully {result_record.get('Operation', 'Created').lower()} user {user_identifier} with ID: {user_id}")
+            created.append((user_id, user_data, result_record))
+
+    _assign_access_in_batches(sf, created, queue_ids, limiter, journal)
+
+def _create_users_with_bulk_api(sf, pending, queue_ids, journal=None, upsert_field=None):
+    """
+    Inserts users through Bulk API 2.0, or upserts them by `upsert_field`. Bulk results are not
+    returned in submission order, so each result row is matched back to its user by Username
+    (or by the upsert field).
+    """
+    key_field = upsert_field or 'Username'
+    by_key = _index_by_key(pending, key_field, 'upsert users' if upsert_field else 'create users with the Bulk API')
+    if not by_key:
+        return
+
+    operation = 'upsert' if upsert_field else 'insert'
+    print(f"--- {'Upserting' if upsert_field else 'Creating'} {len(by_key)} users via Bulk API 2.0 ---")
+    bulk_client = BulkIngestClient.from_salesforce(sf)
+    _journal_insert_started(journal, [result_record for _, _, result_record in by_key.values()])
+    reset_retry_count()
+    try:
+        successful, failed = bulk_client.ingest('User', [user_payload for _, user_payload, _ in by_key.values()],
+                                                operation=operation, external_id_field=upsert_field)
+    except Exception as e:
+        # The job may still complete on the server, so the inserts stay 'started' in the
+        # journal and are reconciled against the org on --resume.
+        print(f"Error running Bulk API job: {e}")
+        for _, _, result_record in by_key.values():
+            result_record.update({'Status': 'Failed', 'Error': str(e), 'Retries': retry_count()})
+        return
+
+    # A retried job request delayed every user in the job, so each of them is credited with it
+    job_retries = retry_count()
+    for _, _, result_record in by_key.values():
+        result_record['Retries'] += job_retries
+
+    for row in failed:
+        entry = by_key.pop(row.get(key_field), None)
+        if entry:
+            err_msg = f"User {'upsert' if upsert_field else 'creation'} failed: {parse_bulk_error(row.get('sf__Error'))}"
+            print(f"Error processing user {entry[2]['Username']}: {err_msg}")
+            _mark_failed(entry[2], err_msg, journal)
+
+    created = []
+    for row in successful:
+        entry = by_key.pop(row.get(key_field), None)
+        if entry:
+            user_data, _, result_record = entry
+            user_id = row['sf__Id']
+            _mark_created(result_record, user_id, journal)
+            if upsert_field:
+                result_record['Operation'] = 'Created' if str(row.get('sf__Created')).lower() == 'true' else 'Updated'
+            print(f"Successfully {result_record.get('Operation', 'Created').lower()} user {result_record['Username']} with ID: {user_id}")
+            created.append((user_id, user_data, result_record))
+
+    for _, _, result_record in by_key.values():
+        _mark_failed(result_record, 'No result returned for this record.', journal)
+
+    _assign_access_in_batches(sf, created, queue_ids, journal=journal)
+
+def _index_by_key(pending, key_field, purpose):
+    """
+    Keys pending users by a payload field that must identify them uniquely, failing users without
+    a value or with a value another user already has.
+    :return: A dict of str(value) -> (user_data, user_payload, result_record), in input order.
+    """
+    by_key = {}
+    for user_data, user_payload, result_record in pending:
+        value = user_payload.get(key_field)
+        if value is None or value == '':
+            result_record.update({'Status': 'Failed', 'Error': f"{key_field} is required to {purpose}."})
+        elif str(value) in by_key:
+            result_record.update({'Status': 'Failed', 'Error': f"Duplicate {key_field} '{value}' in input."})
+        else:
+            by_key[str(value)] = (user_data, user_payload, result_record)
+    return by_key
+
+def _create_users_in_graphs(sf, pending, queue_ids, graph_size, limiter=None, journal=None):
+    """
+    Creates users together with their assignments through the Composite Graph API.
+
+    Each graph holds up to `graph_size` users; their PermissionSetAssignment and GroupMember
+    nodes reference the new User Id via `@{ref.id}`. A graph is committed or rolled back
+    as a whole, so a user is never left half-provisioned. A graph is closed early when the
+    next user's nodes would take it past MAX_GRAPH_NODES.
+    """
+    graphs = []
+    graph_users, nodes = [], []
+    for position, (user_data, user_payload, result_record) in enumerate(pending):
+        ref = f"user{position}"
+        user_nodes = [{'method': 'POST', 'url': f"/services/data/v{sf.sf_version}/sobjects/User",
+                       'referenceId': ref, 'body': user_payload}]
+        access = _access_requests(f"@{{{ref}.id}}", user_data, queue_ids)
+        for index, (sobject, fields, _) in enumerate(access):
+            if sobject is not None:
+                user_nodes.append({'method': 'POST', 'url': f"/services/data/v{sf.sf_version}/sobjects/{sobject}",
+                                   'referenceId': f"{ref}_access{index}", 'body': fields})
+        if len(user_nodes) > MAX_GRAPH_NODES:
+            result_record.update({'Status': 'Failed', 'Error': f"Too many assignments for one Composite Graph: "
+                                                               f"{len(user_nodes)} nodes, at most {MAX_GRAPH_NODES}."})
+            continue
+        if graph_users and (len(graph_users) == graph_size or len(nodes) + len(user_nodes) > MAX_GRAPH_NODES):
+            graphs.append(({'graphId': f"graph{len(graphs)}", 'compositeRequest': nodes}, graph_users))
+            graph_users, nodes = [], []
+        nodes.extend(user_nodes)
+        graph_users.append((ref, access, result_record))
+    if graph_users:
+        graphs.append(({'graphId': f"graph{len(graphs)}", 'compositeRequest': nodes}, graph_users))
+
+    # Pack graphs into as few requests as the Composite Graph limits allow
+    requests = []
+    for graph in graphs:
+        node_count = len(graph[0]['compositeRequest'])
+        if (not requests or len(requests[-1]) == MAX_GRAPHS_PER_REQUEST
+                or sum(len(g[0]['compositeRequest']) for g in requests[-1]) + node_count > MAX_GRAPH_NODES):
+            requests.append([])
+        requests[-1].append(graph)
+
+    for request_graphs in requests:
+        user_count = sum(len(graph_users) for _, graph_users in request_graphs)
+        print(f"--- Creating {user_count} users in {len(request_graphs)} Composite Graphs ---")
+        reset_retry_count()
+        try:
+            _wait_for_slot(limiter)
+            _journal_insert_started(journal, [result_record for _, graph_users in request_graphs
+                                              for _, _, result_record in graph_users])
+            response = sf.restful('composite/graph', method='POST', json={'graphs': [graph for graph, _ in request_graphs]})
+            graph_responses = {g['graphId']: g for g in (response or {}).get('graphs', [])}
+        except Exception as e:
+            print(f"Error submitting Composite Graph request: {e}")
+            for _, graph_users in request_graphs:
+                for _, _, result_record in graph_users:
+                    result_record['Retries'] += retry_count()
+                    _mark_insert_error(result_record, e, journal)
+            continue
+
+        for _, graph_users in request_graphs:
+            for _, _, result_record in graph_users:
+                result_record['Retries'] += retry_count()
+
+        for graph, graph_users in request_graphs:
+            _apply_graph_response(graph_responses.get(graph['graphId']), graph_users, journal)
+
+def _apply_graph_response(graph_response, graph_users, journal=None):
+    """Maps one graph's outcome back onto the result records of the users in it."""
+    if graph_response is None:
+        for _, _, result_record in graph_users:
+            _mark_failed(result_record, 'No result returned for this graph.', journal)
+        return
+
+    node_responses = {node.get('referenceId'): node for node in graph_response['graphResponse'].get('compositeResponse', [])}
+
+    if graph_response.get('isSuccessful'):
+        for ref, access, result_record in graph_users:
+            user_id = node_responses[ref]['body']['id']
+            print(f"Successfully created user {result_record['Username']} with ID: {user_id}")
+            _mark_created(result_record, user_id, journal)
+            if journal:
+                journal.record_many((result_record['Username'], ASSIGN_STEP_PREFIX + description,
+                                     SUCCEEDED if sobject else FAILED, user_id, '' if sobject else description)
+                                    for sobject, _, description in access)
+            # Unresolved queues never made it into the graph; report them like the other modes do
+            _record_assignment_errors(result_record, [description for sobject, _, description in access if sobject is None])
+        return
+
+    # Salesforce reports the real cause on the failing node and PROCESSING_HALTED on the rest
+    node_errors = {}
+    for ref, node in node_responses.items():
+        errors = node.get('body') if isinstance(node.get('body'), list) else []
+        real_errors = [err for err in errors if err.get('errorCode') != 'PROCESSING_HALTED']
+        note_error_codes(err.get('errorCode') for err in real_errors)
+        if node.get('httpStatusCode', 200) >= 400 and real_errors:
+            node_errors[ref] = '; '.join(f"{err.get('errorCode', 'ERROR')}: {err.get('message', '')}" for err in real_errors)
+    graph_error = next(iter(node_errors.values()), 'Unknown error')
+
+    for ref, access, result_record in graph_users:
+        own_errors = [err for node_ref, err in node_errors.items() if node_ref == ref or node_ref.startswith(f"{ref}_")]
+        if own_errors:
+            err_msg = f"User creation rolled back: {'; '.join(own_errors)}"
+        else:
+            err_msg = f"User creation rolled back because another user in the same graph failed: {graph_error}"
+        print(f"Error processing user {result_record['Username']}: {err_msg}")
+        _mark_failed(result_record, err_msg, journal)
+
+def _check_missing_references(user_data, missing_references):
+    """
+    Checks a user's references against those found missing in the org.
+    :return: A tuple (errors that rule out the User insert, user_data without its missing Permission
+             Set Groups, whose errors it carries under 'ReferenceErrors' for the assignment stage).
+    """
+    blocking_errors = []
+    for column in BLOCKING_REFERENCES:
+        blocking_errors += [f"{REFERENCE_LABELS[column]} '{value}' not found." for value in split_references(column, user_data.get(column))
+                            if value in missing_references.get(column, ())]
+
+    missing_psgs = missing_references.get('PermissionSetGroupIDs', ())
+    psg_ids = split_references('PermissionSetGroupIDs', user_data.get('PermissionSetGroupIDs'))
+    if any(psg_id in missing_psgs for psg_id in psg_ids):
+        user_data = dict(user_data,
+                         PermissionSetGroupIDs=';'.join(psg_id for psg_id in psg_ids if psg_id not in missing_psgs) or None,
+                         ReferenceErrors=[f"{REFERENCE_LABELS['PermissionSetGroupIDs']} '{psg_id}' not found."
+                                          for psg_id in psg_ids if psg_id in missing_psgs])
+    return blocking_errors, user_data
+
+def _access_requests(user_id, user_data, queue_ids):
+    """
+    Lists the junction records that grant a user its Permission Set Groups and Queues.
+    :return: A list of (sObject type, record fields, description) tuples. Queues that could not
+             be resolved, and PSGs found missing beforehand, have no sObject type and carry their
+             error message instead.
+    """
+    requests = []
+    if 'PermissionSetGroupIDs' in user_data and pd.notna(user_data['PermissionSetGroupIDs']):
+        for psg_id in str(user_data['PermissionSetGroupIDs']).split(';'):
+            psg_id = psg_id.strip()
+            if not psg_id: continue
+            requests.append(('PermissionSetAssignment', {'AssigneeId': user_id, 'PermissionSetGroupId': psg_id}, f"PSG {psg_id}"))
+    for err_msg in user_data.get('ReferenceErrors') or ():
+        requests.append((None, None, err_msg))
+
+    if 'Queues' in user_data and pd.notna(user_data['Queues']):
+        for q_name in [q.strip() for q in user_data['Queues'].split('\n') if q.strip()]:
+            if q_name in queue_ids:
+                requests.append(('GroupMember', {'GroupId': queue_ids[q_name], 'UserOrGroupId': user_id}, f"Queue {q_name}"))
+            else:
+                requests.append((None, None, f"Queue '{q_name}' not found."))
+    return requests
+
+def _assign_access(sf, user_id, user_data, queue_ids, limiter=None, log=print, journal=None, username=None, completed_steps=()):
+    """
+    Assigns the user's Permission Set Groups and Queues, one REST call per assignment.
+    :param journal: Optional CreationJournal; each outcome is recorded under `username`.
+    :param completed_steps: Journal steps that already succeeded and are skipped.
+    :return: A list of assignment error messages.
+    """
+    assignment_errors = []
+    for sobject, fields, description in _access_requests(user_id, user_data, queue_ids):
+        step = ASSIGN_STEP_PREFIX + description
+        if step in completed_steps:
+            continue
+        if sobject is None:
+            assignment_errors.append(description)
+            _journal_record(journal, username, step, FAILED, user_id, description)
+            continue
+        try:
+            _wait_for_slot(limiter)
+            getattr(sf, sobject).create(fields)
+            log(f"Assigned {description} to user {user_id}")
+            _journal_record(journal, username, step, SUCCEEDED, user_id)
+        except Exception as e:
+            if _is_duplicate_value(e):
+                # Already there, e.g. inserted by a run that died before journaling it
+                log(f"{description} was already assigned to user {user_id}")
+                _journal_record(journal, username, step, SUCCEEDED, user_id)
+                continue
+            err_msg = f"Failed to assign {description}: {e}"
+            log(err_msg)
+            assignment_errors.append(err_msg)
+            _journal_record(journal, username, step, FAILED, user_id, err_msg)
+    return assignment_errors
+
+def _is_duplicate_value(error):
+    """Whether a REST create failed only because the record exists already (DUPLICATE_VALUE)."""
+    content = getattr(error, 'content', None)
+    errors = content if isinstance(content, list) else [content]
+    codes = [err.get('errorCode') for err in errors if isinstance(err, dict)]
+    return bool(codes) and all(code == 'DUPLICATE_VALUE' for code in codes)
+
+def _assign_access_in_batches(sf, created, queue_ids, limiter=None, journal=None):
+    """
+    Post-creation assignment stage: gathers the junction records of every newly created
+    user and inserts them through sObject Collections, up to 200 records per request.
+    Each failed record is attributed back to its user's AssignmentErrors; an assignment the user
+    already has (DUPLICATE_VALUE) counts as done.
+
+    :param created: A list of (user_id, user_data, result_record) tuples.
+    """
+    errors_by_user = []
+    submissions = []
+    unresolved = []
+    for user_id, user_data, result_record in created:
+        user_errors = []
+        errors_by_user.append((result_record, user_errors))
+        for sobject, fields, description in _access_requests(user_id, user_data, queue_ids):
+            # Reserve the error slot now so messages keep the order of the persona mapping
+            user_errors.append(description if sobject is None else None)
+            if sobject is not None:
+                submissions.append((sobject, fields, description, user_errors, len(user_errors) - 1, result_record))
+            else:
+                unresolved.append((result_record['Username'], ASSIGN_STEP_PREFIX + description, FAILED, user_id, description))
+    if journal:
+        journal.record_many(unresolved)
+
+    # Group by sObject type so each request inserts a single kind of junction record
+    submissions.sort(key=lambda submission: submission[0])
+    if submissions:
+        print(f"--- Assigning access for {len(created)} users: {len(submissions)} assignments in batches of {MAX_COLLECTION_SIZE} ---")
+
+    failed_count = 0
+    for start in range(0, len(submissions), MAX_COLLECTION_SIZE):
+        batch = submissions[start:start + MAX_COLLECTION_SIZE]
+        records = [dict(fields, attributes={'type': sobject}) for sobject, fields, _, _, _, _ in batch]
+        reset_retry_count()
+        try:
+            responses, retries = _post_collection(sf, records, limiter)
+        except Exception as e:
+            print(f"Error submitting {len(batch)} assignments: {e}")
+            responses = [{'success': False, 'errors': [{'statusCode': 'REQUEST_FAILED', 'message': str(e)}]}] * len(batch)
+            retries = [retry_count()] * len(batch)
+
+        events = []
+        # A user with several assignments in the batch counts each resubmission round once
+        batch_retries = {}
+        for index, (_, _, description, user_errors, slot, result_record) in enumerate(batch):
+            response = responses[index] or {'success': False, 'errors': []}
+            previous_retries = batch_retries.get(id(result_record), (result_record, 0))[1]
+            batch_retries[id(result_record)] = (result_record, max(previous_retries, retries[index]))
+            step = ASSIGN_STEP_PREFIX + description
+            if not response.get('success', False) and not _already_assigned(response):
+                err_msg = f"Failed to assign {description}: {_format_errors(response.get('errors'))}"
+                print(err_msg)
+                user_errors[slot] = err_msg
+                failed_count += 1
+                events.append((result_record['Username'], step, FAILED, result_record['SalesforceId'], err_msg))
+            else:
+                events.append((result_record['Username'], step, SUCCEEDED, result_record['SalesforceId'], ''))
+        if journal:
+            journal.record_many(events)
+        for result_record, record_retries in batch_retries.values():
+            result_record['Retries'] += record_retries
+
+    if submissions:
+        print(f"Assignment stage finished: {len(submissions) - failed_count} succeeded, {failed_count} failed.")
+
+    for result_record, user_errors in errors_by_user:
+        _record_assignment_errors(result_record, [err for err in user_errors if err])
+
+def _already_assigned(response):
+    """Whether an assignment failed only because it exists already, as when an upsert updates a user."""
+    errors = response.get('errors') or []
+    return bool(errors) and all(err.get('statusCode') == 'DUPLICATE_VALUE' for err in errors)
+
+def _post_collection(sf, records, limiter=None, upsert_field=None):
+    """
+    Inserts records through one sObject Collections request, or upserts them by `upsert_field`
+    (all records must then be Users). Records rejected with a transient error code (such as
+    UNABLE_TO_LOCK_ROW) are resubmitted with backoff, following the retry policy of the
+    connection's HTTP session.
+
+    :return: A tuple (responses, retries): one save result per record (None if Salesforce
+             returned none), and how many times each record was retried.
+    """
+    policy = getattr(sf.session, 'retry_policy', None)
+    if not isinstance(policy, RetryPolicy):
+        policy = None
+
+    responses = [None] * len(records)
+    retries = [0] * len(records)
+    todo = list(range(len(records)))
+    attempt = 1
+    while True:
+        _wait_for_slot(limiter)
+        retries_before = retry_count()
+        batch_responses = sf.restful(f'composite/sobjects/User/{upsert_field}' if upsert_field else 'composite/sobjects',
+                                     method='PATCH' if upsert_field else 'POST',
+                                     json={'allOrNone': False, 'records': [records[i] for i in todo]}) or []
+        for i in todo:
+            retries[i] += retry_count() - retries_before
+
+        retry_later, rule = [], None
+        for i, response in zip(todo, batch_responses):
+            responses[i] = response
+            if response.get('success', False):
+                continue
+            error_codes = [err.get('statusCode') for err in response.get('errors') or []]
+            note_error_codes(error_codes)
+            if policy is None:
+                continue
+            record_rule = policy.rule_for_error_codes(error_codes)
+            if record_rule and attempt < record_rule.max_attempts:
+                retry_later.append(i)
+                rule = max(rule or record_rule, record_rule, key=lambda r: r.base_delay)
+        if not retry_later:
+            return responses, retries
+
+        print(f"Resubmitting {len(retry_later)} records rejected with transient errors (retry {attempt})...")
+        for i in retry_later:
+            retries[i] += 1
+        policy.wait(rule, attempt)
+        attempt += 1
+        todo = retry_later
+
+def _journal_insert_started(journal, result_records):
+    if journal:
+        journal.record_many((r['Username'], INSERT_STEP, STARTED, None, '') for r in result_records)
+
+def _journal_record(journal, username, step, status, salesforce_id=None, detail=''):
+    if journal:
+        journal.record(username, step, status, salesforce_id, detail)
+
+def _mark_created(result_record, user_id, journal=None):
+    result_record.update({'Status': 'Success', 'SalesforceId': user_id})
+    _journal_record(journal, result_record['Username'], INSERT_STEP, SUCCEEDED, user_id)
+
+def _mark_failed(result_record, error, journal=None):
+    result_record.update({'Status': 'Failed', 'Error': error})
+    _journal_record(journal, result_record['Username'], INSERT_STEP, FAILED, None, error)
+
+def _mark_insert_error(result_record, error, journal=None):
+    """
+    Fails a user whose insert request raised `error`. After a network error that may have come once
+    the org applied the insert (a read timeout, a reset connection) the journal keeps the insert
+    'started', so --resume looks the user up instead of inserting it again.
+    """
+    if isinstance(error, requests.RequestException) and not request_not_sent(error):
+        result_record.update({'Status': 'Failed', 'Error': str(error)})
+    else:
+        _mark_failed(result_record, str(error), journal)
+
+def _wait_for_slot(limiter):
+    if limiter:
+        limiter.acquire()
+
+def _record_assignment_errors(result_record, assignment_errors):
+    if assignment_errors:
+        result_record['Status'] = 'Success with errors'
+        result_record['AssignmentErrors'] = "\n".join(assignment_errors)
+
+def _format_errors(errors):
+    """Formats the `errors` list of a Salesforce save result as a single string."""
+    if not errors:
+        return 'Unknown error'
+    return '; '.join(f"{err.get('statusCode', 'ERROR')}: {err.get('message', '')}" for err in errors)
@@ -0,0 +1,118 @@
+import sqlite3
+from datetime import datetime, timezone
+
+USER_FIELDS = ('Id', 'Email', 'Username', 'Name', 'FederationIdentifier', 'Alias', 'IsActive')
+
+class UserIndex:
+    """
+    A local SQLite copy of the org's Users, used to answer duplicate checks offline.
+
+    Salesforce never deletes User records (they are only deactivated), so pulling every
+    User modified since the last sync is enough to keep the index complete.
+    """
+    def __init__(self, path):
+        self.path = path
+        self._conn = sqlite3.connect(path)
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS users (
+                Id TEXT PRIMARY KEY,
+                Email TEXT,
+                Username TEXT,
+                Name TEXT,
+                FederationIdentifier TEXT,
+                Alias TEXT,
+                IsActive INTEGER,
+                SystemModstamp TEXT,
+                email_lower TEXT,
+                username_lower TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_users_email ON users (email_lower);
+            CREATE INDEX IF NOT EXISTS idx_users_username ON users (username_lower);
+            CREATE TABLE IF NOT EXISTS sync_state (key TEXT PRIMARY KEY, value TEXT);
+            """
+        )
+        self._conn.commit()
+
+    @property
+    def last_sync(self):
+        """The SystemModstamp of the most recently modified User seen, or None before the first sync."""
+        row = self._conn.execute("SELECT value FROM sync_state WHERE key = 'last_sync'").fetchone()
+        return row[0] if row else None
+
+    def user_count(self):
+        return self._conn.execute("SELECT COUNT(*) FROM users").fetchone()[0]
+
+    def sync(self, sf, full=False):
+        """
+        Pulls Users changed since the last sync (or all Users on the first run or when `full` is set).
+        :return: The number of User records fetched.
+        """
+        query = f"SELECT {', '.join(USER_FIELDS)}, SystemModstamp FROM User"
+        since = None if full else self.last_sync
+        if since:
+            # SOQL datetime literals take whole seconds; >= re-reads a few rows, which the upsert absorbs
+            query += f" WHERE SystemModstamp >= {_soql_datetime(since)}"
+        query += " ORDER BY SystemModstamp"
+
+        print(f"Syncing org users into {self.path} ({'full' if not since else f'changes since {since}'})...")
+        records = sf.query_all(query)['records']
+
+        rows = [
+            (r['Id'], r.get('Email'), r.get('Username'), r.get('Name'), r.get('FederationIdentifier'), r.get('Alias'),
+             int(bool(r.get('IsActive'))), r.get('SystemModstamp'),
+             (r.get('Email') or '').lower() or None, (r.get('Username') or '').lower() or None)
+            for r in records
+        ]
+        with self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO users (Id, Email, Username, Name, FederationIdentifier, Alias, IsActive, "
+                "SystemModstamp, email_lower, username_lower) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+            newest = max((r['SystemModstamp'] for r in records if r.get('SystemModstamp')), default=None, key=_parse_datetime)
+            if newest and (since is None or _parse_datetime(newest) > _parse_datetime(since)):
+                self._conn.execute("INSERT OR REPLACE INTO sync_state (key, value) VALUES ('last_sync', ?)", (newest,))
+
+        print(f"Fetched {len(records)} changed users; the index now holds {self.user_count()} users.")
+        return len(records)
+
+    def find_matches(self, values):
+        """
+        Finds indexed Users whose Email or Username equals any of the values, ignoring case.
+        :return: A list of User records (dicts with the USER_FIELDS keys).
+        """
+        keys = {str(v).lower() for v in values if v is not None}
+        if not keys:
+            return []
+        with self._conn:
+            self._conn.execute("CREATE TEMP TABLE IF NOT EXISTS lookup_keys (key TEXT PRIMARY KEY)")
+            self._conn.execute("DELETE FROM lookup_keys")
+            self._conn.executemany("INSERT INTO lookup_keys (key) VALUES (?)", [(k,) for k in keys])
+        rows = self._conn.execute(
+            f"""
+            SELECT {', '.join(USER_FIELDS)} FROM users
+            WHERE email_lower IN (SELECT key FROM lookup_keys) OR username_lower IN (SELECT key FROM lookup_keys)
+            """
+        ).fetchall()
+        return [_to_record(row) for row in rows]
+
+    def all_users(self):
+        """Returns every indexed User record."""
+        rows = self._conn.execute(f"SELECT {', '.join(USER_FIELDS)} FROM users").fetchall()
+        return [_to_record(row) for row in rows]
+
+    def close(self):
+        self._conn.close()
+
+def _to_record(row):
+    record = dict(zip(USER_FIELDS, row))
+    record['IsActive'] = bool(record['IsActive'])
+    return record
+
+def _parse_datetime(value):
+    """Parses a Salesforce datetime such as 2024-05-01T12:30:00.000+0000."""
+    return datetime.strptime(value, '%Y-%m-%dT%H:%M:%S.%f%z')
+
+def _soql_datetime(value):
+    return _parse_datetime(value).astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
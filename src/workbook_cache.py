@@ -0,0 +1,127 @@
+import hashlib
+import os
+import tempfile
+import pandas as pd
+
+try:
+    import pyarrow  # noqa: F401 -- only needed for Parquet entries
+    PARQUET_AVAILABLE = True
+except ImportError:
+    PARQUET_AVAILABLE = False
+
+DEFAULT_CACHE_DIR = '.workbook_cache'
+DEFAULT_MAX_CACHE_MB = 512
+
+# Bump when the way sheets are parsed changes, so old entries are no longer read.
+CACHE_FORMAT_VERSION = 1
+
+_HASH_CHUNK_BYTES = 1024 * 1024
+
+class WorkbookCache:
+    """
+    An on-disk cache of parsed workbook sheets, keyed by the workbook's content hash and the sheet name.
+
+    Each sheet is stored as Parquet when pyarrow is installed, and as a pandas pickle otherwise.
+    Entries are evicted least recently used first once the cache grows past its size limit.
+    """
+    def __init__(self, directory=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_CACHE_MB * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def read_sheets(self, path, sheet_names, reader=None, variant=''):
+        """
+        Returns the named sheets of a workbook, parsing only the sheets that are not cached yet.
+
+        :param path: Path to the Excel workbook.
+        :param sheet_names: The sheets to return.
+        :param reader: Optional function (path, sheet_names) -> {sheet name: DataFrame} used on a cache miss.
+                       Defaults to pd.read_excel.
+        :param variant: A description of how the reader parses sheets (e.g. which columns it keeps).
+                        Frames parsed differently are cached separately.
+        :return: A dict of sheet name -> DataFrame.
+        """
+        reader = reader or (lambda workbook, names: pd.read_excel(workbook, sheet_name=names))
+        digest = file_digest(path)
+
+        sheets, missing = {}, []
+        for sheet_name in sheet_names:
+            cached = self._load(digest, sheet_name, variant)
+            if cached is None:
+                missing.append(sheet_name)
+            else:
+                sheets[sheet_name] = cached
+
+        if missing:
+            print(f"Parsing {', '.join(missing)} from {path}...")
+            parsed = reader(path, missing)
+            for sheet_name in missing:
+                self._store(digest, sheet_name, variant, parsed[sheet_name])
+                sheets[sheet_name] = parsed[sheet_name]
+            self._evict()
+        else:
+            print(f"Loaded {', '.join(sheet_names)} from the workbook cache.")
+
+        return {sheet_name: sheets[sheet_name] for sheet_name in sheet_names}
+
+    def _entry_path(self, digest, sheet_name, variant, extension):
+        sheet_key = hashlib.sha256(f"{sheet_name}\0{variant}".encode('utf-8')).hexdigest()[:16]
+        return os.path.join(self.directory, f"v{CACHE_FORMAT_VERSION}-{digest}-{sheet_key}.{extension}")
+
+    def _load(self, digest, sheet_name, variant):
+        for extension, load in (('parquet', pd.read_parquet), ('pkl', pd.read_pickle)):
+            entry = self._entry_path(digest, sheet_name, variant, extension)
+            if not os.path.isfile(entry) or (extension == 'parquet' and not PARQUET_AVAILABLE):
+                continue
+            try:
+                df = load(entry)
+            except Exception as e:
+                print(f"Warning: Ignoring unreadable cache entry {entry}: {e}")
+                continue
+            # Touch the entry so eviction sees it as recently used
+            os.utime(entry)
+            return df
+        return None
+
+    def _store(self, digest, sheet_name, variant, df):
+        # Write to a temporary file first so an interrupted run never leaves a truncated entry
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        os.close(fd)
+        try:
+            extension = 'pkl'
+            if PARQUET_AVAILABLE:
+                try:
+                    df.to_parquet(tmp_path)
+                    extension = 'parquet'
+                except Exception:
+                    # Columns that mix types can't be written as Parquet; keep them as a pickle
+                    pass
+            if extension == 'pkl':
+                df.to_pickle(tmp_path)
+            os.replace(tmp_path, self._entry_path(digest, sheet_name, variant, extension))
+        except OSError as e:
+            print(f"Warning: Could not cache sheet '{sheet_name}': {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def _evict(self):
+        """Deletes the least recently used entries until the cache fits within max_bytes."""
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith(('.parquet', '.pkl')):
+                stat = os.stat(os.path.join(self.directory, name))
+                entries.append((stat.st_mtime, stat.st_size, name))
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            os.remove(os.path.join(self.directory, name))
+            total -= size
+
+def file_digest(path):
+    """Returns the SHA-256 hex digest of a file's contents."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(_HASH_CHUNK_BYTES), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
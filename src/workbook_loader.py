@@ -0,0 +1,108 @@
+import importlib.util
+import pandas as pd
+from pandas.io.parsers import TextParser
+
+TEMPLATE_SHEET = 'Training Template'
+PERSONA_SHEET = 'Persona Mapping'
+SSO_SHEET = 'TSSO_TrainTheTrainer'
+
+# Columns of the Training Template read by run_duplicate_check, process_dataframes,
+# fuzzy matching and validation, on top of the ones named in mapping.properties.
+TEMPLATE_COLUMNS = (
+    'Email (employee ID version)', 'Email (name version)', 'FirstName', 'LastName',
+    'Persona Name', 'Username', 'added by'
+)
+SSO_COLUMNS = ('Email (employee ID version)',)
+
+# 'openpyxl-stream' reads cells straight from openpyxl's read-only mode, converting only the kept
+# columns; 'openpyxl' and 'calamine' go through pd.read_excel. 'auto' picks calamine when installed.
+ENGINES = ('auto', 'openpyxl-stream', 'openpyxl', 'calamine')
+
+# Columns with few distinct values, stored as categoricals to save memory. The persona ID columns
+# stay plain objects: after the merge in process_dataframes they are combined with Training
+# Template values (e.g. for users whose persona has no match), which a categorical can't take.
+CATEGORICAL_COLUMNS = {'Persona Name'}
+
+def persona_columns(environment):
+    """Returns the Persona Mapping columns process_dataframes uses for an environment."""
+    return (
+        'Persona Name', 'Queues', f'Profile ID ({environment})', f'Role ID ({environment})',
+        f'Permission Set Group IDs ({environment})', f'Contact Center {environment}'
+    )
+
+def workbook_columns(mapping=None, environment='Training'):
+    """
+    Returns the columns to read from each sheet.
+
+    :param mapping: The loaded mapping.properties. Without it, the Training Template is read in full,
+                    since any of its columns might be mapped to a User field.
+    :param environment: The target environment, which decides the Persona Mapping columns.
+    :return: A dict of sheet name -> tuple of column names, or None to read every column.
+    """
+    return {
+        TEMPLATE_SHEET: tuple(dict.fromkeys(TEMPLATE_COLUMNS + tuple(mapping))) if mapping else None,
+        PERSONA_SHEET: persona_columns(environment),
+        SSO_SHEET: SSO_COLUMNS
+    }
+
+def resolve_engine(engine='auto'):
+    """Maps 'auto' to the fastest engine that is installed."""
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown workbook engine '{engine}'. Choose from: {', '.join(ENGINES)}.")
+    if engine == 'auto':
+        return 'calamine' if importlib.util.find_spec('python_calamine') else 'openpyxl-stream'
+    if engine == 'calamine' and not importlib.util.find_spec('python_calamine'):
+        raise ValueError("The 'calamine' engine needs the python-calamine package.")
+    return engine
+
+def load_workbook(path, sheet_names, columns=None, engine='auto'):
+    """
+    Reads sheets from an Excel workbook, keeping only the wanted columns.
+
+    :param path: Path to the .xlsx workbook.
+    :param sheet_names: The sheets to read.
+    :param columns: Optional dict of sheet name -> column names to keep (see workbook_columns).
+                    Sheets that are missing from it, or map to None, are read in full.
+    :param engine: One of ENGINES.
+    :return: A dict of sheet name -> DataFrame.
+    """
+    engine = resolve_engine(engine)
+    columns = columns or {}
+
+    if engine == 'openpyxl-stream':
+        sheets = _read_streaming(path, sheet_names, columns)
+    else:
+        sheets = {}
+        for sheet_name in sheet_names:
+            wanted = columns.get(sheet_name)
+            usecols = (lambda column, wanted=frozenset(wanted): column in wanted) if wanted is not None else None
+            sheets[sheet_name] = pd.read_excel(path, sheet_name=sheet_name, usecols=usecols, engine=engine)
+
+    for df in sheets.values():
+        for column in CATEGORICAL_COLUMNS.intersection(df.columns):
+            df[column] = df[column].astype('category')
+    return sheets
+
+def _read_streaming(path, sheet_names, columns):
+    from openpyxl import load_workbook as open_workbook
+
+    workbook = open_workbook(path, read_only=True, data_only=True, keep_links=False)
+    try:
+        sheets = {}
+        for sheet_name in sheet_names:
+            if sheet_name not in workbook.sheetnames:
+                raise ValueError(f"Worksheet named '{sheet_name}' not found")
+            rows = workbook[sheet_name].iter_rows(values_only=True)
+            header = next(rows, ())
+            wanted = columns.get(sheet_name)
+            keep = [i for i, name in enumerate(header) if name is not None and (wanted is None or name in wanted)]
+            data = [[header[i] for i in keep]]
+            for row in rows:
+                values = [row[i] if i < len(row) else None for i in keep]
+                if any(value is not None for value in values):
+                    data.append(values)
+            # TextParser is what pd.read_excel uses to infer dtypes, so the frames match
+            sheets[sheet_name] = TextParser(data, header=0).read() if keep else pd.DataFrame()
+        return sheets
+    finally:
+        workbook.close()
@@ -0,0 +1,87 @@
+import unittest
+from unittest.mock import MagicMock, patch
+import configparser
+import requests
+from src.api_limits import parse_limit_info, ApiUsage, UsageThrottle, throttle_from_config
+from src.http_transport import SalesforceSession
+
+def response_with_usage(header):
+    response = requests.Response()
+    response.status_code = 200
+    if header:
+        response.headers['Sforce-Limit-Info'] = header
+    return response
+
+class TestApiUsage(unittest.TestCase):
+
+    def test_parse_limit_info(self):
+        self.assertEqual(parse_limit_info('api-usage=25/15000'), (25, 15000))
+        self.assertEqual(parse_limit_info('api-usage=25/15000; per-app-api-usage=17/250(appName=sample)'), (25, 15000))
+        self.assertIsNone(parse_limit_info(None))
+
+    def test_usage_is_tracked_across_responses(self):
+        """Test that calls are counted and the usage reflects the latest header."""
+        usage = ApiUsage()
+        usage.record_response(response_with_usage('api-usage=100/1000'))
+        usage.record_response(response_with_usage(None))
+        usage.record_response(response_with_usage('api-usage=110/1000'))
+
+        self.assertEqual(usage.calls_made, 3)
+        self.assertEqual((usage.used, usage.limit), (110, 1000))
+        self.assertAlmostEqual(usage.fraction_used, 0.11)
+        self.assertIn('API calls made by this command: 3.', usage.summary())
+        self.assertIn('up 11 during this command', usage.summary())
+
+    def test_worker_usage_is_added(self):
+        """Test that calls made by worker processes count towards the command's total."""
+        usage = ApiUsage()
+        usage.record_response(response_with_usage('api-usage=100/1000'))
+        usage.add_worker_usage(40, 141, 1000)
+        usage.add_worker_usage(30, 120, 1000)
+
+        self.assertEqual(usage.calls_made, 71)
+        self.assertEqual(usage.used, 141)
+        self.assertIn('API calls made by this command: 71 (70 of them by worker processes).', usage.summary())
+
+class TestUsageThrottle(unittest.TestCase):
+
+    def usage_at(self, used):
+        usage = ApiUsage()
+        usage.record_response(response_with_usage(f'api-usage={used}/1000'))
+        return usage
+
+    def test_throttle_slows_then_pauses(self):
+        """Test that requests are delayed more as usage crosses each threshold."""
+        sleep = MagicMock()
+        throttle = UsageThrottle(slow_at=0.8, pause_at=0.95, slow_delay=0.5, pause_seconds=60, sleep=sleep)
+
+        throttle.before_request(self.usage_at(500))
+        sleep.assert_not_called()
+        throttle.before_request(self.usage_at(850))
+        sleep.assert_called_with(0.5)
+        throttle.before_request(self.usage_at(960))
+        sleep.assert_called_with(60)
+
+    def test_session_consults_throttle_before_each_request(self):
+        """Test that the shared HTTP session passes its usage to the throttle and records each response."""
+        throttle = MagicMock()
+        session = SalesforceSession(throttle=throttle)
+        with patch.object(requests.adapters.HTTPAdapter, 'send', return_value=response_with_usage('api-usage=5/1000')):
+            session.request('GET', 'https://test.my.salesforce.com/services/data/v59.0/limits')
+            session.request('GET', 'https://test.my.salesforce.com/services/data/v59.0/limits')
+
+        self.assertEqual(throttle.before_request.call_count, 2)
+        throttle.before_request.assert_called_with(session.usage)
+        self.assertEqual(session.usage.calls_made, 2)
+
+    def test_throttle_from_config(self):
+        config = configparser.ConfigParser()
+        config['api_limits'] = {'slow_at': '0.5', 'pause_at': '0.9'}
+        throttle = throttle_from_config(config)
+        self.assertEqual((throttle.slow_at, throttle.pause_at), (0.5, 0.9))
+
+        config['api_limits']['throttle'] = 'off'
+        self.assertIsNone(throttle_from_config(config))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,39 @@
+import unittest
+from src.benchmark import measure, compare_to_baseline, run_benchmarks, results_document, StageResult
+from src.fake_salesforce import CRYPTOGRAPHY_AVAILABLE
+
+class TestBenchmark(unittest.TestCase):
+
+    def test_measure_records_time_and_peak_memory(self):
+        result, stage = measure(lambda size: len(bytearray(size)), 5 * 1024 * 1024)
+        self.assertEqual(result, 5 * 1024 * 1024)
+        self.assertGreaterEqual(stage.peak_mb, 5)
+        self.assertGreater(stage.seconds, 0)
+
+    def test_regressions_past_the_threshold_are_reported(self):
+        baseline = results_document({'load': StageResult(1.0, 100.0), 'create_users': StageResult(2.0, 10.0)}, 1000, 0, 'csv', 'collections')
+        results = {'load': StageResult(1.2, 140.0), 'create_users': StageResult(3.0, 10.5)}
+
+        regressions = compare_to_baseline(results, baseline, threshold=0.25)
+        self.assertEqual(len(regressions), 2)
+        self.assertTrue(regressions[0].startswith('load: peak'))
+        self.assertTrue(regressions[1].startswith('create_users: 3.00s'))
+
+    def test_changes_below_the_noise_floor_are_ignored(self):
+        baseline = results_document({'load': StageResult(0.01, 0.1)}, 10, 0, 'csv', 'collections')
+        self.assertEqual(compare_to_baseline({'load': StageResult(0.03, 0.5)}, baseline), [])
+        self.assertEqual(compare_to_baseline({}, baseline), [])
+
+    def test_local_stages(self):
+        results = run_benchmarks(100, stages=('load', 'process_dataframes', 'build_payloads'))
+        self.assertEqual(list(results), ['load', 'process_dataframes', 'build_payloads'])
+        with self.assertRaises(ValueError):
+            run_benchmarks(100, stages=('compile',))
+
+    @unittest.skipUnless(CRYPTOGRAPHY_AVAILABLE, "needs the cryptography package for the fake org's certificate")
+    def test_stages_against_the_fake_org(self):
+        results = run_benchmarks(50, stages=('duplicate_check', 'create_users'))
+        self.assertEqual(list(results), ['duplicate_check', 'create_users'])
+
+if __name__ == '__main__':
+    unittest.main()
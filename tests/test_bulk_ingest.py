@@ -0,0 +1,150 @@
+import unittest
+from unittest.mock import MagicMock
+import csv
+import io
+import json
+import pandas as pd
+from src.bulk_ingest import BulkIngestClient, BulkIngestError, parse_bulk_error
+from src.user_creator import create_salesforce_users
+
+JOBS_URL = 'https://fake.my.salesforce.com/services/data/v59.0/jobs/'
+
+class FakeResponse:
+    def __init__(self, status_code=200, payload=None, text=''):
+        self.status_code = status_code
+        self._payload = payload
+        self.text = text if payload is None else json.dumps(payload)
+
+    def json(self):
+        return self._payload
+
+class FakeBulkSession:
+    """
+    A local fake of the Bulk API 2.0 ingest endpoints.
+    Rows whose Username contains 'bad' fail; everything else succeeds.
+    """
+    def __init__(self, polls_before_complete=1):
+        self.jobs = {}
+        self.calls = []
+        self.polls_before_complete = polls_before_complete
+
+    def request(self, method, url, headers=None, json=None, data=None):
+        self.calls.append((method, url))
+        path = url[len(JOBS_URL + 'ingest'):].strip('/')
+        parts = path.split('/') if path else []
+
+        if method == 'POST' and not parts:
+            job_id = f"750{len(self.jobs):012d}"
+            self.jobs[job_id] = {'id': job_id, 'state': 'Open', 'spec': json, 'rows': [], 'polls': 0}
+            return FakeResponse(payload={'id': job_id, 'state': 'Open'})
+
+        job = self.jobs[parts[0]]
+        if method == 'PUT' and parts[1:] == ['batches']:
+            job['rows'] = list(csv.DictReader(io.StringIO(data.decode('utf-8'))))
+            return FakeResponse(status_code=201)
+        if method == 'PATCH':
+            job['state'] = 'UploadComplete'
+            return FakeResponse(payload={'id': job['id'], 'state': 'UploadComplete'})
+        if method == 'GET' and len(parts) == 1:
+            job['polls'] += 1
+            if job['polls'] > self.polls_before_complete:
+                job['state'] = 'JobComplete'
+            else:
+                job['state'] = 'InProgress'
+            return FakeResponse(payload={'id': job['id'], 'state': job['state'], 'numberRecordsProcessed': len(job['rows'])})
+        if method == 'GET' and parts[1] == 'successfulResults':
+            rows = [dict({'sf__Id': f"005{i:012d}", 'sf__Created': 'true'}, **row)
+                    for i, row in enumerate(job['rows']) if 'bad' not in row['Username']]
+            return FakeResponse(text=self._to_csv(rows))
+        if method == 'GET' and parts[1] == 'failedResults':
+            rows = [dict({'sf__Id': '', 'sf__Error': 'INVALID_EMAIL_ADDRESS:Email: invalid email address:Email --'}, **row)
+                    for row in job['rows'] if 'bad' in row['Username']]
+            return FakeResponse(text=self._to_csv(rows))
+        if method == 'GET' and parts[1] == 'unprocessedrecords':
+            return FakeResponse(text='')
+        return FakeResponse(status_code=404, text='Not found')
+
+    @staticmethod
+    def _to_csv(rows):
+        if not rows:
+            return ''
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=list(rows[0]), lineterminator='\n')
+        writer.writeheader()
+        writer.writerows(rows)
+        return buffer.getvalue()
+
+class TestBulkIngestClient(unittest.TestCase):
+
+    def test_ingest_runs_full_job_lifecycle(self):
+        """Test that a job is created, uploaded, closed, polled and its results parsed."""
+        session = FakeBulkSession()
+        client = BulkIngestClient(session, JOBS_URL, 'session-id', poll_interval=0)
+
+        successful, failed = client.ingest('User', [
+            {'Username': 'good@test.com', 'IsActive': True, 'UserRoleId': None},
+            {'Username': 'bad@test.com', 'IsActive': False, 'UserRoleId': 'role1'}
+        ])
+
+        self.assertEqual(len(session.jobs), 1)
+        job = next(iter(session.jobs.values()))
+        self.assertEqual(job['spec']['operation'], 'insert')
+        self.assertEqual(job['rows'][0], {'Username': 'good@test.com', 'IsActive': 'true', 'UserRoleId': ''})
+        self.assertEqual([row['Username'] for row in successful], ['good@test.com'])
+        self.assertEqual([row['Username'] for row in failed], ['bad@test.com'])
+
+    def test_ingest_splits_jobs_by_size(self):
+        """Test that payloads larger than max_job_bytes are spread across several jobs."""
+        session = FakeBulkSession(polls_before_complete=0)
+        client = BulkIngestClient(session, JOBS_URL, 'session-id', poll_interval=0)
+
+        records = [{'Username': f"user{i}@test.com"} for i in range(10)]
+        successful, failed = client.ingest('User', records, max_job_bytes=60)
+
+        self.assertGreater(len(session.jobs), 1)
+        self.assertEqual(len(successful), 10)
+        self.assertEqual(failed, [])
+
+    def test_http_error_raises(self):
+        """Test that a non-2xx response raises BulkIngestError."""
+        session = MagicMock()
+        session.request.return_value = FakeResponse(status_code=400, text='[{"errorCode":"INVALIDJOB"}]')
+        client = BulkIngestClient(session, JOBS_URL, 'session-id', poll_interval=0)
+
+        with self.assertRaises(BulkIngestError):
+            client.ingest('User', [{'Username': 'user@test.com'}])
+
+    def test_parse_bulk_error(self):
+        """Test that the Bulk API error format is reduced to code and message."""
+        self.assertEqual(parse_bulk_error('DUPLICATE_USERNAME:Duplicate Username.:Username --'), 'DUPLICATE_USERNAME: Duplicate Username.')
+        self.assertEqual(parse_bulk_error(''), 'Unknown error')
+
+class TestBulkMode(unittest.TestCase):
+
+    def test_bulk_results_are_matched_to_users(self):
+        """Test that bulk mode writes each user's outcome onto its own result row."""
+        mock_sf = MagicMock()
+        mock_sf.session = FakeBulkSession(polls_before_complete=0)
+        mock_sf.bulk2_url = JOBS_URL
+        mock_sf.session_id = 'session-id'
+        mock_sf.query_all.return_value = {'records': []}
+        mock_sf.restful.return_value = [{'id': '0Pa_1', 'success': True, 'errors': []}]
+
+        processed_data = pd.DataFrame({
+            'Username': ['bad@test.com', 'good@test.com'],
+            'ProfileID': ['prof1', 'prof1'],
+            'PermissionSetGroupIDs': [None, 'psg1'],
+            'Queues': [None, None]
+        })
+
+        results_df = create_salesforce_users(mock_sf, processed_data, {'Username': 'Username'}, dry_run=False, mode='bulk')
+
+        self.assertEqual(list(results_df['Status']), ['Failed', 'Success'])
+        self.assertEqual(results_df.iloc[0]['Error'], 'User creation failed: INVALID_EMAIL_ADDRESS: Email: invalid email address')
+        self.assertTrue(results_df.iloc[1]['SalesforceId'].startswith('005'))
+        mock_sf.User.create.assert_not_called()
+        assignment_records = mock_sf.restful.call_args[1]['json']['records']
+        self.assertEqual(assignment_records[0]['PermissionSetGroupId'], 'psg1')
+
+if __name__ == '__main__':
+    unittest.main()
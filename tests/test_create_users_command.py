@@ -25,7 +25,7 @@ class TestCreateUsersCommand(unittest.TestCase):
         pd.DataFrame(preflight_data).to_csv(self.preflight_csv_path, index=False)
 
         self.mock_config = MagicMock()
-        self.mock_config.__getitem__.return_value = {'environment': 'Training', 'mapping_file': self.mapping_path}
+        self.mock_config.__getitem__.return_value = {'environment': 'Training', 'mapping_file': self.mapping_path, 'workbook_cache': os.path.join(self.test_dir.name, 'cache')}
 
         self.connect_patcher = patch('main.connect_to_salesforce', return_value=self.mock_sf)
         self.connect_patcher.start()
@@ -47,6 +47,17 @@ class TestCreateUsersCommand(unittest.TestCase):
         mock_args.excel_source = self.source_excel_path
         mock_args.output = self.output_csv_path
         mock_args.dry_run = False
+        mock_args.mode = 'rest'
+        mock_args.batch_size = 200
+        mock_args.concurrency = 1
+        mock_args.requests_per_second = None
+        mock_args.graph_size = 1
+        mock_args.journal = None
+        mock_args.resume = False
+        mock_args.stream = False
+        mock_args.shards = 1
+        mock_args.schedule = False
+        mock_args.skip_reference_check = True
 
         handle_create_users(mock_args, self.mock_config)
 
@@ -62,5 +73,35 @@ class TestCreateUsersCommand(unittest.TestCase):
         self.assertEqual(results_df.iloc[0]['Status'], 'Success')
         self.assertEqual(results_df.iloc[0]['SalesforceId'], '005_new_user')
 
+    def test_create_users_command_streaming(self):
+        """Test that --stream reads the report in chunks and writes the same results."""
+        preflight_df = pd.read_csv(self.preflight_csv_path)
+        pd.concat([preflight_df, preflight_df.assign(Username='Brunt-Kelli@norc.org@test.com')]).to_csv(self.preflight_csv_path, index=False)
+        mock_args = MagicMock(input=self.preflight_csv_path, excel_source=self.source_excel_path, output=self.output_csv_path,
+                              dry_run=False, mode='collections', batch_size=200, requests_per_second=None, graph_size=1,
+                              concurrency=1, journal=None, resume=False, stream=True, chunk_size=1, shards=1, schedule=False,
+                              skip_reference_check=True)
+        self.mock_sf.restful.side_effect = lambda path, method, json: [{'id': '005_new_user', 'success': True, 'errors': []}] * len(json['records'])
+
+        handle_create_users(mock_args, self.mock_config)
+
+        results_df = pd.read_csv(self.output_csv_path)
+        self.assertEqual(list(results_df['Username']), ['Cooper-Tina@norc.org@test.com', 'Brunt-Kelli@norc.org@test.com'])
+        self.assertEqual(list(results_df['Status']), ['Success', 'Success'])
+
+    def test_users_with_missing_references_are_not_sent(self):
+        """Test that the reference check fails users whose Profile doesn't exist before any insert."""
+        mock_args = MagicMock(input=self.preflight_csv_path, excel_source=self.source_excel_path, output=self.output_csv_path,
+                              dry_run=False, mode='rest', batch_size=200, requests_per_second=None, graph_size=1,
+                              concurrency=1, journal=None, resume=False, stream=False, shards=1, schedule=False,
+                              skip_reference_check=False)
+
+        handle_create_users(mock_args, self.mock_config)
+
+        self.mock_sf.User.create.assert_not_called()
+        results_df = pd.read_csv(self.output_csv_path)
+        self.assertEqual(results_df.iloc[0]['Status'], 'Failed')
+        self.assertIn("Profile 'prof2' not found.", results_df.iloc[0]['Error'])
+
 if __name__ == '__main__':
     unittest.main()
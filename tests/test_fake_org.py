@@ -0,0 +1,69 @@
+import unittest
+from src.fake_org import FakeOrg, SalesforceRecordError, SoqlError
+
+class TestFakeOrg(unittest.TestCase):
+
+    def setUp(self):
+        self.org = FakeOrg()
+        self.profile_id = self.org.insert('Profile', {'Name': 'Standard User'})
+        self.kelli = self.org.insert('User', {'FirstName': 'Kelli', 'LastName': 'Brunt', 'Email': 'Brunt-Kelli@norc.org',
+                                              'Username': 'brunt-kelli@norc.org.test', 'ProfileId': self.profile_id})
+        self.tina = self.org.insert('User', {'FirstName': 'Tina', 'LastName': 'Cooper', 'Email': 'Cooper-Tina@norc.org',
+                                             'Username': 'cooper-tina@norc.org.test', 'IsActive': False})
+
+    def test_in_filters_are_case_insensitive(self):
+        records = self.org.query("SELECT Id, Email FROM User WHERE Email IN ('brunt-kelli@norc.org', 'nobody@norc.org')")
+        self.assertEqual([r['Id'] for r in records], [self.kelli])
+
+    def test_parent_relationships_are_nested(self):
+        """Test that Profile.Name is returned as a nested record, and as None without a parent."""
+        records = self.org.query("SELECT Id, Name, Profile.Name FROM User ORDER BY Name")
+
+        self.assertEqual(records[0]['Name'], 'Kelli Brunt')
+        self.assertEqual(records[0]['Profile']['Name'], 'Standard User')
+        self.assertIsNone(records[1]['Profile'])
+
+    def test_where_with_and_or_not_and_datetimes(self):
+        self.assertEqual(len(self.org.query("SELECT Id FROM User WHERE SystemModstamp >= 2020-01-01T00:00:00Z")), 2)
+        self.assertEqual(self.org.query("SELECT Id FROM User WHERE IsActive = true AND (Name LIKE 'kel%' OR Email = 'x')")[0]['Id'], self.kelli)
+        self.assertEqual(self.org.query("SELECT Id FROM User WHERE NOT IsActive = true")[0]['Id'], self.tina)
+        self.assertEqual(self.org.query("SELECT Id FROM User WHERE Id NOT IN ('" + self.kelli + "')")[0]['Id'], self.tina)
+
+    def test_order_by_and_limit(self):
+        records = self.org.query("SELECT Name FROM User ORDER BY Name DESC LIMIT 1")
+        self.assertEqual([r['Name'] for r in records], ['Tina Cooper'])
+
+    def test_duplicate_usernames_and_missing_fields_are_rejected(self):
+        with self.assertRaises(SalesforceRecordError) as ctx:
+            self.org.insert('User', {'LastName': 'Brunt', 'Email': 'x@norc.org', 'Username': 'BRUNT-KELLI@norc.org.test'})
+        self.assertEqual(ctx.exception.error_code, 'DUPLICATE_USERNAME')
+
+        with self.assertRaises(SalesforceRecordError) as ctx:
+            self.org.insert('User', {'Email': 'x@norc.org', 'Username': 'x@norc.org.test'})
+        self.assertEqual(ctx.exception.error_code, 'REQUIRED_FIELD_MISSING')
+
+    def test_index_follows_updates_and_deletes(self):
+        self.assertEqual(self.org.find('User', 'Email', 'cooper-tina@norc.org'), self.tina)
+        self.org.update('User', self.tina, {'Email': 'tina@norc.org'})
+        self.assertIsNone(self.org.find('User', 'Email', 'cooper-tina@norc.org'))
+        self.assertEqual(self.org.find('User', 'email', 'TINA@norc.org'), self.tina)
+
+        self.org.delete(self.tina)
+        self.assertEqual(self.org.query("SELECT Id FROM User WHERE Email = 'tina@norc.org'"), [])
+
+    def test_seeded_users_are_deterministic(self):
+        first, second = FakeOrg(), FakeOrg()
+        first.add_users(20, seed=7)
+        second.add_users(20, seed=7)
+        query = "SELECT Email FROM User ORDER BY Email"
+        self.assertEqual(first.query(query), second.query(query))
+        self.assertEqual(first.count('User'), 20)
+
+    def test_unsupported_soql_is_reported(self):
+        with self.assertRaises(SoqlError):
+            self.org.query("SELECT COUNT() FROM User")
+        with self.assertRaises(SoqlError):
+            self.org.query("SELECT Id FROM User WHERE")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,165 @@
+import unittest
+import configparser
+import json
+import pandas as pd
+from simple_salesforce.login import soap_login
+from src.fake_org import FakeOrg
+from src.fake_salesforce import FakeSalesforce, FakeSalesforceServer, FaultProfile, CRYPTOGRAPHY_AVAILABLE
+from src.salesforce_client import SalesforceClient
+from src.user_creator import create_salesforce_users
+
+BASE_URL = 'https://localhost:8443'
+DATA = '/services/data/v59.0'
+
+class TestFakeSalesforce(unittest.TestCase):
+
+    def setUp(self):
+        self.org = FakeOrg()
+        self.app = FakeSalesforce(self.org, session_id='token')
+
+    def call(self, method, path, payload=None, body=None, app=None):
+        body = json.dumps(payload).encode() if payload is not None else (body or b'')
+        status, headers, response = (app or self.app).handle(method, path, {'Authorization': 'Bearer token'}, body, BASE_URL)
+        is_json = headers.get('Content-Type', '').startswith('application/json')
+        return status, headers, json.loads(response) if is_json else response.decode()
+
+    def test_requests_need_a_valid_session(self):
+        status, _, _ = self.app.handle('GET', f"{DATA}/", {'Authorization': 'Bearer wrong'}, b'', BASE_URL)
+        self.assertEqual(status, 401)
+        status, headers, _ = self.call('GET', f"{DATA}/")
+        self.assertEqual(status, 200)
+        self.assertEqual(headers['Sforce-Limit-Info'], 'api-usage=1/15000')
+
+    def test_queries_are_paginated(self):
+        """Test that results past 2000 records come back through nextRecordsUrl."""
+        self.org.add_users(2500)
+        _, _, first = self.call('GET', f"{DATA}/query/?q=SELECT+Id+FROM+User")
+        self.assertFalse(first['done'])
+        self.assertEqual((first['totalSize'], len(first['records'])), (2500, 2000))
+
+        _, _, rest = self.call('GET', first['nextRecordsUrl'])
+        self.assertTrue(rest['done'])
+        self.assertEqual(len(rest['records']), 500)
+
+    def test_collections_report_lock_errors_per_record(self):
+        app = FakeSalesforce(self.org, FaultProfile(lock_error_rate=1.0), session_id='token')
+        records = [{'attributes': {'type': 'User'}, 'Username': f'u{i}@norc.org', 'LastName': 'U', 'Email': 'u@norc.org'} for i in range(2)]
+        status, _, results = self.call('POST', f"{DATA}/composite/sobjects", {'allOrNone': False, 'records': records}, app=app)
+
+        self.assertEqual(status, 200)
+        self.assertEqual([r['errors'][0]['statusCode'] for r in results], ['UNABLE_TO_LOCK_ROW'] * 2)
+        self.assertEqual(self.org.count('User'), 0)
+
+        status, _, errors = self.call('POST', f"{DATA}/composite/sobjects", {'records': records * 101})
+        self.assertEqual((status, errors[0]['errorCode']), (400, 'EXCEEDED_ID_LIMIT'))
+
+    def test_failed_graph_is_rolled_back(self):
+        """Test that a failing node halts the graph and removes the records it already created."""
+        self.org.insert('User', {'Username': 'taken@norc.org', 'LastName': 'T', 'Email': 't@norc.org'})
+        graph = {'graphId': 'g0', 'compositeRequest': [
+            {'method': 'POST', 'url': f"{DATA}/sobjects/User", 'referenceId': 'user0',
+             'body': {'Username': 'new@norc.org', 'LastName': 'N', 'Email': 'n@norc.org'}},
+            {'method': 'POST', 'url': f"{DATA}/sobjects/GroupMember", 'referenceId': 'user0_access0',
+             'body': {'UserOrGroupId': '@{user0.id}', 'GroupId': '00G1'}},
+            {'method': 'POST', 'url': f"{DATA}/sobjects/User", 'referenceId': 'user1',
+             'body': {'Username': 'taken@norc.org', 'LastName': 'T', 'Email': 't@norc.org'}}
+        ]}
+        _, _, response = self.call('POST', f"{DATA}/composite/graph", {'graphs': [graph]})
+
+        result = response['graphs'][0]
+        self.assertFalse(result['isSuccessful'])
+        codes = [node['body'][0]['errorCode'] for node in result['graphResponse']['compositeResponse']]
+        self.assertEqual(codes, ['PROCESSING_HALTED', 'PROCESSING_HALTED', 'DUPLICATE_USERNAME'])
+        self.assertEqual(self.org.count('User'), 1)
+        self.assertEqual(self.org.count('GroupMember'), 0)
+
+    def test_bulk_upsert_job(self):
+        """Test a Bulk API 2.0 upsert from job creation to the result sets."""
+        existing = self.org.insert('User', {'Username': 'kelli@norc.org', 'LastName': 'Brunt', 'Email': 'k@norc.org'})
+        _, _, job = self.call('POST', f"{DATA}/jobs/ingest", {'object': 'User', 'operation': 'upsert', 'externalIdFieldName': 'Username'})
+        csv_data = 'Username,LastName,Email,IsActive\nkelli@norc.org,Brunt,kelli@norc.org,false\ntina@norc.org,Cooper,t@norc.org,true\nnobody@norc.org,,x@norc.org,true\n'
+        self.call('PUT', f"{DATA}/jobs/ingest/{job['id']}/batches", body=csv_data.encode())
+        _, _, info = self.call('PATCH', f"{DATA}/jobs/ingest/{job['id']}", {'state': 'UploadComplete'})
+
+        self.assertEqual((info['state'], info['numberRecordsProcessed'], info['numberRecordsFailed']), ('JobComplete', 3, 1))
+        _, _, successful = self.call('GET', f"{DATA}/jobs/ingest/{job['id']}/successfulResults/")
+        _, _, failed = self.call('GET', f"{DATA}/jobs/ingest/{job['id']}/failedResults/")
+        self.assertIn(f'{existing},false,kelli@norc.org', successful)
+        self.assertIn(',true,tina@norc.org', successful)
+        self.assertIn('REQUIRED_FIELD_MISSING', failed)
+        self.assertEqual(self.org.get(existing)[1]['IsActive'], False)
+
+    def test_collection_upsert_by_external_id(self):
+        """Test that a Collections upsert updates matching users, creates the rest and says which it did."""
+        existing = self.org.insert('User', {'Username': 'kelli@norc.org', 'LastName': 'Brunt', 'Email': 'k@norc.org', 'FederationIdentifier': 'F1'})
+        records = [{'attributes': {'type': 'User'}, 'Username': 'kelli@norc.org', 'LastName': 'Brunt', 'Email': 'kelli@norc.org', 'FederationIdentifier': 'F1'},
+                   {'attributes': {'type': 'User'}, 'Username': 'tina@norc.org', 'LastName': 'Cooper', 'Email': 't@norc.org', 'FederationIdentifier': 'F2'},
+                   {'attributes': {'type': 'User'}, 'Username': 'nobody@norc.org', 'LastName': 'N', 'Email': 'n@norc.org'}]
+        status, _, results = self.call('PATCH', f"{DATA}/composite/sobjects/User/FederationIdentifier", {'allOrNone': False, 'records': records})
+
+        self.assertEqual(status, 200)
+        self.assertEqual([(r['success'], r['created']) for r in results], [(True, False), (True, True), (False, False)])
+        self.assertEqual(results[0]['id'], existing)
+        self.assertEqual(self.org.get(existing)[1]['Email'], 'kelli@norc.org')
+        self.assertEqual(results[2]['errors'][0]['statusCode'], 'REQUIRED_FIELD_MISSING')
+
+        # Assigning the same queue twice is rejected like in a real org
+        member = {'attributes': {'type': 'GroupMember'}, 'GroupId': '00G000000000001', 'UserOrGroupId': existing}
+        _, _, results = self.call('POST', f"{DATA}/composite/sobjects", {'records': [member, member]})
+        self.assertEqual([r['success'] for r in results], [True, False])
+        self.assertEqual(results[1]['errors'][0]['statusCode'], 'DUPLICATE_VALUE')
+
+    def test_injected_errors_and_limits(self):
+        """Test the 503s of error_rate and the REQUEST_LIMIT_EXCEEDED past api_limit."""
+        failing = FakeSalesforce(self.org, FaultProfile(error_rate=1.0), session_id='token')
+        status, _, errors = self.call('GET', f"{DATA}/", app=failing)
+        self.assertEqual((status, errors[0]['errorCode']), (503, 'SERVER_UNAVAILABLE'))
+
+        limited = FakeSalesforce(self.org, FaultProfile(api_limit=2), session_id='token')
+        statuses = [self.call('GET', f"{DATA}/", app=limited)[0] for _ in range(3)]
+        self.assertEqual(statuses, [200, 200, 403])
+
+@unittest.skipUnless(CRYPTOGRAPHY_AVAILABLE, "needs the cryptography package for a self-signed certificate")
+class TestFakeSalesforceServer(unittest.TestCase):
+
+    def setUp(self):
+        self.org = FakeOrg()
+        self.org.add_queues(['Queue1'])
+        self.server = FakeSalesforceServer(FakeSalesforce(self.org, FaultProfile(lock_error_rate=0.3, seed=1))).start()
+        self.config = configparser.ConfigParser()
+        self.config['salesforce_creds'] = {'instance_url': self.server.instance_url, 'session_id': self.server.app.session_id}
+        self.config['http'] = {'ca_bundle': self.server.ca_bundle}
+        self.config['retry'] = {'base_delay': '0.001'}
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_users_are_created_over_https(self):
+        """Test that batched creation against the fake org succeeds despite transient lock errors."""
+        sf = SalesforceClient(self.config).connect()
+        processed_data = pd.DataFrame({
+            'Username': [f'user{i}@norc.org' for i in range(10)],
+            'LastName': ['User'] * 10,
+            'Email': [f'user{i}@norc.org' for i in range(10)],
+            'PermissionSetGroupIDs': ['0PG1'] * 10,
+            'Queues': ['Queue1'] * 10,
+            'EnableSSO': [False] * 10
+        })
+        results = create_salesforce_users(sf, processed_data, {'Username': 'Username', 'LastName': 'LastName', 'Email': 'Email'},
+                                          dry_run=False, mode='collections')
+
+        self.assertEqual(list(results['Status']), ['Success'] * 10)
+        self.assertEqual(self.org.count('User'), 10)
+        self.assertEqual(self.org.count('GroupMember'), 10)
+        self.assertEqual(self.org.count('PermissionSetAssignment'), 10)
+        self.assertGreater(results['Retries'].sum(), 0)
+
+    def test_soap_login(self):
+        session_id, instance = soap_login(f"{self.server.instance_url}/services/Soap/u/59.0", '<n1:username>admin@norc.org</n1:username>',
+                                          None, None, session=SalesforceClient(self.config).session)
+        self.assertEqual(instance, f"localhost:{self.server.port}")
+        status, _, _ = self.server.app.handle('GET', f"{DATA}/", {'Authorization': f'Bearer {session_id}'}, b'', BASE_URL)
+        self.assertEqual(status, 200)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,48 @@
+import unittest
+from src.fuzzy_match import find_possible_duplicates, normalize_email_local, normalize_name, MinHashIndex
+
+class TestFuzzyMatch(unittest.TestCase):
+
+    def setUp(self):
+        self.org_users = [
+            {'Id': '005_a', 'Email': 'brunt.kelli@norc.org', 'Name': 'Kelli Brunt'},
+            {'Id': '005_b', 'Email': 'cooper-tina@norc.org', 'Name': 'Tina Cooper'},
+            {'Id': '005_c', 'Email': 'jsmith@norc.org', 'Name': 'John Smith'}
+        ]
+
+    def test_normalization(self):
+        """Test that punctuation, case and the domain are ignored."""
+        self.assertEqual(normalize_email_local('Brunt-Kelli@norc.org'), 'bruntkelli')
+        self.assertEqual(normalize_email_local(None), '')
+        self.assertEqual(normalize_name('Brunt, Kelli'), normalize_name('Kelli Brunt'))
+
+    def test_variants_and_typos_are_found(self):
+        """Test that a hyphen/dot variant and a typo both match the right user."""
+        people = [
+            (0, 'Brunt-Kelli@norc.org', 'Kelli Brunt'),
+            (1, 'Cooper-Tinna@norc.org', 'Tina Cooper'),
+            (2, 'Gaines-Littel@norc.org', 'Littel Gaines')
+        ]
+        matches = find_possible_duplicates(people, self.org_users)
+
+        self.assertEqual(set(matches), {0, 1})
+        score, user = matches[0][0]
+        self.assertEqual(user['Id'], '005_a')
+        self.assertAlmostEqual(score, 1.0)
+        self.assertEqual(matches[1][0][1]['Id'], '005_b')
+
+    def test_same_name_alone_is_not_a_duplicate(self):
+        """Test that a shared name with an unrelated email scores below the threshold."""
+        matches = find_possible_duplicates([(0, 'john.q.smith.42@norc.org', 'John Smith')], self.org_users)
+        self.assertEqual(matches, {})
+
+    def test_index_only_returns_similar_strings(self):
+        """Test that the LSH index returns near-identical strings and skips unrelated ones."""
+        index = MinHashIndex()
+        index.add('a', 'bruntkelli')
+        index.add('b', 'zzzqqqxxxyyy')
+        self.assertEqual(index.candidates('bruntkelli'), ['a'])
+        self.assertEqual(index.candidates(''), [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+import unittest
+from unittest.mock import patch
+import configparser
+import gzip
+import json
+import requests
+from src.http_transport import SalesforceSession, session_from_config
+
+class TestSalesforceSession(unittest.TestCase):
+
+    def send(self, session, **kwargs):
+        """Sends a request through the session and returns the prepared request that would go on the wire."""
+        with patch.object(requests.adapters.HTTPAdapter, 'send') as mock_send:
+            mock_send.return_value = requests.Response()
+            mock_send.return_value.status_code = 200
+            session.request('POST', 'https://test.my.salesforce.com/services/data/v59.0/composite/sobjects', **kwargs)
+            return mock_send.call_args[0][0]
+
+    def test_large_json_bodies_are_gzipped(self):
+        """Test that a body over the threshold is compressed and marked with Content-Encoding."""
+        payload = {'records': [{'attributes': {'type': 'User'}, 'Username': f'user{i}@norc.org'} for i in range(100)]}
+        prepared = self.send(SalesforceSession(gzip_min_bytes=1024), json=payload)
+
+        self.assertEqual(prepared.headers['Content-Encoding'], 'gzip')
+        self.assertEqual(prepared.headers['Content-Type'], 'application/json')
+        self.assertEqual(json.loads(gzip.decompress(prepared.body)), payload)
+
+    def test_small_bodies_are_sent_uncompressed(self):
+        """Test that a body under the threshold is left alone."""
+        prepared = self.send(SalesforceSession(gzip_min_bytes=1024), data='{"LastName": "Brunt"}')
+
+        self.assertNotIn('Content-Encoding', prepared.headers)
+        self.assertEqual(prepared.body, b'{"LastName": "Brunt"}')
+
+    def test_responses_are_requested_compressed(self):
+        prepared = self.send(SalesforceSession(), data='{}')
+        self.assertIn('gzip', prepared.headers['Accept-Encoding'])
+
+    def test_ca_bundle_is_used_to_verify_every_request(self):
+        """Test that [http] ca_bundle is passed per request, so REQUESTS_CA_BUNDLE cannot override it."""
+        config = configparser.ConfigParser()
+        config['http'] = {'ca_bundle': '/tmp/fake_salesforce_cert.pem'}
+        session = session_from_config(config)
+
+        with patch.dict('os.environ', {'REQUESTS_CA_BUNDLE': '/etc/ssl/certs/ca-certificates.crt'}), \
+                patch.object(requests.adapters.HTTPAdapter, 'send') as mock_send:
+            mock_send.return_value = requests.Response()
+            mock_send.return_value.status_code = 200
+            session.request('GET', 'https://localhost:8443/services/data/v59.0/')
+
+        self.assertEqual(mock_send.call_args.kwargs['verify'], '/tmp/fake_salesforce_cert.pem')
+
+    def test_pool_is_sized_from_config_and_workers(self):
+        """Test that the pool size comes from [http] and grows to fit the worker count."""
+        config = configparser.ConfigParser()
+        config['http'] = {'pool_size': '20', 'gzip_requests': 'false'}
+
+        session = session_from_config(config)
+        self.assertEqual(session.pool_size, 20)
+        self.assertFalse(session.gzip_requests)
+        self.assertEqual(session.get_adapter('https://x.my.salesforce.com')._pool_maxsize, 20)
+        self.assertEqual(session_from_config(config, min_pool_size=32).pool_size, 32)
+        self.assertEqual(session_from_config(configparser.ConfigParser()).pool_size, 10)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,141 @@
+import unittest
+from unittest.mock import MagicMock
+import os
+import tempfile
+import pandas as pd
+import requests
+from simple_salesforce.exceptions import SalesforceMalformedRequest
+from src.journal import CreationJournal, INSERT_STEP, STARTED, SUCCEEDED, FAILED
+from src.user_creator import create_salesforce_users
+
+class TestCreationJournal(unittest.TestCase):
+
+    def setUp(self):
+        """Set up a journal in a temporary directory."""
+        self.test_dir = tempfile.TemporaryDirectory()
+        self.journal_path = os.path.join(self.test_dir.name, 'run.journal.sqlite')
+        self.journal = CreationJournal(self.journal_path)
+
+    def tearDown(self):
+        """Close the journal and clean up."""
+        self.journal.close()
+        self.test_dir.cleanup()
+
+    def test_latest_event_per_step_wins(self):
+        """Test that replaying the journal keeps only the latest outcome of each step."""
+        self.assertTrue(self.journal.is_empty())
+        self.journal.record('user1', INSERT_STEP, STARTED)
+        self.journal.record('user1', INSERT_STEP, SUCCEEDED, '005_1')
+        self.journal.record('user1', 'assign:PSG psg1', FAILED, '005_1', 'timeout')
+
+        # Reopen to make sure events were committed to disk
+        self.journal.close()
+        self.journal = CreationJournal(self.journal_path)
+        state = self.journal.load_state()
+
+        self.assertFalse(self.journal.is_empty())
+        self.assertEqual(state['user1'][INSERT_STEP], (SUCCEEDED, '005_1', ''))
+        self.assertEqual(state['user1']['assign:PSG psg1'], (FAILED, '005_1', 'timeout'))
+
+    def test_live_run_records_every_step(self):
+        """Test that a rest-mode run journals the insert and each assignment."""
+        mock_sf = MagicMock()
+        mock_sf.query_all.return_value = {'records': []}
+        mock_sf.User.create.return_value = {'success': True, 'id': '005_1'}
+        processed_data = pd.DataFrame({'Username': ['user1'], 'PermissionSetGroupIDs': ['psg1;psg2'], 'Queues': [None]})
+
+        create_salesforce_users(mock_sf, processed_data, {'Username': 'Username'}, dry_run=False, journal=self.journal)
+
+        state = self.journal.load_state()['user1']
+        self.assertEqual(state[INSERT_STEP][:2], (SUCCEEDED, '005_1'))
+        self.assertEqual(state['assign:PSG psg1'][0], SUCCEEDED)
+        self.assertEqual(state['assign:PSG psg2'][0], SUCCEEDED)
+
+    def test_resume_skips_finished_work(self):
+        """Test that resuming only retries the steps that did not finish."""
+        # user0 finished; user1 was created but one assignment failed;
+        # user2's insert was in flight when the run died; user3 was never started.
+        self.journal.record('user0', INSERT_STEP, SUCCEEDED, '005_0')
+        self.journal.record('user0', 'assign:PSG psg1', SUCCEEDED, '005_0')
+        self.journal.record('user1', INSERT_STEP, SUCCEEDED, '005_1')
+        self.journal.record('user1', 'assign:PSG psg1', FAILED, '005_1', 'UNABLE_TO_LOCK_ROW')
+        self.journal.record('user2', INSERT_STEP, STARTED)
+
+        mock_sf = MagicMock()
+        mock_sf.query_all.side_effect = lambda query: (
+            {'records': [{'Id': '005_2', 'Username': 'user2'}]} if 'FROM User' in query else {'records': []}
+        )
+        mock_sf.User.create.return_value = {'success': True, 'id': '005_3'}
+        processed_data = pd.DataFrame({
+            'Username': ['user0', 'user1', 'user2', 'user3'],
+            'PermissionSetGroupIDs': ['psg1'] * 4,
+            'Queues': [None] * 4
+        })
+
+        results_df = create_salesforce_users(mock_sf, processed_data, {'Username': 'Username'}, dry_run=False,
+                                             journal=self.journal, resume=True)
+
+        # Only user3 is inserted; user2 was found in the org instead of being inserted twice
+        mock_sf.User.create.assert_called_once_with({'Username': 'user3'})
+        assigned_to = [c[0][0]['AssigneeId'] for c in mock_sf.PermissionSetAssignment.create.call_args_list]
+        self.assertEqual(sorted(assigned_to), ['005_1', '005_2', '005_3'])
+        self.assertEqual(list(results_df['SalesforceId']), ['005_0', '005_1', '005_2', '005_3'])
+        self.assertTrue((results_df['Status'] == 'Success').all())
+
+    def test_resume_after_timeout_finds_user_instead_of_inserting_again(self):
+        """Test that an insert that timed out stays in doubt, and is reconciled against the org on resume."""
+        mock_sf = MagicMock()
+        mock_sf.query_all.return_value = {'records': []}
+        mock_sf.User.create.side_effect = requests.ReadTimeout('Read timed out.')
+        processed_data = pd.DataFrame({'Username': ['user1'], 'PermissionSetGroupIDs': ['psg1'], 'Queues': [None]})
+
+        results_df = create_salesforce_users(mock_sf, processed_data, {'Username': 'Username'}, dry_run=False, journal=self.journal)
+
+        self.assertEqual(results_df.iloc[0]['Status'], 'Failed')
+        self.assertEqual(self.journal.load_state()['user1'][INSERT_STEP][0], STARTED)
+
+        # The org did create the user before the response was lost
+        mock_sf.reset_mock()
+        mock_sf.query_all.side_effect = lambda query: (
+            {'records': [{'Id': '005_1', 'Username': 'user1'}]} if 'FROM User' in query else {'records': []}
+        )
+        results_df = create_salesforce_users(mock_sf, processed_data, {'Username': 'Username'}, dry_run=False,
+                                             journal=self.journal, resume=True)
+
+        mock_sf.User.create.assert_not_called()
+        mock_sf.PermissionSetAssignment.create.assert_called_once_with({'AssigneeId': '005_1', 'PermissionSetGroupId': 'psg1'})
+        self.assertEqual(results_df.iloc[0]['Status'], 'Success')
+
+    def test_failed_connection_is_final(self):
+        """Test that an insert that never reached the org is journaled as failed."""
+        mock_sf = MagicMock()
+        mock_sf.User.create.side_effect = requests.ConnectTimeout('Connection timed out.')
+        processed_data = pd.DataFrame({'Username': ['user1'], 'PermissionSetGroupIDs': [None], 'Queues': [None]})
+
+        create_salesforce_users(mock_sf, processed_data, {'Username': 'Username'}, dry_run=False, journal=self.journal)
+
+        self.assertEqual(self.journal.load_state()['user1'][INSERT_STEP][0], FAILED)
+
+    def test_resume_counts_existing_assignments_as_done(self):
+        """Test that an assignment which landed before the run died, but was never journaled, is not reported as failed."""
+        self.journal.record('user0', INSERT_STEP, SUCCEEDED, '005_0')
+        mock_sf = MagicMock()
+        mock_sf.query_all.return_value = {'records': [{'Name': 'Queue1', 'Id': 'q1_id'}]}
+        mock_sf.GroupMember.create.side_effect = SalesforceMalformedRequest(
+            'url', 400, 'GroupMember', [{'errorCode': 'DUPLICATE_VALUE', 'message': 'duplicate value found'}])
+        processed_data = pd.DataFrame({'Username': ['user0'], 'PermissionSetGroupIDs': [None], 'Queues': ['Queue1']})
+
+        results_df = create_salesforce_users(mock_sf, processed_data, {'Username': 'Username'}, dry_run=False,
+                                             journal=self.journal, resume=True)
+
+        mock_sf.GroupMember.create.assert_called_once()
+        self.assertEqual(results_df.iloc[0]['Status'], 'Success')
+        self.assertEqual(self.journal.load_state()['user0']['assign:Queue Queue1'][0], SUCCEEDED)
+
+    def test_resume_requires_journal(self):
+        """Test that resume without a journal is rejected."""
+        with self.assertRaises(ValueError):
+            create_salesforce_users(MagicMock(), pd.DataFrame({'Username': [], 'Queues': []}), {}, dry_run=False, resume=True)
+
+if __name__ == '__main__':
+    unittest.main()
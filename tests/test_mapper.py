@@ -2,7 +2,7 @@ import unittest
 import pandas as pd
 import os
 import tempfile
-from src.mapper import load_mapping, map_row_to_payload
+from src.mapper import load_mapping, map_row_to_payload, map_dataframe, frame_to_payloads
 
 class TestMapper(unittest.TestCase):
 
@@ -46,5 +46,29 @@ class TestMapper(unittest.TestCase):
         self.assertEqual(payload['Email'], 'test@example.com')
         self.assertNotIn('Extra Column', payload)
 
+    def test_map_dataframe_to_payloads(self):
+        """Test that whole columns are mapped and null cells are dropped per row."""
+        mapping = load_mapping(self.mapping_path)
+        df = pd.DataFrame({
+            'FirstName': ['Test', None],
+            'LastName': ['User', 'Two'],
+            'Email (employee ID version)': ['test@example.com', 'two@example.com'],
+            'Extra Column': ['ignored', 'ignored']
+        })
+
+        payloads = frame_to_payloads(map_dataframe(df, mapping))
+
+        self.assertEqual(payloads, [
+            {'FirstName': 'Test', 'LastName': 'User', 'Email': 'test@example.com'},
+            {'LastName': 'Two', 'Email': 'two@example.com'}
+        ])
+        self.assertEqual(payloads[0], map_row_to_payload(df.iloc[0], mapping))
+
+    def test_map_dataframe_duplicate_targets(self):
+        """Test that the last non-null source column wins when two columns map to one field."""
+        df = pd.DataFrame({'Primary': ['a', 'b'], 'Override': [None, 'c']})
+        payloads = frame_to_payloads(map_dataframe(df, {'Primary': 'Field__c', 'Override': 'Field__c'}))
+        self.assertEqual(payloads, [{'Field__c': 'a'}, {'Field__c': 'c'}])
+
 if __name__ == '__main__':
     unittest.main()
@@ -4,6 +4,7 @@ import pandas as pd
 import os
 import tempfile
 from main import handle_preflight # Import the handler from main
+from src.preflight import run_duplicate_check
 
 class TestPreflightCommand(unittest.TestCase):
 
@@ -15,6 +16,7 @@ class TestPreflightCommand(unittest.TestCase):
         self.input_excel_path = 'reports/test_users.xlsx'
         self.output_csv_path = os.path.join(self.test_dir.name, 'preflight.csv')
         self.mock_config = MagicMock()
+        self.mock_config.__getitem__.return_value = {'workbook_cache': os.path.join(self.test_dir.name, 'cache')}
         self.connect_patcher = patch('main.connect_to_salesforce', return_value=self.mock_sf)
         self.connect_patcher.start()
 
@@ -33,6 +35,8 @@ class TestPreflightCommand(unittest.TestCase):
         mock_args = MagicMock()
         mock_args.input = self.input_excel_path
         mock_args.output = self.output_csv_path
+        mock_args.use_index = False
+        mock_args.fuzzy = False
 
         handle_preflight(mock_args, self.mock_config)
 
@@ -52,11 +56,56 @@ class TestPreflightCommand(unittest.TestCase):
         mock_args = MagicMock()
         mock_args.input = self.input_excel_path
         mock_args.output = self.output_csv_path
+        mock_args.use_index = False
+        mock_args.fuzzy = False
 
         handle_preflight(mock_args, self.mock_config)
 
         report_df = pd.read_csv(self.output_csv_path)
         self.assertTrue((report_df['Action'] == 'Create New User').all())
 
+class TestDuplicateMatching(unittest.TestCase):
+
+    def test_every_conflicting_id_is_reported(self):
+        """Test that all matching User Ids are listed, case-insensitively, for email and username."""
+        mock_sf = MagicMock()
+        mock_sf.query_all.return_value = {'records': [
+            {'Id': '005_a', 'Email': 'jane.doe@norc.org', 'Username': 'jane.doe@norc.org.old'},
+            {'Id': '005_b', 'Email': 'JANE.DOE@norc.org', 'Username': 'jdoe@norc.org@test.com'},
+            {'Id': '005_c', 'Email': 'other@norc.org', 'Username': 'other@norc.org@test.com'}
+        ]}
+        users_df = pd.DataFrame({
+            'Email (name version)': ['Jane.Doe@norc.org', 'new@norc.org', 'someone@norc.org'],
+            'Username': ['jdoe@norc.org@test.com', 'new@norc.org@test.com', None]
+        })
+
+        report = run_duplicate_check(mock_sf, users_df)
+
+        self.assertEqual(list(report['Action']), ['Skip - Duplicate Found', 'Create New User', 'Create New User'])
+        self.assertEqual(report.iloc[0]['Notes'], 'Email match on User IDs 005_a, 005_b; Username match on User ID 005_b')
+        self.assertEqual(report.iloc[1]['Notes'], '')
+
+    def test_fuzzy_matches_are_flagged_for_review(self):
+        """Test that a near-match is marked for review with its score, without overriding exact matches."""
+        mock_sf = MagicMock()
+        org_users = [
+            {'Id': '005_a', 'Email': 'Brunt-Kelli@norc.org', 'Username': 'Brunt-Kelli@norc.org@test.com', 'Name': 'Kelli Brunt'},
+            {'Id': '005_b', 'Email': 'cooper.tina@norc.org', 'Username': 'cooper.tina@norc.org', 'Name': 'Tina Cooper'}
+        ]
+        mock_sf.query_all.side_effect = lambda query: {
+            'records': org_users if 'WHERE' not in query else [u for u in org_users if u['Id'] == '005_a']
+        }
+        users_df = pd.DataFrame({
+            'Email (name version)': ['Brunt-Kelli@norc.org', 'Cooper-Tina@norc.org', 'Gaines-Littel@norc.org'],
+            'Username': ['Brunt-Kelli@norc.org@test.com', 'Cooper-Tina@norc.org@test.com', 'Gaines-Littel@norc.org@test.com'],
+            'FirstName': ['Kelli', 'Tina', 'Littel'],
+            'LastName': ['Brunt', 'Cooper', 'Gaines']
+        })
+
+        report = run_duplicate_check(mock_sf, users_df, fuzzy_threshold=0.85)
+
+        self.assertEqual(list(report['Action']), ['Skip - Duplicate Found', 'Review - Possible Duplicate', 'Create New User'])
+        self.assertEqual(report.iloc[1]['Notes'], 'Possible match on User ID 005_b (cooper.tina@norc.org, score 1.00)')
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,73 @@
+import unittest
+from unittest.mock import MagicMock, patch
+import pandas as pd
+import os
+import tempfile
+from main import handle_provision # Import the handler from main
+from src.workbook_loader import load_workbook
+
+class TestProvisionCommand(unittest.TestCase):
+
+    def setUp(self):
+        """Set up mock objects and a temporary output directory."""
+        self.mock_sf = MagicMock()
+        self.test_dir = tempfile.TemporaryDirectory()
+        self.mock_config = MagicMock()
+        self.mock_config.__getitem__.return_value = {'environment': 'Training', 'mapping_file': 'mapping.properties', 'workbook_cache': os.path.join(self.test_dir.name, 'cache')}
+
+        self.connect_patcher = patch('main.connect_to_salesforce', return_value=self.mock_sf)
+        self.mock_connect = self.connect_patcher.start()
+
+        def query_all(query):
+            if 'FROM Group' in query:
+                return {'records': [{'Name': f'Queue{i}', 'Id': f'q{i}_id'} for i in range(1, 5)]}
+            if 'Username IN' in query:
+                return {'records': [{'Id': '005_existing_user', 'Email': 'Brunt-Kelli@norc.org', 'Username': 'Brunt-Kelli@norc.org@test.com'}]}
+            if 'Id IN' in query:
+                return {'records': [{'attributes': {}, 'Id': '005_new_user', 'Name': 'Littel Gaines', 'Username': 'Gaines-Littel@norc.org@test.com', 'Profile': {'Name': 'Rep'}, 'IsActive': True}]}
+            return {'records': []}
+        self.mock_sf.query_all.side_effect = query_all
+        self.mock_sf.User.create.return_value = {'success': True, 'id': '005_new_user'}
+
+    def tearDown(self):
+        """Clean up and stop patches."""
+        self.test_dir.cleanup()
+        self.connect_patcher.stop()
+
+    def test_provision_runs_every_stage_from_one_workbook_read(self):
+        """Test that provision reads the workbook once, connects once and writes each stage's report."""
+        mock_args = MagicMock()
+        mock_args.input = 'reports/test_users.xlsx'
+        mock_args.output_dir = self.test_dir.name
+        mock_args.use_index = False
+        mock_args.fuzzy = False
+        mock_args.dry_run = False
+        mock_args.mode = 'rest'
+        mock_args.batch_size = 200
+        mock_args.concurrency = 1
+        mock_args.requests_per_second = None
+        mock_args.graph_size = 1
+        mock_args.journal = None
+        mock_args.resume = False
+        mock_args.skip_reference_check = True
+
+        with patch('main.load_workbook', wraps=load_workbook) as mock_load_workbook:
+            handle_provision(mock_args, self.mock_config)
+
+        mock_load_workbook.assert_called_once()
+        self.mock_connect.assert_called_once()
+
+        preflight_df = pd.read_csv(os.path.join(self.test_dir.name, 'preflight_report.csv'))
+        self.assertEqual(list(preflight_df['Action']), ['Skip - Duplicate Found', 'Create New User', 'Create New User'])
+
+        # Kelli is a duplicate, so only Tina and Littel are created
+        self.assertEqual(self.mock_sf.User.create.call_count, 2)
+        results_df = pd.read_csv(os.path.join(self.test_dir.name, 'creation_results.csv'))
+        self.assertEqual(len(results_df), 2)
+
+        # Only users added by Josh are validated
+        validation_df = pd.read_csv(os.path.join(self.test_dir.name, 'validation_results.csv'))
+        self.assertEqual(list(validation_df['Username']), ['Gaines-Littel@norc.org@test.com'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,29 @@
+import unittest
+import time
+from src.rate_limiter import RateLimiter
+
+class TestRateLimiter(unittest.TestCase):
+
+    def test_burst_is_not_delayed(self):
+        """Test that requests within the burst capacity go through immediately."""
+        limiter = RateLimiter(requests_per_second=50)
+        start = time.monotonic()
+        for _ in range(50):
+            limiter.acquire()
+        self.assertLess(time.monotonic() - start, 0.1)
+
+    def test_rate_is_enforced(self):
+        """Test that requests beyond the burst are spread out at the configured rate."""
+        limiter = RateLimiter(requests_per_second=100, burst=1)
+        start = time.monotonic()
+        for _ in range(11):
+            limiter.acquire()
+        self.assertGreaterEqual(time.monotonic() - start, 0.09)
+
+    def test_invalid_rate(self):
+        """Test that a non-positive rate is rejected."""
+        with self.assertRaises(ValueError):
+            RateLimiter(0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+import unittest
+from unittest.mock import MagicMock
+import pandas as pd
+from simple_salesforce.exceptions import SalesforceError
+from src.reference_validator import ReferenceValidator, collect_references, format_missing_references
+from src.user_creator import create_salesforce_users
+
+PROFILE = '00e000000000001AAA'
+ROLE = '00E000000000001'
+PSG_1 = '0PG000000000001AAA'
+PSG_2 = '0PG000000000002AAA'
+
+def respond(query):
+    """Answers the validator's queries as an org with one Profile, Role, PSG and queue would."""
+    if 'FROM Group' in query:
+        return {'records': [{'Id': '00G000000000001AAA', 'Name': 'Queue1'}]}
+    known = {'Profile': PROFILE, 'UserRole': '00E000000000001AAA', 'PermissionSetGroup': PSG_1}
+    sobject = query.split(' FROM ')[1].split(' ')[0]
+    return {'records': [{'Id': known[sobject]}] if known[sobject][:15] in query else []}
+
+class TestReferenceValidator(unittest.TestCase):
+
+    def setUp(self):
+        self.mock_sf = MagicMock()
+        self.mock_sf.query_all.side_effect = respond
+        self.processed_data = pd.DataFrame({
+            'Username': ['user1', 'user2', 'user3'],
+            'LastName': ['One', 'Two', 'Three'],
+            'ProfileID': [PROFILE, PROFILE, 'not-an-id'],
+            'RoleID': [ROLE, '00E000000000009', None],
+            'PermissionSetGroupIDs': [f"{PSG_1};{PSG_2}", PSG_1, None],
+            'Queues': ['Queue1\nQueue9', None, 'Queue1'],
+            'EnableSSO': [False, False, False]
+        })
+
+    def test_collect_references(self):
+        references = collect_references(self.processed_data)
+        self.assertEqual(references['PermissionSetGroupIDs'], {PSG_1, PSG_2})
+        self.assertEqual(references['Queues'], {'Queue1', 'Queue9'})
+
+    def test_missing_references_take_one_query_per_kind(self):
+        """Test that each kind is checked in one query, and that 15- and 18-character Ids both match."""
+        validator = ReferenceValidator(self.mock_sf)
+        missing = validator.check(self.processed_data)
+
+        self.assertEqual(self.mock_sf.query_all.call_count, 4)
+        self.assertEqual(missing['ProfileID'], {'not-an-id'})
+        self.assertEqual(missing['RoleID'], {'00E000000000009'})
+        self.assertEqual(missing['PermissionSetGroupIDs'], {PSG_2})
+        self.assertEqual(missing['Queues'], {'Queue9'})
+        self.assertEqual(validator.queue_ids, {'Queue1': '00G000000000001AAA'})
+        self.assertIn("Role: 00E000000000009 not found (1 users will not be created)", format_missing_references(missing, self.processed_data))
+
+        # Values checked before are not queried again
+        validator.check(self.processed_data.iloc[:2])
+        self.assertEqual(self.mock_sf.query_all.call_count, 4)
+
+    def test_failed_lookup_leaves_references_unchecked(self):
+        self.mock_sf.query_all.side_effect = SalesforceError('url', 500, 'Group', 'Server error')
+        validator = ReferenceValidator(self.mock_sf)
+        missing = validator.check(self.processed_data)
+
+        self.assertEqual(missing['RoleID'], set())
+        self.assertEqual(missing['ProfileID'], {'not-an-id'})
+        self.assertIn('Queues', validator.unchecked)
+
+    def test_creation_skips_users_with_missing_references(self):
+        """Test that a missing Role or Profile fails the user before its insert and a missing PSG is only reported."""
+        missing = ReferenceValidator(self.mock_sf).check(self.processed_data)
+        self.mock_sf.User.create.return_value = {'success': True, 'id': '005_1'}
+
+        results_df = create_salesforce_users(self.mock_sf, self.processed_data, {'Username': 'Username', 'LastName': 'LastName'},
+                                             dry_run=False, missing_references=missing, queue_ids={'Queue1': 'q1_id'})
+
+        self.mock_sf.User.create.assert_called_once()
+        self.assertEqual(list(results_df['Status']), ['Success with errors', 'Failed', 'Failed'])
+        self.assertEqual(results_df.iloc[0]['AssignmentErrors'], f"Permission Set Group '{PSG_2}' not found.\nQueue 'Queue9' not found.")
+        self.mock_sf.PermissionSetAssignment.create.assert_called_once_with({'AssigneeId': '005_1', 'PermissionSetGroupId': PSG_1})
+        self.assertEqual(results_df.iloc[1]['Error'], "Reference check failed: Role '00E000000000009' not found.")
+        self.assertEqual(results_df.iloc[2]['Error'], "Reference check failed: Profile 'not-an-id' not found.")
+
+if __name__ == '__main__':
+    unittest.main()
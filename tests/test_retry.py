@@ -0,0 +1,151 @@
+import unittest
+from unittest.mock import MagicMock, patch
+import json
+import requests
+from urllib3.exceptions import MaxRetryError, NewConnectionError, ProtocolError
+import pandas as pd
+from src.retry import RetryPolicy, RetryRule, CircuitBreaker, CircuitOpenError, note_retry
+from src.http_transport import SalesforceSession
+from src.user_creator import create_salesforce_users
+
+def make_response(status_code, body=None):
+    response = requests.Response()
+    response.status_code = status_code
+    response._content = json.dumps(body if body is not None else {}).encode('utf-8')
+    return response
+
+class TestRetryPolicy(unittest.TestCase):
+
+    def setUp(self):
+        self.policy = RetryPolicy(sleep=MagicMock(), jitter=lambda: 0.5)
+
+    def test_transient_failures_are_classified_per_error_code(self):
+        """Test that lock and limit errors use their own rules and permanent errors are not retried."""
+        lock = make_response(400, [{'errorCode': 'UNABLE_TO_LOCK_ROW', 'message': 'unable to obtain exclusive access'}])
+        limit = make_response(403, [{'errorCode': 'REQUEST_LIMIT_EXCEEDED', 'message': 'ConcurrentRequests'}])
+        duplicate = make_response(400, [{'errorCode': 'DUPLICATE_USERNAME', 'message': 'Duplicate Username'}])
+
+        self.assertEqual(self.policy.rule_for_response(lock, 'POST').base_delay, 0.5)
+        self.assertEqual(self.policy.rule_for_response(limit, 'POST').base_delay, 5.0)
+        self.assertIsNotNone(self.policy.rule_for_response(make_response(503), 'POST'))
+        self.assertIsNone(self.policy.rule_for_response(duplicate, 'POST'))
+        self.assertIsNone(self.policy.rule_for_response(make_response(200), 'POST'))
+
+    def test_read_timeouts_are_only_retried_for_idempotent_requests(self):
+        """Test that a POST that may have reached the org is not sent twice."""
+        self.assertIsNone(self.policy.rule_for_exception(requests.ReadTimeout(), 'POST'))
+        self.assertIsNotNone(self.policy.rule_for_exception(requests.ReadTimeout(), 'GET'))
+        self.assertIsNone(self.policy.rule_for_exception(requests.exceptions.SSLError('certificate verify failed'), 'GET'))
+
+    def test_lost_connections_are_only_retried_for_idempotent_requests(self):
+        """Test that a POST is retried after a connection that never reached the org, but not after a reset."""
+        reset = requests.ConnectionError(ProtocolError('Connection aborted.', ConnectionResetError()))
+        refused = requests.ConnectionError(MaxRetryError(None, '/', NewConnectionError(None, 'Connection refused')))
+        self.assertIsNone(self.policy.rule_for_exception(reset, 'POST'))
+        self.assertIsNotNone(self.policy.rule_for_exception(reset, 'GET'))
+        self.assertIsNotNone(self.policy.rule_for_exception(refused, 'POST'))
+        self.assertIsNotNone(self.policy.rule_for_exception(requests.ConnectTimeout(), 'POST'))
+
+    def test_gateway_errors_are_only_retried_for_idempotent_requests(self):
+        """Test that a POST answered with a 502 or 504, which the org may have applied, is not sent twice."""
+        self.assertIsNone(self.policy.rule_for_response(make_response(504), 'POST'))
+        self.assertIsNone(self.policy.rule_for_response(make_response(502), 'post'))
+        self.assertIsNotNone(self.policy.rule_for_response(make_response(504), 'GET'))
+        self.assertIsNotNone(self.policy.rule_for_response(make_response(503), 'POST'))
+
+    def test_backoff_is_exponential_with_jitter_and_capped(self):
+        policy = RetryPolicy(max_delay=10, sleep=MagicMock(), jitter=lambda: 1.0)
+        rule = RetryRule(max_attempts=10, base_delay=1.0)
+        for attempt in (1, 2, 3, 6):
+            policy.wait(rule, attempt)
+        self.assertEqual([c[0][0] for c in policy.sleep.call_args_list], [1.0, 2.0, 4.0, 10.0])
+
+class TestCircuitBreaker(unittest.TestCase):
+
+    def test_opens_after_repeated_failures_and_recovers(self):
+        """Test that the breaker fails fast while open and lets a trial request through after the reset time."""
+        now = [0.0]
+        breaker = CircuitBreaker(failure_threshold=3, reset_seconds=30, clock=lambda: now[0])
+        for _ in range(3):
+            breaker.before_request()
+            breaker.record_failure()
+
+        with self.assertRaises(CircuitOpenError):
+            breaker.before_request()
+
+        now[0] = 31.0
+        breaker.before_request()  # trial request
+        breaker.record_success()
+        breaker.before_request()
+
+class TestSessionRetries(unittest.TestCase):
+
+    def test_transient_responses_are_retried_until_success(self):
+        """Test that the session resends a request that failed with a transient error."""
+        session = SalesforceSession(retry_policy=RetryPolicy(sleep=MagicMock()), circuit_breaker=CircuitBreaker())
+        responses = [make_response(503), make_response(400, [{'errorCode': 'UNABLE_TO_LOCK_ROW'}]), make_response(201, {'id': '005'})]
+        with patch.object(requests.adapters.HTTPAdapter, 'send', side_effect=responses) as mock_send:
+            response = session.request('POST', 'https://test.my.salesforce.com/services/data/v59.0/sobjects/User', json={})
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(mock_send.call_count, 3)
+        self.assertEqual(session.usage.calls_made, 3)
+
+    def test_gives_up_after_max_attempts(self):
+        """Test that the last failed response is returned once the rule's attempts are used up."""
+        policy = RetryPolicy(default_rule=RetryRule(max_attempts=2, base_delay=0), sleep=MagicMock())
+        session = SalesforceSession(retry_policy=policy)
+        with patch.object(requests.adapters.HTTPAdapter, 'send', return_value=make_response(503)) as mock_send:
+            response = session.request('GET', 'https://test.my.salesforce.com/services/data/v59.0/limits')
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(mock_send.call_count, 2)
+
+class TestRetriesInResults(unittest.TestCase):
+
+    def setUp(self):
+        self.processed_data = pd.DataFrame({
+            'Username': ['user1', 'user2'],
+            'ProfileID': ['prof1', 'prof1'],
+            'PermissionSetGroupIDs': [None, None],
+            'Queues': [None, None]
+        })
+        self.mapping = {'Username': 'Username'}
+
+    def test_rest_mode_reports_session_retries(self):
+        """Test that retries made by the HTTP session for a user end up in its Retries column."""
+        mock_sf = MagicMock()
+
+        def create(payload):
+            if payload['Username'] == 'user1':
+                # Stand in for two transient failures retried inside the session
+                note_retry()
+                note_retry()
+            return {'success': True, 'id': f"005_{payload['Username']}"}
+        mock_sf.User.create.side_effect = create
+
+        results_df = create_salesforce_users(mock_sf, self.processed_data, self.mapping, dry_run=False)
+
+        self.assertEqual(list(results_df['Retries']), [2, 0])
+
+    def test_collections_resubmit_records_rejected_with_lock_errors(self):
+        """Test that only the records that hit UNABLE_TO_LOCK_ROW are sent again, and counted."""
+        mock_sf = MagicMock()
+        mock_sf.session = SalesforceSession(retry_policy=RetryPolicy(sleep=MagicMock()))
+        mock_sf.restful.side_effect = [
+            [{'success': True, 'id': '005_a', 'errors': []},
+             {'success': False, 'errors': [{'statusCode': 'UNABLE_TO_LOCK_ROW', 'message': 'unable to obtain exclusive access'}]}],
+            [{'success': True, 'id': '005_b', 'errors': []}]
+        ]
+
+        results_df = create_salesforce_users(mock_sf, self.processed_data, self.mapping, dry_run=False, mode='collections')
+
+        self.assertEqual(mock_sf.restful.call_count, 2)
+        resubmitted = mock_sf.restful.call_args_list[1][1]['json']['records']
+        self.assertEqual([r['Username'] for r in resubmitted], ['user2'])
+        self.assertEqual(list(results_df['Status']), ['Success', 'Success'])
+        self.assertEqual(list(results_df['SalesforceId']), ['005_a', '005_b'])
+        self.assertEqual(list(results_df['Retries']), [0, 1])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,10 @@
 import unittest
-from unittest.mock import patch
+from unittest.mock import patch, MagicMock, ANY
 import configparser
+import os
+import stat
+import tempfile
+from simple_salesforce.exceptions import SalesforceExpiredSession
 from src.salesforce_client import SalesforceClient
 
 class TestSalesforceClient(unittest.TestCase):
@@ -21,7 +25,8 @@ class TestSalesforceClient(unittest.TestCase):
         mock_salesforce_class.assert_called_once_with(
             username='testuser',
             password='testpassword',
-            security_token='testtoken'
+            security_token='testtoken',
+            session=ANY
         )
 
     @patch('src.salesforce_client.Salesforce')
@@ -40,7 +45,8 @@ class TestSalesforceClient(unittest.TestCase):
         mock_salesforce_class.assert_called_once_with(
             username='testuser',
             consumer_key='testconsumerkey',
-            privatekey_file='path/to/key.pem'
+            privatekey_file='path/to/key.pem',
+            session=ANY
         )
 
     def test_invalid_config_missing_all(self):
@@ -84,8 +90,103 @@ class TestSalesforceClient(unittest.TestCase):
             username='testuser',
             password='testpassword',
             security_token='testtoken',
-            domain='test'
+            domain='test',
+            session=ANY
         )
 
+    @patch('src.salesforce_client.Salesforce')
+    def test_session_id_auth(self, mock_salesforce_class):
+        """Test that an existing session id and instance URL are used as-is, without logging in."""
+        config = configparser.ConfigParser()
+        config['salesforce_creds'] = {
+            'instance_url': 'https://localhost:8443',
+            'session_id': 'token123',
+            'session_cache': os.path.join(tempfile.gettempdir(), 'unused_sessions.json')
+        }
+
+        client = SalesforceClient(config)
+        client.connect()
+
+        self.assertEqual(client.auth_method, 'session')
+        self.assertIsNone(client.session_cache)
+        mock_salesforce_class.assert_called_once_with(
+            instance_url='https://localhost:8443',
+            session_id='token123',
+            session=ANY
+        )
+
+class TestSessionCache(unittest.TestCase):
+
+    def setUp(self):
+        self.test_dir = tempfile.TemporaryDirectory()
+        self.cache_path = os.path.join(self.test_dir.name, 'sessions', 'sessions.json')
+        self.config = configparser.ConfigParser()
+        self.config['salesforce_creds'] = {
+            'username': 'testuser',
+            'password': 'testpassword',
+            'security_token': 'testtoken',
+            'domain': 'test',
+            'session_cache': self.cache_path
+        }
+
+    def tearDown(self):
+        self.test_dir.cleanup()
+
+    def make_connection(self, session_id, instance='test.my.salesforce.com'):
+        sf = MagicMock()
+        sf.session_id = session_id
+        sf.sf_instance = instance
+        return sf
+
+    @patch('src.salesforce_client.Salesforce')
+    def test_session_is_reused_on_the_next_run(self, mock_salesforce_class):
+        """Test that a second client skips the login and reuses the cached session."""
+        mock_salesforce_class.side_effect = lambda **kwargs: self.make_connection(kwargs.get('session_id', 'session1'))
+
+        SalesforceClient(self.config).connect()
+        self.assertEqual(stat.S_IMODE(os.stat(self.cache_path).st_mode), 0o600)
+
+        mock_salesforce_class.reset_mock()
+        sf = SalesforceClient(self.config).connect()
+
+        mock_salesforce_class.assert_called_once_with(instance_url='https://test.my.salesforce.com', session_id='session1', session=ANY)
+        sf.restful.assert_called_once_with('')
+
+    @patch('src.salesforce_client.Salesforce')
+    def test_expired_cached_session_logs_in_again(self, mock_salesforce_class):
+        """Test that an invalid cached session falls back to a full login and refreshes the cache."""
+        logins = iter(['session1', 'session2'])
+
+        def connect(**kwargs):
+            if 'session_id' in kwargs:
+                sf = self.make_connection(kwargs['session_id'])
+                sf.restful.side_effect = SalesforceExpiredSession('url', 401, 'User', [{'errorCode': 'INVALID_SESSION_ID'}])
+                return sf
+            return self.make_connection(next(logins))
+        mock_salesforce_class.side_effect = connect
+
+        SalesforceClient(self.config).connect()
+        SalesforceClient(self.config).connect()
+
+        self.assertEqual(mock_salesforce_class.call_count, 3)
+        self.assertEqual(mock_salesforce_class.call_args, unittest.mock.call(
+            username='testuser', password='testpassword', security_token='testtoken', domain='test', session=ANY))
+        client = SalesforceClient(self.config)
+        self.assertEqual(client.session_cache.get(client.cache_key())['session_id'], 'session2')
+
+    @patch('src.salesforce_client.Salesforce')
+    def test_reused_session_reauthenticates_itself(self, mock_salesforce_class):
+        """Test that a reused session can log in again when Salesforce reports INVALID_SESSION_ID."""
+        logins = iter(['session1', 'session2'])
+        mock_salesforce_class.side_effect = lambda **kwargs: self.make_connection(kwargs.get('session_id') or next(logins))
+
+        SalesforceClient(self.config).connect()
+        client = SalesforceClient(self.config)
+        sf = client.connect()
+
+        # simple-salesforce calls this when a request fails with INVALID_SESSION_ID
+        self.assertEqual(sf._salesforce_login_partial(), ('session2', 'test.my.salesforce.com'))
+        self.assertEqual(client.session_cache.get(client.cache_key())['session_id'], 'session2')
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,97 @@
+import unittest
+from unittest.mock import MagicMock
+import threading
+import time
+from collections import Counter
+import pandas as pd
+from src.scheduler import plan_batches, schedule_create_users, ParentSlots, Batch
+
+class TestPlanBatches(unittest.TestCase):
+
+    def test_groups_by_role_and_queues_and_interleaves(self):
+        processed_data = pd.DataFrame({
+            'RoleID': ['r1', 'r2', 'r1', 'r1', None],
+            'Queues': ['Q1', 'Q2', 'Q1', 'Q1\nQ2', None]
+        })
+        batches = plan_batches(processed_data, batch_size=1)
+
+        self.assertEqual([batch.group for batch in batches],
+                         [('', ()), ('r1', ('Q1',)), ('r1', ('Q1', 'Q2')), ('r2', ('Q2',)), ('r1', ('Q1',))])
+        self.assertEqual([batch.rows for batch in batches], [[4], [0], [3], [1], [2]])
+        self.assertEqual(batches[2].parents, {('role', 'r1'), ('queue', 'Q1'), ('queue', 'Q2')})
+        self.assertEqual(batches[0].parents, frozenset())
+
+    def test_parent_slots_hold_back_conflicting_batches(self):
+        slots = ParentSlots([Batch('a', [0], {('role', 'r1')}), Batch('b', [1], {('role', 'r1')}), Batch('c', [2], {('role', 'r2')})])
+        first = slots.acquire()
+        self.assertEqual(slots.acquire().group, 'c')
+
+        acquired = []
+        waiter = threading.Thread(target=lambda: acquired.append(slots.acquire()))
+        waiter.start()
+        waiter.join(0.1)
+        self.assertEqual(acquired, [])
+        slots.release(first)
+        waiter.join(1)
+        self.assertEqual(acquired[0].group, 'b')
+        self.assertIsNone(slots.acquire())
+
+class TestScheduleCreateUsers(unittest.TestCase):
+
+    def setUp(self):
+        self.running = Counter()
+        self.max_running = Counter()
+        self.lock = threading.Lock()
+        self.mock_sf = MagicMock()
+        self.mock_sf.restful.side_effect = self.post_collection
+        self.processed_data = pd.DataFrame({
+            'Username': [f'user{i}' for i in range(12)],
+            'RoleID': ['r1', 'r2', 'r3'] * 4,
+            'Queues': [None] * 12,
+            'EnableSSO': [False] * 12
+        })
+
+    def post_collection(self, path, method, json):
+        roles = {record['UserRoleId'] for record in json['records']}
+        with self.lock:
+            self.running.update(roles)
+            for role in roles:
+                self.max_running[role] = max(self.max_running[role], self.running[role])
+        time.sleep(0.02)
+        with self.lock:
+            self.running.subtract(roles)
+        return [{'id': None, 'success': False, 'errors': [{'statusCode': 'UNABLE_TO_LOCK_ROW', 'message': 'locked'}]}
+                if record['UserRoleId'] == 'r3' else {'id': f"005_{record['Username']}", 'success': True, 'errors': []}
+                for record in json['records']]
+
+    def test_one_batch_per_role_at_a_time(self):
+        """Test that batches under the same role never overlap, and that lock errors are reported per group."""
+        results_df, report_df = schedule_create_users(self.mock_sf, self.processed_data, {'Username': 'Username'}, dry_run=False,
+                                                      batch_size=2, concurrency=4, queue_ids={})
+
+        self.assertEqual(dict(self.max_running), {'r1': 1, 'r2': 1, 'r3': 1})
+        self.assertEqual(list(results_df['Username']), list(self.processed_data['Username']))
+        self.assertEqual(list(results_df['Status'][:3]), ['Success', 'Success', 'Failed'])
+
+        report = report_df.set_index('RoleID')
+        self.assertEqual(list(report['Batches']), [2, 2, 2])
+        self.assertEqual(report.loc['r3', 'LockErrors'], 4)
+        self.assertEqual(report.loc['r3', 'LockErrorRate'], 1.0)
+        self.assertEqual(report.loc['r1', 'LockErrors'], 0)
+        self.assertGreater(report.loc['r1', 'UsersPerSecond'], 0)
+
+    def test_queues_are_looked_up_once(self):
+        """Test that the queues are queried once for the whole run, not once per batch."""
+        self.processed_data['Queues'] = 'Queue1'
+        self.mock_sf.query_all.return_value = {'records': [{'Name': 'Queue1', 'Id': 'q1_id'}]}
+
+        schedule_create_users(self.mock_sf, self.processed_data, {'Username': 'Username'}, dry_run=False, batch_size=2)
+
+        self.mock_sf.query_all.assert_called_once()
+
+    def test_bulk_mode_is_not_scheduled(self):
+        with self.assertRaises(ValueError):
+            schedule_create_users(self.mock_sf, self.processed_data, {}, mode='bulk')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+import unittest
+import configparser
+import os
+import tempfile
+import pandas as pd
+from src.fake_org import FakeOrg
+from src.fake_salesforce import FakeSalesforce, FakeSalesforceServer, CRYPTOGRAPHY_AVAILABLE
+from src.salesforce_client import SalesforceClient
+from src.sharding import assign_shards, create_users_in_shards, worker_sections
+
+class TestAssignShards(unittest.TestCase):
+
+    def test_roles_stay_together_and_shards_are_balanced(self):
+        processed_data = pd.DataFrame({'RoleID': ['r1'] * 4 + ['r2'] * 3 + ['r3'] * 2 + [None] * 3})
+        positions = assign_shards(processed_data, 2)
+
+        shard_roles = [set(processed_data['RoleID'].iloc[rows].dropna()) for rows in positions]
+        self.assertEqual(shard_roles, [{'r1'}, {'r2', 'r3'}])
+        self.assertEqual([len(rows) for rows in positions], [6, 6])
+        self.assertEqual(sorted(p for rows in positions for p in rows), list(range(12)))
+        self.assertTrue(all(list(rows) == sorted(rows) for rows in positions))
+
+    def test_without_roles(self):
+        positions = assign_shards(pd.DataFrame({'Username': ['a', 'b', 'c']}), 2)
+        self.assertEqual([list(rows) for rows in positions], [[0, 1], [2]])
+        with self.assertRaises(ValueError):
+            assign_shards(pd.DataFrame({'RoleID': ['r1']}), 0)
+
+@unittest.skipUnless(CRYPTOGRAPHY_AVAILABLE, "needs the cryptography package for a self-signed certificate")
+class TestCreateUsersInShards(unittest.TestCase):
+
+    def setUp(self):
+        self.org = FakeOrg()
+        self.server = FakeSalesforceServer(FakeSalesforce(self.org)).start()
+        self.config = configparser.ConfigParser()
+        self.config['salesforce_creds'] = {'instance_url': self.server.instance_url, 'session_id': self.server.app.session_id}
+        self.config['http'] = {'ca_bundle': self.server.ca_bundle}
+        self.test_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.server.stop()
+        self.test_dir.cleanup()
+
+    def test_workers_create_their_shards_and_results_are_merged(self):
+        """Test that each worker creates its users through its own session and results come back in input order."""
+        processed_data = pd.DataFrame({
+            'Username': [f'user{i}@norc.org' for i in range(6)],
+            'LastName': ['User'] * 6,
+            'Email': [f'user{i}@norc.org' for i in range(5)] + [None],
+            'RoleID': ['r1', 'r2', 'r1', 'r2', 'r1', 'r2'],
+            'EnableSSO': [False] * 6
+        })
+        sf = SalesforceClient(self.config).connect()
+        mapping = {'Username': 'Username', 'LastName': 'LastName', 'Email': 'Email'}
+        log_prefix = os.path.join(self.test_dir.name, 'results.csv')
+
+        results = create_users_in_shards(sf, self.config, processed_data, mapping, 2, log_prefix, dry_run=False, queue_ids={},
+                                         mode='collections')
+
+        self.assertEqual(list(results['Username']), list(processed_data['Username']))
+        self.assertEqual(list(results['Status']), ['Success'] * 5 + ['Failed'])
+        self.assertEqual(self.org.count('User'), 5)
+        roles = {user['UserRoleId'] for user in self.org.query("SELECT UserRoleId FROM User")}
+        self.assertEqual(roles, {'r1', 'r2'})
+        self.assertTrue(os.path.isfile(f"{log_prefix}.shard1.log"))
+        self.assertTrue(os.path.isfile(f"{log_prefix}.shard2.log"))
+        # The workers' calls count towards the parent connection's API usage
+        self.assertGreaterEqual(sf.session.usage.worker_calls, 2)
+
+    def test_crashed_shard_reports_unknown_outcome(self):
+        """Test that the users of a shard that stopped without results are failed with a pointer to --resume."""
+        processed_data = pd.DataFrame({'Username': ['user0@norc.org'], 'LastName': ['User'], 'EnableSSO': [False]})
+        sf = SalesforceClient(self.config).connect()
+        log_prefix = os.path.join(self.test_dir.name, 'results.csv')
+
+        # An unknown mode makes the worker raise
+        results = create_users_in_shards(sf, self.config, processed_data, {'Username': 'Username'}, 2, log_prefix,
+                                         dry_run=False, queue_ids={}, journal_path=f"{log_prefix}.journal.sqlite",
+                                         mode='unknown')
+
+        self.assertEqual(list(results['Status']), ['Failed'])
+        self.assertIn('the outcome of its users is unknown', results.iloc[0]['Error'])
+        self.assertIn('--resume', results.iloc[0]['Error'])
+
+    def test_workers_reuse_the_session_but_can_log_in_again(self):
+        """Test that workers keep the login credentials and start from the parent's session through a session cache."""
+        password_config = configparser.ConfigParser()
+        password_config.read_dict({
+            'salesforce_creds': {'username': 'admin@norc.org', 'password': 'secret', 'security_token': 'token',
+                                 'instance_url': self.server.instance_url},
+            'http': {'ca_bundle': self.server.ca_bundle}
+        })
+        sf = SalesforceClient(self.config).connect()
+
+        sections = worker_sections(sf, password_config, os.path.join(self.test_dir.name, 'sessions.json'))
+        worker_config = configparser.ConfigParser()
+        worker_config.read_dict(sections)
+        worker_client = SalesforceClient(worker_config)
+        worker_sf = worker_client.connect()
+
+        self.assertEqual(sections['salesforce_creds']['password'], 'secret')
+        self.assertEqual(worker_sf.session_id, sf.session_id)
+        # An expired session is renewed with the worker's own login
+        self.assertEqual(worker_sf._salesforce_login_partial, worker_client._login)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,50 @@
+import unittest
+from unittest.mock import MagicMock
+from src.soql import escape_soql, build_in_clauses, query_in_chunks
+
+class TestSoql(unittest.TestCase):
+
+    def test_escape_soql(self):
+        """Test that quotes and backslashes cannot break out of a string literal."""
+        self.assertEqual(escape_soql("O'Brien"), "O\\'Brien")
+        self.assertEqual(escape_soql('back\\slash'), 'back\\\\slash')
+        self.assertEqual(escape_soql('line\nbreak'), 'line\\nbreak')
+
+    def test_build_in_clauses_splits_by_size(self):
+        """Test that values are split into clauses no longer than max_chars."""
+        values = [f"user{i:03d}@example.com" for i in range(100)]
+        clauses = build_in_clauses(values, max_chars=200)
+
+        self.assertGreater(len(clauses), 1)
+        self.assertTrue(all(len(clause) <= 200 for clause in clauses))
+        rebuilt = [v.strip("'") for clause in clauses for v in clause.strip('()').split(',')]
+        self.assertEqual(rebuilt, values)
+
+    def test_build_in_clauses_dedupes_and_escapes(self):
+        """Test that duplicate values are dropped and quotes escaped."""
+        self.assertEqual(build_in_clauses(["a", "O'Neil", "a"]), ["('a','O\\'Neil')"])
+        self.assertEqual(build_in_clauses([]), [])
+
+    def test_query_in_chunks_merges_records(self):
+        """Test that every chunk is queried and the records merged in chunk order."""
+        mock_sf = MagicMock()
+        mock_sf.query_all.side_effect = lambda query: {
+            'records': [{'Id': v.strip("'")} for v in query.split('IN ')[1].strip('()').split(',')]
+        }
+        values = [f"005{i:012d}" for i in range(50)]
+
+        result = query_in_chunks(mock_sf, "SELECT Id FROM User WHERE Id IN {in_clause}", values, max_chars=100)
+
+        self.assertGreater(mock_sf.query_all.call_count, 1)
+        self.assertEqual([r['Id'] for r in result['records']], values)
+        self.assertEqual(result['totalSize'], 50)
+
+    def test_query_in_chunks_with_no_values(self):
+        """Test that no query is sent when there is nothing to match."""
+        mock_sf = MagicMock()
+        result = query_in_chunks(mock_sf, "SELECT Id FROM User WHERE Id IN {in_clause}", [])
+        mock_sf.query_all.assert_not_called()
+        self.assertEqual(result['records'], [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+import unittest
+from unittest.mock import MagicMock
+import os
+import tempfile
+import pandas as pd
+from src.streaming import stream_create_users, iter_csv_chunks
+
+class TestStreamCreateUsers(unittest.TestCase):
+
+    def setUp(self):
+        self.mock_sf = MagicMock()
+        self.mock_sf.query_all.return_value = {'records': [{'Name': 'Queue1', 'Id': 'q1_id'}]}
+        self.mock_sf.User.create.side_effect = lambda payload: {'success': True, 'id': f"005_{payload['Username']}"}
+        self.persona_df = pd.DataFrame({
+            'Persona Name': ['Rep'], 'Queues': ['Queue1'], 'Profile ID (Training)': ['prof1'], 'Role ID (Training)': ['role1'],
+            'Permission Set Group IDs (Training)': [None], 'Contact Center Training': [None]
+        })
+        self.sso_df = pd.DataFrame({'Email (employee ID version)': ['002@norc.org']})
+        self.preflight_df = pd.DataFrame({
+            'Email (employee ID version)': ['001@norc.org', '002@norc.org', '003@norc.org', '004@norc.org', '005@norc.org'],
+            'Username': ['user1', 'user2', 'user3', 'user4', 'user5'],
+            'LastName': ['One', 'Two', 'Three', 'Four', 'Five'],
+            'Persona Name': ['Rep'] * 5,
+            'Action': ['Create New User', 'Create New User', 'Skip - Duplicate', 'Create New User', 'Create New User']
+        })
+        self.test_dir = tempfile.TemporaryDirectory()
+        self.output_path = os.path.join(self.test_dir.name, 'results.csv')
+
+    def tearDown(self):
+        self.test_dir.cleanup()
+
+    def test_results_are_appended_chunk_by_chunk(self):
+        """Test that each chunk's results are on disk before the next chunk is read."""
+        rows_on_disk = []
+
+        def chunks():
+            for start in range(0, len(self.preflight_df), 2):
+                rows_on_disk.append(len(pd.read_csv(self.output_path)) if os.path.getsize(self.output_path) else 0)
+                yield self.preflight_df.iloc[start:start + 2]
+
+        statuses = stream_create_users(self.mock_sf, chunks(), self.persona_df, self.sso_df, {'Username': 'Username', 'LastName': 'LastName'},
+                                       self.output_path, dry_run=False)
+
+        self.assertEqual(rows_on_disk, [0, 2, 3])
+        self.assertEqual(statuses, {'Success': 4})
+        results_df = pd.read_csv(self.output_path)
+        self.assertEqual(list(results_df['Username']), ['user1', 'user2', 'user4', 'user5'])
+        self.assertEqual(list(results_df['SalesforceId']), ['005_user1', '005_user2', '005_user4', '005_user5'])
+        # Queues are looked up once for the whole run
+        self.assertEqual(self.mock_sf.query_all.call_count, 1)
+
+    def test_csv_chunks(self):
+        input_path = os.path.join(self.test_dir.name, 'preflight.csv')
+        self.preflight_df.to_csv(input_path, index=False)
+        self.assertEqual([len(chunk) for chunk in iter_csv_chunks(input_path, 2)], [2, 2, 1])
+
+        statuses = stream_create_users(self.mock_sf, iter_csv_chunks(input_path, 3), self.persona_df, self.sso_df,
+                                       {'Username': 'Username'}, self.output_path, dry_run=True)
+        self.assertEqual(statuses, {'Dry Run - Not Created': 4})
+        self.assertEqual(pd.read_csv(self.output_path).index.size, 4)
+
+    def test_no_users_leaves_no_output(self):
+        chunks = [self.preflight_df[self.preflight_df['Action'] != 'Create New User']]
+        statuses = stream_create_users(self.mock_sf, chunks, self.persona_df, self.sso_df, {'Username': 'Username'}, self.output_path)
+        self.assertFalse(statuses)
+        self.assertFalse(os.path.exists(self.output_path))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,45 @@
+import unittest
+import os
+import tempfile
+import pandas as pd
+from src.data_processor import process_dataframes
+from src.synthetic_data import generate_workbook_frames, write_workbook_frames, read_workbook_frames, queue_names
+from src.workbook_loader import TEMPLATE_SHEET, PERSONA_SHEET, SSO_SHEET
+
+class TestSyntheticData(unittest.TestCase):
+
+    def test_same_seed_gives_same_data(self):
+        first = generate_workbook_frames(200, seed=3)
+        second = generate_workbook_frames(200, seed=3)
+        other = generate_workbook_frames(200, seed=4)
+        for sheet_name in first:
+            pd.testing.assert_frame_equal(first[sheet_name], second[sheet_name])
+        self.assertFalse(first[TEMPLATE_SHEET].equals(other[TEMPLATE_SHEET]))
+
+    def test_frames_process_like_a_real_workbook(self):
+        """Test that every generated user resolves to a persona, with unique usernames and Salesforce-shaped Ids."""
+        frames = generate_workbook_frames(500, personas=10, queues=4, sso_fraction=0.1)
+        self.assertEqual(len(frames[SSO_SHEET]), 50)
+        self.assertTrue(frames[TEMPLATE_SHEET]['Username'].is_unique)
+
+        processed = process_dataframes(frames[TEMPLATE_SHEET], frames[PERSONA_SHEET], frames[SSO_SHEET], 'QA2')
+        self.assertEqual(len(processed), 500)
+        self.assertEqual(processed['ProfileID'].str.len().unique().tolist(), [18])
+        self.assertEqual(processed['EnableSSO'].sum(), 50)
+        queues = set('\n'.join(frames[PERSONA_SHEET]['Queues']).split('\n'))
+        self.assertLessEqual(queues, set(queue_names(4)))
+
+    def test_round_trip_through_csv_and_xlsx(self):
+        frames = generate_workbook_frames(20)
+        with tempfile.TemporaryDirectory() as tmp:
+            for fmt, path in (('csv', os.path.join(tmp, 'csv')), ('xlsx', os.path.join(tmp, 'data.xlsx'))):
+                write_workbook_frames(frames, path, fmt)
+                read = read_workbook_frames(path, fmt)
+                self.assertEqual(list(read), [TEMPLATE_SHEET, PERSONA_SHEET, SSO_SHEET])
+                self.assertEqual(list(read[TEMPLATE_SHEET]['Username']), list(frames[TEMPLATE_SHEET]['Username']))
+
+        with self.assertRaises(ValueError):
+            write_workbook_frames(frames, 'unused', 'json')
+
+if __name__ == '__main__':
+    unittest.main()
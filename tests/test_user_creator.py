@@ -0,0 +1,280 @@
+import unittest
+from unittest.mock import MagicMock
+import threading
+import time
+import pandas as pd
+from src.user_creator import create_salesforce_users, build_user_payloads
+
+class TestBuildUserPayloads(unittest.TestCase):
+
+    def test_overrides_and_sso(self):
+        """Test that ProfileID/RoleID overrides and the SSO FederationIdentifier fallback apply per row."""
+        processed_data = pd.DataFrame({
+            'Username': ['user1', 'user2', 'user3'],
+            'ProfileId': ['mapped_prof', 'mapped_prof', 'mapped_prof'],
+            'ProfileID': ['prof1', None, 'prof3'],
+            'RoleID': [None, 'role2', 'role3'],
+            'FederationIdentifier': ['fed1', 'fed2', None],
+            'EnableSSO': [True, False, True]
+        })
+
+        payloads = build_user_payloads(processed_data, {'Username': 'Username', 'ProfileId': 'ProfileId'})
+
+        self.assertEqual(payloads, [
+            {'Username': 'user1', 'ProfileId': 'prof1', 'FederationIdentifier': 'fed1'},
+            {'Username': 'user2', 'ProfileId': 'mapped_prof', 'UserRoleId': 'role2'},
+            {'Username': 'user3', 'ProfileId': 'prof3', 'UserRoleId': 'role3'}
+        ])
+
+class TestCollectionsMode(unittest.TestCase):
+
+    def setUp(self):
+        """Set up a mock connection and three processed users."""
+        self.mock_sf = MagicMock()
+        self.mock_sf.query_all.return_value = {'records': [{'Name': 'Queue1', 'Id': 'q1_id'}]}
+        self.processed_data = pd.DataFrame({
+            'Username': ['user1', 'user2', 'user3'],
+            'FirstName': ['One', 'Two', 'Three'],
+            'ProfileID': ['prof1', 'prof1', 'prof2'],
+            'RoleID': ['role1', None, 'role2'],
+            'PermissionSetGroupIDs': ['psg1', None, 'psg2;psg3'],
+            'Queues': ['Queue1', None, None],
+            'EnableSSO': [False, False, False]
+        })
+        self.mapping = {'Username': 'Username', 'FirstName': 'FirstName'}
+
+    def test_results_are_mapped_back_per_record(self):
+        """Test that each collections result lands on the matching user's result row."""
+        self.mock_sf.restful.side_effect = [
+            [
+                {'id': '005_1', 'success': True, 'errors': []},
+                {'id': None, 'success': False, 'errors': [{'statusCode': 'DUPLICATE_USERNAME', 'message': 'Duplicate Username.'}]},
+                {'id': '005_3', 'success': True, 'errors': []}
+            ],
+            [{'id': f"0Pa_{i}", 'success': True, 'errors': []} for i in range(4)]
+        ]
+
+        results_df = create_salesforce_users(self.mock_sf, self.processed_data, self.mapping, dry_run=False, mode='collections')
+
+        self.assertEqual(self.mock_sf.restful.call_count, 2)
+        self.mock_sf.User.create.assert_not_called()
+        request_body = self.mock_sf.restful.call_args_list[0][1]['json']
+        self.assertFalse(request_body['allOrNone'])
+        self.assertEqual(len(request_body['records']), 3)
+        self.assertEqual(request_body['records'][0]['attributes'], {'type': 'User'})
+        self.assertEqual(request_body['records'][0]['ProfileId'], 'prof1')
+        self.assertNotIn('UserRoleId', request_body['records'][1])
+
+        self.assertEqual(list(results_df['Status']), ['Success', 'Failed', 'Success'])
+        self.assertEqual(results_df.iloc[0]['SalesforceId'], '005_1')
+        self.assertIn('DUPLICATE_USERNAME', results_df.iloc[1]['Error'])
+        self.assertEqual(results_df.iloc[2]['SalesforceId'], '005_3')
+
+        # Assignments for both created users go out in a single collections request
+        assignment_records = self.mock_sf.restful.call_args_list[1][1]['json']['records']
+        self.assertEqual(len(assignment_records), 4)
+        self.assertIn({'attributes': {'type': 'GroupMember'}, 'GroupId': 'q1_id', 'UserOrGroupId': '005_1'}, assignment_records)
+        self.mock_sf.PermissionSetAssignment.create.assert_not_called()
+        self.mock_sf.GroupMember.create.assert_not_called()
+
+    def test_batches_respect_batch_size(self):
+        """Test that users are split into requests of at most batch_size records."""
+        self.mock_sf.restful.side_effect = lambda path, method, json: [
+            {'id': f"005_{r.get('Username')}", 'success': True, 'errors': []} for r in json['records']
+        ]
+
+        results_df = create_salesforce_users(self.mock_sf, self.processed_data, self.mapping, dry_run=False, mode='collections', batch_size=2)
+
+        # Two User batches, then one assignment batch
+        self.assertEqual(self.mock_sf.restful.call_count, 3)
+        self.assertEqual(list(results_df['SalesforceId']), ['005_user1', '005_user2', '005_user3'])
+
+    def test_failed_request_fails_whole_batch(self):
+        """Test that a request-level error marks every user in that batch as failed."""
+        self.mock_sf.restful.side_effect = Exception("Connection reset")
+
+        results_df = create_salesforce_users(self.mock_sf, self.processed_data, self.mapping, dry_run=False, mode='collections')
+
+        self.assertTrue((results_df['Status'] == 'Failed').all())
+        self.assertTrue((results_df['Error'] == 'Connection reset').all())
+
+    def test_partial_assignment_failures_are_attributed(self):
+        """Test that failed junction records end up in the right user's AssignmentErrors."""
+        def respond(path, method, json):
+            records = json['records']
+            if records[0]['attributes']['type'] == 'User':
+                return [{'id': f"005_{r['Username']}", 'success': True, 'errors': []} for r in records]
+            return [
+                {'success': r.get('PermissionSetGroupId') != 'psg3',
+                 'errors': [] if r.get('PermissionSetGroupId') != 'psg3' else [{'statusCode': 'INVALID_CROSS_REFERENCE_KEY', 'message': 'invalid id'}]}
+                for r in records
+            ]
+        self.mock_sf.restful.side_effect = respond
+        self.processed_data.loc[1, 'Queues'] = 'Missing Queue'
+
+        results_df = create_salesforce_users(self.mock_sf, self.processed_data, self.mapping, dry_run=False, mode='collections')
+
+        self.assertEqual(list(results_df['Status']), ['Success', 'Success with errors', 'Success with errors'])
+        self.assertEqual(results_df.iloc[1]['AssignmentErrors'], "Queue 'Missing Queue' not found.")
+        self.assertEqual(results_df.iloc[2]['AssignmentErrors'], 'Failed to assign PSG psg3: INVALID_CROSS_REFERENCE_KEY: invalid id')
+
+    def test_invalid_batch_size(self):
+        """Test that a batch size above the collections limit is rejected."""
+        with self.assertRaises(ValueError):
+            create_salesforce_users(self.mock_sf, self.processed_data, self.mapping, dry_run=False, mode='collections', batch_size=201)
+
+    def test_upsert_by_external_id(self):
+        """Test that an upsert PATCHes by the external ID and reports what each user's row did."""
+        self.processed_data['FederationIdentifier'] = ['fed1', 'fed2', 'fed1']
+        self.mapping['FederationIdentifier'] = 'FederationIdentifier'
+        def respond(path, method, json):
+            records = json['records']
+            if records[0]['attributes']['type'] == 'User':
+                return [{'id': '005_1', 'success': True, 'errors': [], 'created': False},
+                        {'id': '005_2', 'success': True, 'errors': [], 'created': True}]
+            # user1 already has its queue; user1's PSG is new
+            return [{'success': r.get('GroupId') is None,
+                     'errors': [] if r.get('GroupId') is None else [{'statusCode': 'DUPLICATE_VALUE', 'message': 'duplicate value found'}]}
+                    for r in records]
+        self.mock_sf.restful.side_effect = respond
+
+        results_df = create_salesforce_users(self.mock_sf, self.processed_data, self.mapping, dry_run=False,
+                                             mode='collections', upsert_field='FederationIdentifier')
+
+        path = self.mock_sf.restful.call_args_list[0][0][0]
+        self.assertEqual(path, 'composite/sobjects/User/FederationIdentifier')
+        self.assertEqual(self.mock_sf.restful.call_args_list[0][1]['method'], 'PATCH')
+        self.assertEqual(len(self.mock_sf.restful.call_args_list[0][1]['json']['records']), 2)
+        self.assertEqual(list(results_df['Operation']), ['Updated', 'Created', 'Failed'])
+        self.assertEqual(list(results_df['Status']), ['Success', 'Success', 'Failed'])
+        self.assertEqual(results_df.iloc[2]['Error'], "Duplicate FederationIdentifier 'fed1' in input.")
+
+    def test_upsert_requires_a_supported_mode(self):
+        """Test that upserting is refused in modes that can only insert."""
+        with self.assertRaises(ValueError):
+            create_salesforce_users(self.mock_sf, self.processed_data, self.mapping, dry_run=False, mode='graph',
+                                    upsert_field='FederationIdentifier')
+
+class TestGraphMode(unittest.TestCase):
+
+    def setUp(self):
+        """Set up a mock connection and two users with assignments."""
+        self.mock_sf = MagicMock()
+        self.mock_sf.sf_version = '59.0'
+        self.mock_sf.query_all.return_value = {'records': [{'Name': 'Queue1', 'Id': 'q1_id'}]}
+        self.processed_data = pd.DataFrame({
+            'Username': ['user0', 'user1'],
+            'PermissionSetGroupIDs': ['psg1', 'psg2'],
+            'Queues': ['Queue1', None]
+        })
+
+    def test_graph_request_references_new_user(self):
+        """Test that each user and its assignments go into one graph linked by @{ref.id}."""
+        self.mock_sf.restful.return_value = {'graphs': [
+            {'graphId': 'graph0', 'isSuccessful': True, 'graphResponse': {'compositeResponse': [
+                {'referenceId': 'user0', 'httpStatusCode': 201, 'body': {'id': '005_0', 'success': True}}]}},
+            {'graphId': 'graph1', 'isSuccessful': False, 'graphResponse': {'compositeResponse': [
+                {'referenceId': 'user1', 'httpStatusCode': 400, 'body': [{'errorCode': 'PROCESSING_HALTED', 'message': 'halted'}]},
+                {'referenceId': 'user1_access0', 'httpStatusCode': 400,
+                 'body': [{'errorCode': 'INVALID_CROSS_REFERENCE_KEY', 'message': 'invalid psg'}]}]}}
+        ]}
+
+        results_df = create_salesforce_users(self.mock_sf, self.processed_data, {'Username': 'Username'},
+                                             dry_run=False, mode='graph')
+
+        self.mock_sf.restful.assert_called_once()
+        self.assertEqual(self.mock_sf.restful.call_args[0][0], 'composite/graph')
+        graphs = self.mock_sf.restful.call_args[1]['json']['graphs']
+        self.assertEqual(len(graphs), 2)
+        nodes = graphs[0]['compositeRequest']
+        self.assertEqual(nodes[0]['url'], '/services/data/v59.0/sobjects/User')
+        self.assertEqual(nodes[1]['body'], {'AssigneeId': '@{user0.id}', 'PermissionSetGroupId': 'psg1'})
+        self.assertEqual(nodes[2]['body'], {'GroupId': 'q1_id', 'UserOrGroupId': '@{user0.id}'})
+
+        self.assertEqual(list(results_df['Status']), ['Success', 'Failed'])
+        self.assertEqual(results_df.iloc[0]['SalesforceId'], '005_0')
+        self.assertEqual(results_df.iloc[1]['Error'], 'User creation rolled back: INVALID_CROSS_REFERENCE_KEY: invalid psg')
+        self.mock_sf.User.create.assert_not_called()
+
+    def test_users_share_a_graph(self):
+        """Test that graph_size groups several users into one all-or-nothing graph."""
+        self.mock_sf.restful.return_value = {'graphs': [
+            {'graphId': 'graph0', 'isSuccessful': False, 'graphResponse': {'compositeResponse': [
+                {'referenceId': 'user0', 'httpStatusCode': 400, 'body': [{'errorCode': 'DUPLICATE_USERNAME', 'message': 'dup'}]}]}}
+        ]}
+
+        results_df = create_salesforce_users(self.mock_sf, self.processed_data, {'Username': 'Username'},
+                                             dry_run=False, mode='graph', graph_size=2)
+
+        graphs = self.mock_sf.restful.call_args[1]['json']['graphs']
+        self.assertEqual(len(graphs), 1)
+        self.assertEqual(len(graphs[0]['compositeRequest']), 5)
+        self.assertTrue((results_df['Status'] == 'Failed').all())
+        self.assertIn('another user in the same graph failed: DUPLICATE_USERNAME', results_df.iloc[1]['Error'])
+
+    def test_graphs_stay_within_node_limit(self):
+        """Test that a graph is split when its users' assignments would exceed the node limit."""
+        psgs = lambda count: ';'.join(f"psg{i}" for i in range(count))
+        processed_data = pd.DataFrame({
+            'Username': ['user0', 'user1', 'user2', 'user3'],
+            'PermissionSetGroupIDs': [psgs(200), psgs(200), psgs(200), psgs(500)],
+            'Queues': [None] * 4
+        })
+        self.mock_sf.restful.return_value = {'graphs': []}
+
+        results_df = create_salesforce_users(self.mock_sf, processed_data, {'Username': 'Username'},
+                                             dry_run=False, mode='graph', graph_size=4)
+
+        graph_nodes = [len(graph['compositeRequest']) for call in self.mock_sf.restful.call_args_list
+                       for graph in call[1]['json']['graphs']]
+        self.assertEqual(graph_nodes, [402, 201])
+        self.assertIn('Too many assignments for one Composite Graph', results_df.iloc[3]['Error'])
+
+class TestConcurrentMode(unittest.TestCase):
+
+    def setUp(self):
+        """Set up a mock connection whose User inserts take a little time."""
+        self.mock_sf = MagicMock()
+        self.mock_sf.query_all.return_value = {'records': []}
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+        def slow_create(payload):
+            with self.lock:
+                self.in_flight += 1
+                self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            time.sleep(0.02)
+            with self.lock:
+                self.in_flight -= 1
+            if payload['Username'] == 'user3':
+                return {'success': False, 'errors': ['DUPLICATE_USERNAME']}
+            return {'success': True, 'id': f"005_{payload['Username']}"}
+
+        self.mock_sf.User.create.side_effect = slow_create
+        self.processed_data = pd.DataFrame({
+            'Username': [f"user{i}" for i in range(8)],
+            'PermissionSetGroupIDs': ['psg1'] * 8,
+            'Queues': [None] * 8
+        })
+
+    def test_concurrent_results_keep_input_order(self):
+        """Test that concurrent provisioning stays bounded and returns rows in input order."""
+        results_df = create_salesforce_users(self.mock_sf, self.processed_data, {'Username': 'Username'},
+                                             dry_run=False, concurrency=4)
+
+        self.assertLessEqual(self.max_in_flight, 4)
+        self.assertGreater(self.max_in_flight, 1)
+        self.assertEqual(list(results_df['Username']), [f"user{i}" for i in range(8)])
+        self.assertEqual(results_df.iloc[3]['Status'], 'Failed')
+        self.assertIn('DUPLICATE_USERNAME', results_df.iloc[3]['Error'])
+        self.assertEqual(results_df.iloc[5]['SalesforceId'], '005_user5')
+        self.assertEqual(self.mock_sf.PermissionSetAssignment.create.call_count, 7)
+
+    def test_concurrency_requires_rest_mode(self):
+        """Test that concurrency cannot be combined with batched modes."""
+        with self.assertRaises(ValueError):
+            create_salesforce_users(self.mock_sf, self.processed_data, {}, dry_run=False, mode='collections', concurrency=2)
+
+if __name__ == '__main__':
+    unittest.main()
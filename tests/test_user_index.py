@@ -0,0 +1,82 @@
+import unittest
+from unittest.mock import MagicMock
+import os
+import tempfile
+import pandas as pd
+from src.user_index import UserIndex
+from src.preflight import run_duplicate_check
+
+def user_record(user_id, email, username, modstamp, is_active=True):
+    return {'attributes': {}, 'Id': user_id, 'Email': email, 'Username': username, 'FederationIdentifier': None,
+            'Alias': user_id[-4:], 'IsActive': is_active, 'SystemModstamp': modstamp}
+
+class TestUserIndex(unittest.TestCase):
+
+    def setUp(self):
+        """Set up an index in a temporary directory."""
+        self.test_dir = tempfile.TemporaryDirectory()
+        self.index = UserIndex(os.path.join(self.test_dir.name, 'users.sqlite'))
+        self.mock_sf = MagicMock()
+
+    def tearDown(self):
+        """Close the index and clean up."""
+        self.index.close()
+        self.test_dir.cleanup()
+
+    def test_incremental_sync(self):
+        """Test that the first sync is full and later syncs only ask for changed users."""
+        self.mock_sf.query_all.return_value = {'records': [
+            user_record('005_1', 'one@norc.org', 'one@norc.org@test.com', '2025-01-01T10:00:00.000+0000'),
+            user_record('005_2', 'two@norc.org', 'two@norc.org@test.com', '2025-01-02T10:00:00.000+0000')
+        ]}
+        self.index.sync(self.mock_sf)
+
+        self.assertNotIn('WHERE', self.mock_sf.query_all.call_args[0][0])
+        self.assertEqual(self.index.last_sync, '2025-01-02T10:00:00.000+0000')
+
+        # user 2 is deactivated and its email changes
+        self.mock_sf.query_all.return_value = {'records': [
+            user_record('005_2', 'two.new@norc.org', 'two@norc.org@test.com', '2025-01-03T08:00:00.000+0000', is_active=False)
+        ]}
+        self.index.sync(self.mock_sf)
+
+        self.assertIn('WHERE SystemModstamp >= 2025-01-02T10:00:00Z', self.mock_sf.query_all.call_args[0][0])
+        self.assertEqual(self.index.user_count(), 2)
+        self.assertEqual(self.index.find_matches(['two@norc.org']), [])
+        matches = self.index.find_matches(['TWO.NEW@norc.org'])
+        self.assertEqual(len(matches), 1)
+        self.assertFalse(matches[0]['IsActive'])
+
+    def test_find_matches_checks_email_and_username(self):
+        """Test that a value matches either an Email or a Username, ignoring case."""
+        self.mock_sf.query_all.return_value = {'records': [
+            user_record('005_1', 'one@norc.org', 'one@norc.org@test.com', '2025-01-01T10:00:00.000+0000')
+        ]}
+        self.index.sync(self.mock_sf)
+
+        self.assertEqual(len(self.index.find_matches(['One@Norc.org'])), 1)
+        self.assertEqual(len(self.index.find_matches(['one@norc.org@TEST.com'])), 1)
+        self.assertEqual(self.index.find_matches(['nobody@norc.org']), [])
+
+    def test_duplicate_check_uses_index(self):
+        """Test that run_duplicate_check answers from the index after a delta sync."""
+        self.mock_sf.query_all.return_value = {'records': [
+            user_record('005_1', 'Brunt-Kelli@norc.org', 'Brunt-Kelli@norc.org@test.com', '2025-01-01T10:00:00.000+0000')
+        ]}
+        self.index.sync(self.mock_sf)
+        self.mock_sf.query_all.reset_mock()
+        self.mock_sf.query_all.return_value = {'records': []}
+
+        users_df = pd.DataFrame({
+            'Email (name version)': ['Brunt-Kelli@norc.org', 'Cooper-Tina@norc.org'],
+            'Username': ['Brunt-Kelli@norc.org@test.com', 'Cooper-Tina@norc.org@test.com']
+        })
+        report = run_duplicate_check(self.mock_sf, users_df, user_index=self.index)
+
+        # Only the delta query went to the org
+        self.mock_sf.query_all.assert_called_once()
+        self.assertIn('SystemModstamp >=', self.mock_sf.query_all.call_args[0][0])
+        self.assertEqual(list(report['Action']), ['Skip - Duplicate Found', 'Create New User'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -30,6 +30,7 @@ class TestValidateCommand(unittest.TestCase):
         })
 
         self.mock_config = MagicMock()
+        self.mock_config.__getitem__.return_value = {'workbook_cache': '', 'workbook_engine': 'openpyxl'}
         self.connect_patcher = patch('main.connect_to_salesforce', return_value=self.mock_sf)
         self.connect_patcher.start()
 
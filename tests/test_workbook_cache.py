@@ -0,0 +1,69 @@
+import unittest
+from unittest.mock import MagicMock
+import os
+import shutil
+import tempfile
+import time
+import pandas as pd
+from pandas.testing import assert_frame_equal
+from src.workbook_cache import WorkbookCache
+
+class TestWorkbookCache(unittest.TestCase):
+
+    def setUp(self):
+        """Copy the test workbook into a temporary directory so it can be modified."""
+        self.test_dir = tempfile.TemporaryDirectory()
+        self.workbook = os.path.join(self.test_dir.name, 'users.xlsx')
+        shutil.copy('reports/test_users.xlsx', self.workbook)
+        self.cache_dir = os.path.join(self.test_dir.name, 'cache')
+
+    def tearDown(self):
+        self.test_dir.cleanup()
+
+    def test_second_read_skips_excel_parsing(self):
+        """Test that a cached sheet is returned without calling the reader again."""
+        cache = WorkbookCache(self.cache_dir)
+        reader = MagicMock(side_effect=lambda path, names: pd.read_excel(path, sheet_name=names))
+
+        first = cache.read_sheets(self.workbook, ['Training Template', 'Persona Mapping'], reader)
+        second = cache.read_sheets(self.workbook, ['Training Template', 'Persona Mapping'], reader)
+
+        reader.assert_called_once()
+        for sheet_name in ('Training Template', 'Persona Mapping'):
+            assert_frame_equal(first[sheet_name], second[sheet_name])
+
+        # Only the sheet that isn't cached yet is parsed
+        cache.read_sheets(self.workbook, ['Training Template', 'TSSO_TrainTheTrainer'], reader)
+        self.assertEqual(reader.call_args[0][1], ['TSSO_TrainTheTrainer'])
+
+    def test_changed_workbook_is_parsed_again(self):
+        """Test that entries are keyed by file content, not by path."""
+        cache = WorkbookCache(self.cache_dir)
+        cache.read_sheets(self.workbook, ['Training Template'])
+
+        df = pd.read_excel(self.workbook, sheet_name='Training Template')
+        df.loc[0, 'FirstName'] = 'Changed'
+        df.to_excel(self.workbook, sheet_name='Training Template', index=False)
+
+        sheets = cache.read_sheets(self.workbook, ['Training Template'])
+        self.assertEqual(sheets['Training Template'].loc[0, 'FirstName'], 'Changed')
+
+    def test_least_recently_used_entries_are_evicted(self):
+        """Test that the oldest entries are removed once the cache exceeds its size limit."""
+        cache = WorkbookCache(self.cache_dir)
+        cache.read_sheets(self.workbook, ['Training Template'])
+        (entry,) = os.listdir(self.cache_dir)
+        entry_size = os.path.getsize(os.path.join(self.cache_dir, entry))
+        old = time.time() - 60
+        os.utime(os.path.join(self.cache_dir, entry), (old, old))
+
+        # Room for roughly one entry: reading a second sheet pushes the first one out
+        small_cache = WorkbookCache(self.cache_dir, max_bytes=entry_size + 1)
+        small_cache.read_sheets(self.workbook, ['Persona Mapping'])
+
+        remaining = os.listdir(self.cache_dir)
+        self.assertEqual(len(remaining), 1)
+        self.assertNotIn(entry, remaining)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+import unittest
+import os
+import tempfile
+import pandas as pd
+from pandas.testing import assert_frame_equal
+from src.data_processor import process_dataframes
+from src.mapper import load_mapping
+from src.user_creator import create_salesforce_users, build_user_payloads
+from src.workbook_loader import load_workbook, workbook_columns, resolve_engine, TEMPLATE_SHEET, PERSONA_SHEET, SSO_SHEET
+
+SHEETS = [TEMPLATE_SHEET, PERSONA_SHEET, SSO_SHEET]
+
+class TestWorkbookLoader(unittest.TestCase):
+
+    def setUp(self):
+        self.workbook = 'reports/test_users.xlsx'
+        self.columns = workbook_columns({'FirstName': 'FirstName', 'Alias': 'Alias'})
+
+    def test_only_used_columns_are_read(self):
+        """Test that each sheet keeps just the mapped and processing columns."""
+        sheets = load_workbook(self.workbook, SHEETS, self.columns, engine='openpyxl-stream')
+
+        self.assertEqual(
+            set(sheets[TEMPLATE_SHEET].columns),
+            {'Email (employee ID version)', 'Email (name version)', 'FirstName', 'LastName',
+             'Persona Name', 'Username', 'added by', 'Alias'}
+        )
+        self.assertNotIn('TimeZoneSidKey', sheets[TEMPLATE_SHEET].columns)
+        self.assertEqual(list(sheets[SSO_SHEET].columns), ['Email (employee ID version)'])
+        self.assertEqual(len(sheets[TEMPLATE_SHEET]), 3)
+
+    def test_low_cardinality_columns_are_categorical(self):
+        """Test that Persona Name uses a compact categorical dtype, but the persona ID columns don't."""
+        sheets = load_workbook(self.workbook, SHEETS, self.columns, engine='openpyxl-stream')
+
+        self.assertEqual(sheets[TEMPLATE_SHEET]['Persona Name'].dtype, 'category')
+        self.assertNotEqual(sheets[PERSONA_SHEET]['Profile ID (Training)'].dtype, 'category')
+
+    def test_unmatched_persona_falls_back_to_template_values(self):
+        """Test that a user whose persona has no match keeps the Training Template's ProfileId."""
+        sheets = pd.read_excel(self.workbook, sheet_name=None)
+        sheets[TEMPLATE_SHEET] = sheets[TEMPLATE_SHEET].head(1).assign(**{'Persona Name': 'No Such Persona', 'ProfileId': '00e000000000009AAA'})
+        with tempfile.TemporaryDirectory() as test_dir:
+            path = os.path.join(test_dir, 'unmatched.xlsx')
+            with pd.ExcelWriter(path) as writer:
+                for sheet_name, df in sheets.items():
+                    df.to_excel(writer, sheet_name=sheet_name, index=False)
+            mapping = load_mapping('mapping.properties')
+            loaded = load_workbook(path, SHEETS, workbook_columns(mapping), engine='openpyxl-stream')
+
+        processed_data = process_dataframes(loaded[TEMPLATE_SHEET], loaded[PERSONA_SHEET], loaded[SSO_SHEET])
+        results_df = create_salesforce_users(None, processed_data, mapping, dry_run=True)
+
+        self.assertEqual(list(results_df['Status']), ['Dry Run - Not Created'])
+        self.assertEqual(build_user_payloads(processed_data, mapping)[0]['ProfileId'], '00e000000000009AAA')
+
+    def test_streaming_reader_matches_pandas(self):
+        """Test that the streaming reader returns the same frames as pd.read_excel."""
+        columns = workbook_columns(load_mapping('mapping.properties'))
+        streamed = load_workbook(self.workbook, SHEETS, columns, engine='openpyxl-stream')
+        parsed = load_workbook(self.workbook, SHEETS, columns, engine='openpyxl')
+
+        for sheet_name in SHEETS:
+            assert_frame_equal(streamed[sheet_name], parsed[sheet_name])
+
+    def test_without_mapping_template_is_read_in_full(self):
+        """Test that every Training Template column is kept when no mapping is known."""
+        sheets = load_workbook(self.workbook, [TEMPLATE_SHEET], workbook_columns(None), engine='openpyxl-stream')
+        full = pd.read_excel(self.workbook, sheet_name=TEMPLATE_SHEET)
+        self.assertEqual(list(sheets[TEMPLATE_SHEET].columns), list(full.columns))
+
+    def test_unknown_engine_is_rejected(self):
+        with self.assertRaises(ValueError):
+            resolve_engine('xlrd')
+
+if __name__ == '__main__':
+    unittest.main()